@@ -0,0 +1,49 @@
+"""
+Times importing sae the ways it's used, each in a fresh interpreter.
+
+    python benchmarks/import_time.py [-n RUNS]
+
+Each figure is the whole process's wall time, so includes interpreter
+startup: "python" is what every process pays regardless, "amaranth" what
+anything touching the HDL pays. The rest are sae's own entry points: the
+ISA alone, what each test worker imports, and the CLI.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+CASES = {
+    "python": "pass",
+    "amaranth": "import amaranth",
+    "sae": "import sae",
+    "sae.rtl.isa_rv32": "import sae.rtl.isa_rv32",
+    "sae.sim (test worker)": "import sae.sim, sae.st",
+    "sae.Sae (CLI)": "from sae import Sae",
+}
+
+
+
+def time_import(stmt):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", stmt], check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    for name, stmt in CASES.items():
+        # The first run warms the bytecode cache.
+        time_import(stmt)
+        times = [time_import(stmt) for _ in range(args.runs)]
+        print(f"{name:<24} {statistics.median(times) * 1000:8.1f}ms "
+              f"(min {min(times) * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# CRC-16/CCITT, a bit at a time, over a pseudo-random buffer, as in
+# CoreMark's crcu8. Leaves the CRC in a0.
+
+    .equ LEN, 256
+
+    .globl _start
+_start:
+    la a0, buf
+    li a1, LEN
+    li a2, 0x1234
+1:  slli a3, a2, 2              # x = 5x + 0x39
+    add a2, a2, a3
+    addi a2, a2, 0x39
+    sb a2, 0(a0)
+    addi a0, a0, 1
+    addi a1, a1, -1
+    bnez a1, 1b
+
+    la a0, buf
+    li a1, LEN
+    li a2, 0xFFFF
+    li a5, 0x1021
+    li t2, 0xFFFF
+2:  lbu a3, 0(a0)
+    slli a3, a3, 8
+    xor a2, a2, a3
+    li a4, 8
+3:  slli a2, a2, 1
+    srli t0, a2, 16
+    andi t0, t0, 1
+    beqz t0, 4f
+    xor a2, a2, a5
+4:  and a2, a2, t2
+    addi a4, a4, -1
+    bnez a4, 3b
+    addi a0, a0, 1
+    addi a1, a1, -1
+    bnez a1, 2b
+
+    mv a0, a2
+    .word 0xffffffff
+
+    .bss
+buf:
+    .zero LEN
@@ -0,0 +1,92 @@
+# String copies and compares, record assignment and small procedure calls,
+# in the proportions of Dhrystone's main loop. Leaves a running total in a0.
+
+    .equ ROUNDS, 20
+
+    .globl _start
+_start:
+    li s0, ROUNDS
+    li s1, 0
+1:  la a0, str_buf
+    la a1, str_1
+    call strcpy
+    la a0, str_buf
+    la a1, str_2
+    call strcmp
+    add s1, s1, a0
+    la a0, rec_b
+    la a1, rec_a
+    li a2, 12
+    call memcpy
+    la t0, rec_b
+    lw t1, 8(t0)
+    add t1, t1, s0
+    sw t1, 8(t0)
+    add s1, s1, t1
+    mv a0, s0
+    call proc
+    add s1, s1, a0
+    addi s0, s0, -1
+    bnez s0, 1b
+    mv a0, s1
+    .word 0xffffffff
+
+strcpy:
+1:  lbu t0, 0(a1)
+    sb t0, 0(a0)
+    addi a0, a0, 1
+    addi a1, a1, 1
+    bnez t0, 1b
+    ret
+
+strcmp:
+1:  lbu t0, 0(a0)
+    lbu t1, 0(a1)
+    bne t0, t1, 2f
+    addi a0, a0, 1
+    addi a1, a1, 1
+    bnez t0, 1b
+    li a0, 0
+    ret
+2:  sub a0, t0, t1
+    ret
+
+# Copies a2 words.
+memcpy:
+1:  lw t0, 0(a1)
+    sw t0, 0(a0)
+    addi a0, a0, 4
+    addi a1, a1, 4
+    addi a2, a2, -1
+    bnez a2, 1b
+    ret
+
+proc:
+    andi t0, a0, 3
+    li t1, 1
+    beqz t0, 1f
+    beq t0, t1, 2f
+    slli a0, a0, 2
+    xori a0, a0, 0x55
+    ret
+1:  srli a0, a0, 1
+    addi a0, a0, 7
+    ret
+2:  neg a0, a0
+    ret
+
+    .rodata
+str_1:
+    .asciz "DHRYSTONE PROGRAM, SOME STRING"
+str_2:
+    .asciz "DHRYSTONE PROGRAM, 2ND STRING"
+
+    .data
+rec_a:
+    .word 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12
+
+    .bss
+str_buf:
+    .zero 32
+rec_b:
+    .zero 48
@@ -0,0 +1,48 @@
+# Builds a linked list, reverses it ROUNDS times and folds its values, as in
+# CoreMark's list processing. Leaves the fold in a0.
+
+    .equ N, 64
+    .equ ROUNDS, 8
+
+    .globl _start
+_start:
+    la a0, nodes                # node: {next, value}
+    li a1, 0
+    li a2, 0
+    li a3, N
+1:  addi t0, a0, 8
+    sw t0, 0(a0)
+    sw a2, 4(a0)
+    addi a2, a2, 3
+    mv a0, t0
+    addi a1, a1, 1
+    blt a1, a3, 1b
+    sw zero, -8(a0)
+
+    la s0, nodes
+    li s1, ROUNDS
+2:  li t1, 0
+    mv t0, s0
+3:  lw t2, 0(t0)
+    sw t1, 0(t0)
+    mv t1, t0
+    mv t0, t2
+    bnez t0, 3b
+    mv s0, t1
+    addi s1, s1, -1
+    bnez s1, 2b
+
+    li a0, 0
+    mv t0, s0
+4:  lw t2, 4(t0)
+    slli t3, a0, 1
+    srli a0, a0, 31
+    or a0, a0, t3
+    xor a0, a0, t2
+    lw t0, 0(t0)
+    bnez t0, 4b
+    .word 0xffffffff
+
+    .bss
+nodes:
+    .zero 512                   # N nodes of 8 bytes
@@ -0,0 +1,89 @@
+# An 8x8 integer matrix product with a shift-and-add multiply, as in
+# CoreMark's matrix kernel on a core without M. Leaves a checksum of the
+# product in a0.
+
+    .equ N, 8
+
+    .globl _start
+_start:
+    la s0, a_mat                # a[i][j] = i + 2j + 1
+    la s1, b_mat                # b[i][j] = 3i - j
+    li t4, N
+    li t0, 0
+1:  li t1, 0
+2:  slli t2, t1, 1
+    add t2, t2, t0
+    addi t2, t2, 1
+    sw t2, 0(s0)
+    addi s0, s0, 4
+    slli t3, t0, 1
+    add t3, t3, t0
+    sub t3, t3, t1
+    sw t3, 0(s1)
+    addi s1, s1, 4
+    addi t1, t1, 1
+    blt t1, t4, 2b
+    addi t0, t0, 1
+    blt t0, t4, 1b
+
+    la s5, c_mat
+    li s2, 0                    # i
+3:  li s3, 0                    # j
+4:  li s4, 0                    # k
+    li s6, 0
+5:  slli t0, s2, 5
+    slli t1, s4, 2
+    add t0, t0, t1
+    la t2, a_mat
+    add t0, t0, t2
+    lw a0, 0(t0)
+    slli t0, s4, 5
+    slli t1, s3, 2
+    add t0, t0, t1
+    la t2, b_mat
+    add t0, t0, t2
+    lw a1, 0(t0)
+    call mul
+    add s6, s6, a0
+    addi s4, s4, 1
+    li t0, N
+    blt s4, t0, 5b
+    sw s6, 0(s5)
+    addi s5, s5, 4
+    addi s3, s3, 1
+    blt s3, t0, 4b
+    addi s2, s2, 1
+    blt s2, t0, 3b
+
+    la t0, c_mat
+    li t1, 64                   # N * N
+    li a0, 0
+6:  lw t2, 0(t0)
+    slli t3, a0, 5
+    srli a0, a0, 27
+    or a0, a0, t3
+    xor a0, a0, t2
+    addi t0, t0, 4
+    addi t1, t1, -1
+    bnez t1, 6b
+    .word 0xffffffff
+
+# a0 *= a1, modulo 2**32.
+mul:
+    mv t5, a0
+    li a0, 0
+1:  andi t6, a1, 1
+    beqz t6, 2f
+    add a0, a0, t5
+2:  slli t5, t5, 1
+    srli a1, a1, 1
+    bnez a1, 1b
+    ret
+
+    .bss
+a_mat:
+    .zero 256
+b_mat:
+    .zero 256
+c_mat:
+    .zero 256
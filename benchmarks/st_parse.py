@@ -0,0 +1,55 @@
+"""
+Times parsing a large generated .st file.
+
+    python benchmarks/st_parse.py [-n TESTS]
+
+Each test is a copy of a block exercising every kind of token, so the file
+grows by about a dozen lines per test.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sae import st
+
+BLOCK = """\
+test_{n}:
+    .init a0=0x1234_5678, a1=-5, x5=0b1010, uart="y\\r\\n"
+    addi a0, a1, 123            ; a comment
+    lw a2, 8(sp)
+    sw a2, 12(sp)
+    jal ra, -16
+    fence rw, w
+    .word 0xdeadbeef
+    .half 0x1234
+    .assert~ a0=0x1234567b, x5=10
+    nop
+
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--tests", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.st"
+        with open(path, "w") as f:
+            for n in range(args.tests):
+                f.write(BLOCK.format(n=n))
+        lines = sum(1 for _ in open(path))
+
+        start = time.perf_counter()
+        parser = st.Parser()
+        with open(path) as f:
+            parser.feed_file(f)
+        elapsed = time.perf_counter() - start
+
+    print(f"{lines} lines in {elapsed:.2f}s: {lines / elapsed:,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
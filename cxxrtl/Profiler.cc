@@ -0,0 +1,119 @@
+#include <algorithm>
+#include <fstream>
+
+#include "Profiler.h"
+
+namespace {
+
+const char MAGIC[] = "saeprofile";
+const int VERSION = 1;
+
+const uint32_t OPCODE_BRANCH = 0b1100011;
+const uint32_t OPCODE_JALR = 0b1100111;
+const uint32_t OPCODE_JAL = 0b1101111;
+
+// Registers the calling convention links through.
+bool is_link(uint32_t reg) {
+    return reg == 1 || reg == 5;
+}
+
+}
+
+Profiler::Profiler(const debug_items& di, const std::string& hart_path):
+    _resolving(di[hart_path + "resolving"]),
+    _pc(di[hart_path + "pc"]),
+    _insn(di[hart_path + "insn"])
+{
+}
+
+void Profiler::eval(const debug_item& item) {
+    if (item.outline)
+        item.outline->eval();
+}
+
+void Profiler::tick(uint64_t cycle) {
+    eval(_resolving);
+    if (!_resolving.curr[0])
+        return;
+    eval(_pc);
+    eval(_insn);
+
+    uint32_t pc = _pc.curr[0];
+    uint32_t insn = _insn.curr[0];
+
+    if (_stack.empty())
+        _stack.push_back(pc);
+    else if (_pending == CALL)
+        _stack.push_back(pc);
+    else if (_pending == RETURN && _stack.size() > 1)
+        _stack.pop_back();
+    if (!_next.has_value() || pc != *_next)
+        _block = pc;
+
+    _pcs[pc]++;
+    _blocks[_block]++;
+    auto stack = _stacks.try_emplace(_stack, 0).first;
+    stack->second++;
+
+    uint32_t opcode = insn & 0x7F;
+    uint32_t rd = (insn >> 7) & 0x1F;
+    uint32_t rs1 = (insn >> 15) & 0x1F;
+    _pending = NONE;
+    if ((opcode == OPCODE_JAL || opcode == OPCODE_JALR) && is_link(rd))
+        _pending = CALL;
+    else if (opcode == OPCODE_JALR && rd == 0 && is_link(rs1))
+        _pending = RETURN;
+    // Whatever comes after a control transfer starts a new block.
+    if (opcode == OPCODE_BRANCH || opcode == OPCODE_JAL || opcode == OPCODE_JALR)
+        _next = std::nullopt;
+    else
+        _next = pc + 4;
+
+    _recent.push_back({cycle, pc, &stack->first, _next});
+    if (_recent.size() > WINDOW)
+        _recent.pop_front();
+}
+
+void Profiler::skip(uint64_t cycle, uint64_t lap, uint64_t laps) {
+    // The lap ends with the instruction resolved on `cycle`.
+    auto first = std::find_if(_recent.begin(), _recent.end(),
+                              [&](const Retired& retired) { return retired.cycle + lap > cycle; });
+
+    // Going round again, the lap follows on from its own last instruction
+    // rather than whatever led into the loop, which can start its blocks
+    // elsewhere; after once round they're as every further lap has them.
+    std::vector<uint32_t> blocks;
+    std::optional<uint32_t> expected = _next;
+    for (int round = 0; round < 2; ++round) {
+        blocks.clear();
+        for (auto it = first; it != _recent.end(); ++it) {
+            if (!expected.has_value() || it->pc != *expected)
+                _block = it->pc;
+            blocks.push_back(_block);
+            expected = it->next;
+        }
+    }
+
+    auto block = blocks.begin();
+    for (auto it = first; it != _recent.end(); ++it, ++block) {
+        _pcs[it->pc] += laps;
+        _blocks[*block] += laps;
+        _stacks[*it->stack] += laps;
+    }
+}
+
+bool Profiler::write(const std::string& path) const {
+    std::ofstream out(path);
+    out << MAGIC << " " << VERSION << "\n" << std::hex;
+    for (auto& [pc, count] : _pcs)
+        out << "pc " << pc << " " << std::dec << count << std::hex << "\n";
+    for (auto& [block, count] : _blocks)
+        out << "block " << block << " " << std::dec << count << std::hex << "\n";
+    for (auto& [stack, count] : _stacks) {
+        out << "stack ";
+        for (size_t i = 0; i < stack.size(); ++i)
+            out << (i ? ";" : "") << stack[i];
+        out << " " << std::dec << count << std::hex << "\n";
+    }
+    return out.good();
+}
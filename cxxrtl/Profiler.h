@@ -0,0 +1,63 @@
+#ifndef PROFILER_H
+#define PROFILER_H
+
+#include <deque>
+#include <map>
+#include <optional>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+#include <sae.h>
+
+// Counts the instructions the hart resolves by pc, by basic block and by call
+// stack, and writes the counts out for sae/sim/profile.py to symbolize and
+// report on. Instructions, calls and returns are counted just as that
+// module's Profiler counts them.
+class Profiler {
+public:
+    Profiler(const debug_items& di, const std::string& hart_path);
+
+    // Call once per cycle after the rising edge.
+    void tick(uint64_t cycle);
+    // The harness fast-forwarded `laps` more laps of the `lap` cycles up to
+    // `cycle` without stepping them.
+    void skip(uint64_t cycle, uint64_t lap, uint64_t laps);
+
+    bool write(const std::string& path) const;
+
+private:
+    enum pending {
+        NONE,
+        CALL,
+        RETURN,
+    };
+
+    struct Retired {
+        uint64_t cycle;
+        uint32_t pc;
+        const std::vector<uint32_t> *stack;
+        std::optional<uint32_t> next;
+    };
+
+    // Laps are short; don't remember more instructions than this.
+    static const size_t WINDOW = 64;
+
+    static void eval(const debug_item& item);
+
+    const debug_item& _resolving;
+    const debug_item& _pc;
+    const debug_item& _insn;
+
+    std::unordered_map<uint32_t, uint64_t> _pcs;
+    std::unordered_map<uint32_t, uint64_t> _blocks;
+    std::map<std::vector<uint32_t>, uint64_t> _stacks;
+
+    std::vector<uint32_t> _stack;
+    uint32_t _block = 0;
+    std::optional<uint32_t> _next;
+    pending _pending = NONE;
+    std::deque<Retired> _recent;
+};
+
+#endif
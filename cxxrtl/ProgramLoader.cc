@@ -0,0 +1,143 @@
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <iostream>
+#include <iterator>
+#include <optional>
+#include <vector>
+
+#include "ProgramLoader.h"
+
+namespace {
+
+std::optional<std::vector<uint8_t>> read_file(const std::string& path) {
+    std::ifstream f(path, std::ios::binary);
+    if (!f) {
+        std::cerr << "could not open \"" << path << "\"" << std::endl;
+        return std::nullopt;
+    }
+    return std::vector<uint8_t>(std::istreambuf_iterator<char>(f), {});
+}
+
+uint16_t le16(const std::vector<uint8_t>& b, size_t off) {
+    return (uint16_t)b[off] | (uint16_t)b[off + 1] << 8;
+}
+
+uint32_t le32(const std::vector<uint8_t>& b, size_t off) {
+    return (uint32_t)le16(b, off) | (uint32_t)le16(b, off + 2) << 16;
+}
+
+const uint16_t EM_RISCV = 243;
+const uint32_t PT_LOAD = 1;
+
+}
+
+ProgramLoader::ProgramLoader(const debug_items& di, const std::string& hart_path):
+    _sysmem(di[hart_path + "mmu sysmem"]),
+    _xmem(di[hart_path + "xmem"]),
+    _pc(di[hart_path + "pc"])
+{
+}
+
+void ProgramLoader::clear() {
+    memset(_sysmem.curr, 0, _sysmem.depth * sizeof(chunk_t));
+}
+
+bool ProgramLoader::write_byte(uint32_t addr, uint8_t b) {
+    size_t word = addr >> 1;
+    if (word >= _sysmem.depth) {
+        std::cerr << "address 0x" << std::hex << addr << std::dec
+                  << " is outside sysmem (" << (_sysmem.depth * 2) << " bytes)" << std::endl;
+        return false;
+    }
+    unsigned shift = (addr & 1) * 8;
+    _sysmem.curr[word] = (_sysmem.curr[word] & ~(0xFFu << shift)) | ((uint32_t)b << shift);
+    return true;
+}
+
+bool ProgramLoader::load_bin(const std::string& path) {
+    auto data = read_file(path);
+    if (!data)
+        return false;
+
+    for (size_t i = 0; i < data->size(); ++i)
+        if (!write_byte(i, (*data)[i]))
+            return false;
+    return true;
+}
+
+bool ProgramLoader::load_elf(const std::string& path) {
+    auto data = read_file(path);
+    if (!data)
+        return false;
+    auto& elf = *data;
+
+    if (elf.size() < 52 || memcmp(elf.data(), "\x7f" "ELF", 4) != 0) {
+        std::cerr << "\"" << path << "\" is not an ELF file" << std::endl;
+        return false;
+    }
+    if (elf[4] != 1 || elf[5] != 1) {
+        std::cerr << "\"" << path << "\" is not a 32-bit little-endian ELF" << std::endl;
+        return false;
+    }
+    if (le16(elf, 18) != EM_RISCV)
+        std::cerr << "warning: \"" << path << "\" is not a RISC-V ELF" << std::endl;
+
+    uint32_t entry = le32(elf, 24);
+    uint32_t phoff = le32(elf, 28);
+    uint16_t phentsize = le16(elf, 42);
+    uint16_t phnum = le16(elf, 44);
+
+    for (uint16_t i = 0; i < phnum; ++i) {
+        size_t ph = phoff + (size_t)i * phentsize;
+        if (ph + 32 > elf.size()) {
+            std::cerr << "\"" << path << "\" has a truncated program header" << std::endl;
+            return false;
+        }
+        if (le32(elf, ph) != PT_LOAD)
+            continue;
+
+        uint32_t offset = le32(elf, ph + 4);
+        uint32_t paddr = le32(elf, ph + 12);
+        uint32_t filesz = le32(elf, ph + 16);
+        uint32_t memsz = le32(elf, ph + 20);
+        if ((size_t)offset + filesz > elf.size()) {
+            std::cerr << "\"" << path << "\" has a truncated segment" << std::endl;
+            return false;
+        }
+
+        for (uint32_t j = 0; j < memsz; ++j)
+            if (!write_byte(paddr + j, j < filesz ? elf[offset + j] : 0))
+                return false;
+    }
+
+    _pc.curr[0] = entry;
+    if (_pc.next)
+        _pc.next[0] = entry;
+
+    return true;
+}
+
+bool ProgramLoader::set_reg(const std::string& spec) {
+    // xN=V
+    size_t eq = spec.find('=');
+    if (spec.size() < 4 || spec[0] != 'x' || eq == std::string::npos) {
+        std::cerr << "expected register assignment like x10=0x1234, not \"" << spec << "\"" << std::endl;
+        return false;
+    }
+
+    char *end;
+    unsigned long xn = strtoul(spec.c_str() + 1, &end, 10);
+    if (end != spec.c_str() + eq || xn < 1 || xn >= _xmem.depth) {
+        std::cerr << "bad register in \"" << spec << "\"" << std::endl;
+        return false;
+    }
+    unsigned long v = strtoul(spec.c_str() + eq + 1, &end, 0);
+    if (*end || end == spec.c_str() + eq + 1) {
+        std::cerr << "bad value in \"" << spec << "\"" << std::endl;
+        return false;
+    }
+
+    _xmem.curr[xn] = (uint32_t)v;
+    return true;
+}
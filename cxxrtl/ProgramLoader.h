@@ -0,0 +1,27 @@
+#ifndef PROGRAM_LOADER_H
+#define PROGRAM_LOADER_H
+
+#include <string>
+
+#include <sae.h>
+
+// Writes program images and register values into the hart's memories
+// through debug items, so one compiled simulator can run any program.
+class ProgramLoader {
+public:
+    ProgramLoader(const debug_items& di, const std::string& hart_path);
+
+    void clear();
+    bool load_bin(const std::string& path);
+    bool load_elf(const std::string& path);
+    bool set_reg(const std::string& spec);
+
+private:
+    bool write_byte(uint32_t addr, uint8_t b);
+
+    const debug_item& _sysmem;
+    const debug_item& _xmem;
+    const debug_item& _pc;
+};
+
+#endif
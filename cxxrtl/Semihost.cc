@@ -0,0 +1,89 @@
+#include <algorithm>
+#include <fstream>
+#include <iostream>
+#include <iterator>
+#include <vector>
+
+#include "Semihost.h"
+
+Semihost::Semihost(cxxrtl_design::p_sae& top, const debug_items& di, const std::string& hart_path):
+    _top(top),
+    _sysmem(di[hart_path + "mmu sysmem"]),
+    _xmem(di[hart_path + "xmem"])
+{
+}
+
+bool Semihost::tick(uint64_t cycle) {
+    bool ecall = _top.p_ecall.get<bool>();
+    if (ecall)
+        _top.p_ecall__ret.set<uint32_t>(service(cycle));
+    _top.p_ecall__done.set(ecall);
+    return ecall;
+}
+
+std::optional<uint32_t> Semihost::exit_code() const {
+    return _exit_code;
+}
+
+uint32_t Semihost::service(uint64_t cycle) {
+    uint32_t a0 = _xmem.curr[10], a1 = _xmem.curr[11], a2 = _xmem.curr[12];
+
+    switch (_xmem.curr[17]) {
+    case EXIT:
+        _exit_code = a0;
+        return a0;
+
+    case WRITE: {
+        std::ostream& os = a0 == 2 ? std::cerr : std::cout;
+        for (uint32_t i = 0; i < a2; ++i) {
+            uint8_t b;
+            if (!read_byte(a1 + i, b))
+                return i;
+            os << (char)b;
+        }
+        os << std::flush;
+        return a2;
+    }
+
+    case READ_FILE: {
+        std::string path;
+        for (uint8_t b; read_byte(a0 + path.size(), b) && b; )
+            path += (char)b;
+
+        std::ifstream f(path, std::ios::binary);
+        if (!f)
+            return UINT32_MAX;
+        std::vector<uint8_t> data(std::istreambuf_iterator<char>(f), {});
+
+        uint32_t n = std::min<size_t>(data.size(), a2);
+        for (uint32_t i = 0; i < n; ++i)
+            if (!write_byte(a1 + i, data[i]))
+                return UINT32_MAX;
+        return n;
+    }
+
+    case CYCLES:
+        return (uint32_t)cycle;
+
+    default:
+        std::cerr << "unknown semihosting call " << _xmem.curr[17] << std::endl;
+        return UINT32_MAX;
+    }
+}
+
+bool Semihost::read_byte(uint32_t addr, uint8_t& b) const {
+    size_t word = addr >> 1;
+    if (word >= _sysmem.depth)
+        return false;
+    b = (uint8_t)(_sysmem.curr[word] >> ((addr & 1) * 8));
+    return true;
+}
+
+bool Semihost::write_byte(uint32_t addr, uint8_t b) {
+    size_t word = addr >> 1;
+    if (word >= _sysmem.depth)
+        return false;
+    unsigned shift = (addr & 1) * 8;
+    _sysmem.curr[word] = (_sysmem.curr[word] & ~(0xFFu << shift)) | ((uint32_t)b << shift);
+    return true;
+}
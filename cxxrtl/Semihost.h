@@ -0,0 +1,39 @@
+#ifndef SEMIHOST_H
+#define SEMIHOST_H
+
+#include <optional>
+#include <string>
+
+#include <sae.h>
+
+// Services the hart's ECALLs from the host; see sae/sim/semihost.py for the
+// calls and their arguments.
+class Semihost {
+public:
+    Semihost(cxxrtl_design::p_sae& top, const debug_items& di, const std::string& hart_path);
+
+    // Call after each falling edge has been stepped. Returns whether a call
+    // was serviced.
+    bool tick(uint64_t cycle);
+
+    std::optional<uint32_t> exit_code() const;
+
+private:
+    enum call : uint32_t {
+        EXIT = 93,
+        WRITE = 64,
+        READ_FILE = 0x1000,
+        CYCLES = 0x1001,
+    };
+
+    uint32_t service(uint64_t cycle);
+    bool read_byte(uint32_t addr, uint8_t& b) const;
+    bool write_byte(uint32_t addr, uint8_t b);
+
+    cxxrtl_design::p_sae& _top;
+    const debug_item& _sysmem;
+    const debug_item& _xmem;
+    std::optional<uint32_t> _exit_code;
+};
+
+#endif
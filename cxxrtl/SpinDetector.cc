@@ -0,0 +1,49 @@
+#include "SpinDetector.h"
+
+SpinDetector::SpinDetector(const debug_items& di, const std::string& top_path, const std::string& hart_path):
+    _resolving(di[hart_path + "resolving"]),
+    _pc(di[hart_path + "pc"]),
+    _xmem(di[hart_path + "xmem"]),
+    _write_valid(di[hart_path + "mmu write__req__valid"]),
+    _uart_rd_ready(di[top_path + "uart_rd__ready"])
+{
+}
+
+void SpinDetector::eval(const debug_item& item) {
+    if (item.outline)
+        item.outline->eval();
+}
+
+std::optional<uint64_t> SpinDetector::tick(uint64_t cycle) {
+    eval(_write_valid);
+    eval(_uart_rd_ready);
+    if (_write_valid.curr[0] || _uart_rd_ready.curr[0]) {
+        disturb();
+        return std::nullopt;
+    }
+
+    eval(_resolving);
+    if (!_resolving.curr[0])
+        return std::nullopt;
+
+    std::array<uint32_t, 33> state;
+    state[0] = _pc.curr[0];
+    for (size_t i = 0; i < 32; ++i)
+        state[i + 1] = _xmem.curr[i];
+
+    auto it = _seen.find(state);
+    if (it != _seen.end()) {
+        uint64_t lap = cycle - it->second;
+        disturb();
+        return lap;
+    }
+
+    if (_seen.size() == WINDOW)
+        disturb();
+    _seen.emplace(state, cycle);
+    return std::nullopt;
+}
+
+void SpinDetector::disturb() {
+    _seen.clear();
+}
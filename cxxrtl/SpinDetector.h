@@ -0,0 +1,40 @@
+#ifndef SPIN_DETECTOR_H
+#define SPIN_DETECTOR_H
+
+#include <array>
+#include <map>
+#include <optional>
+#include <string>
+
+#include <sae.h>
+
+// Spots the hart going round a loop that can't change anything until the
+// outside world does: if the same pc and registers recur with no memory
+// writes and no UART reads in between, the next lap will be identical to the
+// last, and we can skip as many laps as we like.
+class SpinDetector {
+public:
+    SpinDetector(const debug_items& di, const std::string& top_path, const std::string& hart_path);
+
+    // Call once per cycle after the rising edge. Returns the length of one lap
+    // in cycles when the hart has just gone round a busy-wait loop.
+    std::optional<uint64_t> tick(uint64_t cycle);
+    // Something outside the hart happened; whatever loop it was in is over.
+    void disturb();
+
+private:
+    // Busy-waits are short; don't remember more states than this.
+    static const size_t WINDOW = 64;
+
+    static void eval(const debug_item& item);
+
+    const debug_item& _resolving;
+    const debug_item& _pc;
+    const debug_item& _xmem;
+    const debug_item& _write_valid;
+    const debug_item& _uart_rd_ready;
+
+    std::map<std::array<uint32_t, 33>, uint64_t> _seen;
+};
+
+#endif
@@ -0,0 +1,115 @@
+#include "Tracer.h"
+
+namespace {
+
+const char MAGIC[] = "saetrace";
+const uint8_t VERSION = 1;
+
+// Flush to disk once this much has built up.
+const size_t BUFFER = 1 << 16;
+
+}
+
+Tracer::Tracer(const debug_items& di, const std::string& top_path, const std::string& path):
+    _valid(di[top_path + "rvfi.valid"]),
+    _insn(di[top_path + "rvfi.insn"]),
+    _trap(di[top_path + "rvfi.trap"]),
+    _pc(di[top_path + "rvfi.pc_rdata"]),
+    _rd_addr(di[top_path + "rvfi.rd_addr"]),
+    _rd_wdata(di[top_path + "rvfi.rd_wdata"]),
+    _mem_addr(di[top_path + "rvfi.mem_addr"]),
+    _mem_wmask(di[top_path + "rvfi.mem_wmask"]),
+    _mem_wdata(di[top_path + "rvfi.mem_wdata"]),
+    _out(path, std::ios::binary)
+{
+    _buffer.reserve(BUFFER + 32);
+    _buffer.insert(_buffer.end(), MAGIC, MAGIC + sizeof(MAGIC) - 1);
+    put(VERSION);
+}
+
+Tracer::~Tracer() {
+    flush();
+}
+
+bool Tracer::good() const {
+    return _out.good();
+}
+
+void Tracer::eval(const debug_item& item) {
+    if (item.outline)
+        item.outline->eval();
+}
+
+void Tracer::put(uint8_t b) {
+    _buffer.push_back(b);
+}
+
+void Tracer::put_u32(uint32_t v) {
+    for (int i = 0; i < 4; ++i, v >>= 8)
+        put(v & 0xFF);
+}
+
+void Tracer::put_varint(uint64_t v) {
+    while (v >= 0x80) {
+        put((v & 0x7F) | 0x80);
+        v >>= 7;
+    }
+    put(v);
+}
+
+void Tracer::flush() {
+    _out.write((const char *)_buffer.data(), _buffer.size());
+    _buffer.clear();
+}
+
+void Tracer::tick(uint64_t cycle) {
+    eval(_valid);
+    if (!_valid.curr[0])
+        return;
+    for (auto item : {&_insn, &_trap, &_pc, &_rd_addr, &_rd_wdata, &_mem_addr, &_mem_wmask, &_mem_wdata})
+        eval(*item);
+
+    uint32_t pc = _pc.curr[0];
+    uint32_t insn = _insn.curr[0];
+    uint8_t flags = 0;
+
+    auto it = _insns.find(pc);
+    if (it == _insns.end() || it->second != insn) {
+        flags |= INSN;
+        _insns[pc] = insn;
+    }
+    if (_rd_addr.curr[0])
+        flags |= RD;
+    if (_mem_wmask.curr[0])
+        flags |= STORE;
+    if (_trap.curr[0])
+        flags |= TRAP;
+
+    put(flags);
+    put_varint(cycle - _cycle);
+    // Sequential execution is the common case, and costs one byte.
+    int32_t delta = (int32_t)(pc - _pc_prev - 4);
+    put_varint(((uint32_t)delta << 1) ^ (uint32_t)(delta >> 31));
+    if (flags & INSN)
+        put_u32(insn);
+    if (flags & RD) {
+        put(_rd_addr.curr[0]);
+        put_varint(_rd_wdata.curr[0]);
+    }
+    if (flags & STORE) {
+        put_varint(_mem_addr.curr[0]);
+        put(_mem_wmask.curr[0]);
+        put_varint(_mem_wdata.curr[0]);
+    }
+
+    _cycle = cycle;
+    _pc_prev = pc;
+    if (_buffer.size() >= BUFFER)
+        flush();
+}
+
+void Tracer::skip(uint64_t cycles) {
+    put(SKIP);
+    put_varint(cycles);
+    _cycle += cycles;
+}
@@ -0,0 +1,61 @@
+#ifndef TRACER_H
+#define TRACER_H
+
+#include <fstream>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+#include <sae.h>
+
+// Streams a compact binary record of every instruction the hart retires to
+// disk, read off its RVFI port; see sae/sim/trace.py for the format and a
+// reader.
+class Tracer {
+public:
+    Tracer(const debug_items& di, const std::string& top_path, const std::string& path);
+    ~Tracer();
+
+    bool good() const;
+
+    // Call once per cycle after the falling edge has been stepped.
+    void tick(uint64_t cycle);
+    // The harness fast-forwarded over this many cycles without stepping them.
+    void skip(uint64_t cycles);
+
+private:
+    enum flag : uint8_t {
+        INSN = 0x01,
+        RD = 0x02,
+        STORE = 0x04,
+        TRAP = 0x08,
+        SKIP = 0x80,
+    };
+
+    static void eval(const debug_item& item);
+
+    void put(uint8_t b);
+    void put_u32(uint32_t v);
+    void put_varint(uint64_t v);
+    void flush();
+
+    const debug_item& _valid;
+    const debug_item& _insn;
+    const debug_item& _trap;
+    const debug_item& _pc;
+    const debug_item& _rd_addr;
+    const debug_item& _rd_wdata;
+    const debug_item& _mem_addr;
+    const debug_item& _mem_wmask;
+    const debug_item& _mem_wdata;
+
+    std::ofstream _out;
+    std::vector<uint8_t> _buffer;
+    uint64_t _cycle = 0;
+    uint32_t _pc_prev = 0;
+    // The instruction last recorded at each pc; it's only written again if
+    // it changes.
+    std::unordered_map<uint32_t, uint32_t> _insns;
+};
+
+#endif
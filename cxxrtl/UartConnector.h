@@ -1,8 +1,16 @@
 #ifndef UART_CONNECTOR_H
 #define UART_CONNECTOR_H
 
+#include <deque>
+#include <map>
+#include <optional>
+#include <string>
+
 #include <sae.h>
 
+// Exchanges bytes with the design's bypassed UART at its stream interface.
+// Bytes given to tx() are queued and offered to the core one at a time, either
+// straight away or once advance() reaches the cycle they're due.
 class UartConnector {
 public:
     UartConnector(cxxrtl_design::p_sae& top);
@@ -13,32 +21,23 @@ public:
     };
 
     void tx(const std::string& b);
+    void tx_at(uint64_t cycle, const std::string& b);
+    // Returns whether any scheduled bytes arrived.
+    bool advance(uint64_t cycle);
+    std::optional<uint64_t> next_arrival() const;
+
+    // Call after each rising edge has been stepped.
     result tick();
 
     uint8_t last_byte() const;
 
 private:
-    value<1>& _tx;
-    value<1>& _rx;
+    void offer();
 
+    cxxrtl_design::p_sae& _top;
+    std::deque<uint8_t> _tx_queue;
+    std::multimap<uint64_t, std::string> _scheduled;
     uint8_t _last_byte;
-
-    enum {
-        RX_IDLE,
-        RX_BIT,
-    } _rx_state;
-    uint32_t _rx_timer;
-    uint16_t _rx_sr;
-    uint8_t _rx_counter;
-
-    enum {
-        TX_IDLE,
-        TX_BIT,
-    } _tx_state;
-    std::string _tx_buffer;
-    uint32_t _tx_timer;
-    uint16_t _tx_sr;
-    uint8_t _tx_counter;
 };
 
 #endif
@@ -0,0 +1,81 @@
+#include "VcdCapture.h"
+
+VcdCapture::VcdCapture(const debug_items& di, const std::string& hart_path, const std::string& path,
+                       const Window& window):
+    _di(di),
+    _pc(di[hart_path + "pc"]),
+    _out(path),
+    _window(window)
+{
+    if (!_window.from_cycle.has_value() && !_window.from_pc.has_value())
+        _window.from_cycle = 0;
+}
+
+VcdCapture::~VcdCapture() {
+    finish();
+}
+
+bool VcdCapture::good() const {
+    return _out.good();
+}
+
+std::unique_ptr<cxxrtl::vcd_writer> VcdCapture::writer() const {
+    auto writer = std::make_unique<cxxrtl::vcd_writer>();
+    writer->add(_di);
+    return writer;
+}
+
+void VcdCapture::sample(uint64_t cycle, uint64_t timestamp) {
+    if (_state == WAITING) {
+        if (_pc.outline)
+            _pc.outline->eval();
+        if ((_window.from_cycle.has_value() && cycle >= *_window.from_cycle) ||
+                (_window.from_pc.has_value() && _pc.curr[0] == *_window.from_pc)) {
+            _state = CAPTURING;
+            _started = _segment_started = cycle;
+            _segment = writer();
+        } else {
+            return;
+        }
+    }
+
+    if (_state == DONE)
+        return;
+    if (_window.cycles.has_value() && cycle >= _started + *_window.cycles) {
+        finish();
+        return;
+    }
+
+    if (_window.last.has_value() && cycle >= _segment_started + *_window.last) {
+        _previous = std::move(_segment);
+        _segment = writer();
+        _segment_started = cycle;
+    }
+
+    _segment->sample(timestamp);
+
+    if (!_window.last.has_value() && _segment->buffer.size() >= BUFFER) {
+        _out << _segment->buffer;
+        _segment->buffer.clear();
+    }
+}
+
+void VcdCapture::finish() {
+    if (_state != CAPTURING)
+        return;
+    _state = DONE;
+
+    if (_previous) {
+        // Splice the newer segment on after the older one's definitions.
+        static const std::string enddefinitions = "$enddefinitions $end\n";
+        _out << _previous->buffer;
+        size_t body = _segment->buffer.find(enddefinitions);
+        _out << _segment->buffer.substr(body == std::string::npos ? 0 : body + enddefinitions.size());
+    } else {
+        _out << _segment->buffer;
+    }
+    _out.flush();
+
+    _previous.reset();
+    _segment.reset();
+}
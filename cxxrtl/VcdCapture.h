@@ -0,0 +1,62 @@
+#ifndef VCD_CAPTURE_H
+#define VCD_CAPTURE_H
+
+#include <fstream>
+#include <memory>
+#include <optional>
+#include <string>
+
+#include <cxxrtl/cxxrtl_vcd.h>
+#include <sae.h>
+
+// Writes a VCD of some window of the run, streaming it to disk as it goes.
+//
+// Capture starts on the first of `from_cycle` or the hart's pc reaching
+// `from_pc` (or immediately if neither is given), and stops after `cycles`
+// cycles. With `last`, only the final `last` cycles captured are kept, for a
+// look at what led up to a fault.
+class VcdCapture {
+public:
+    struct Window {
+        std::optional<uint64_t> from_cycle;
+        std::optional<uint32_t> from_pc;
+        std::optional<uint64_t> cycles;
+        std::optional<uint64_t> last;
+    };
+
+    VcdCapture(const debug_items& di, const std::string& hart_path, const std::string& path,
+               const Window& window);
+    ~VcdCapture();
+
+    bool good() const;
+
+    // Call after every step.
+    void sample(uint64_t cycle, uint64_t timestamp);
+
+private:
+    // Flush to disk once this much has built up.
+    static const size_t BUFFER = 1 << 20;
+
+    std::unique_ptr<cxxrtl::vcd_writer> writer() const;
+    void finish();
+
+    const debug_items& _di;
+    const debug_item& _pc;
+    std::ofstream _out;
+    Window _window;
+
+    enum {
+        WAITING,
+        CAPTURING,
+        DONE,
+    } _state = WAITING;
+    uint64_t _started = 0;
+
+    // With `last`, we keep two segments of up to `last` cycles each, starting
+    // a new writer for each so its first sample has every value in full.
+    uint64_t _segment_started = 0;
+    std::unique_ptr<cxxrtl::vcd_writer> _segment;
+    std::unique_ptr<cxxrtl::vcd_writer> _previous;
+};
+
+#endif
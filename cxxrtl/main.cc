@@ -1,40 +1,139 @@
+#include <algorithm>
 #include <cstring>
 #include <iostream>
-#include <fstream>
+#include <memory>
 #include <optional>
 #include <chrono>
+#include <vector>
 
-#include <cxxrtl/cxxrtl_vcd.h>
 #include <sae.h>
 
+#include "ProgramLoader.h"
+#include "Profiler.h"
+#include "Semihost.h"
+#include "SpinDetector.h"
+#include "Tracer.h"
 #include "UartConnector.h"
+#include "VcdCapture.h"
 
 static cxxrtl_design::p_sae top;
-static cxxrtl::vcd_writer vcd;
 uint64_t vcd_time = 0;
 
 int main(int argc, char **argv) {
     std::optional<std::string> vcd_out = std::nullopt;
+    VcdCapture::Window vcd_window;
+    std::optional<std::string> trace_out = std::nullopt;
+    std::optional<std::string> profile_out = std::nullopt;
+    std::optional<std::string> bin_path = std::nullopt;
+    std::optional<std::string> elf_path = std::nullopt;
+    std::vector<std::string> regs;
+    std::string uart_in;
+    std::vector<std::pair<uint64_t, std::string>> uart_scheduled;
+    bool fast_forward = true;
+    uint64_t max_cycles = 100000;
 
     for (int i = 1; i < argc; ++i) {
         if (strcmp(argv[i], "--vcd") == 0 && argc >= (i + 2)) {
             vcd_out = std::string(argv[++i]);
+        } else if (strcmp(argv[i], "--vcd-from-cycle") == 0 && argc >= (i + 2)) {
+            vcd_window.from_cycle = strtoull(argv[++i], nullptr, 0);
+        } else if (strcmp(argv[i], "--vcd-from-pc") == 0 && argc >= (i + 2)) {
+            vcd_window.from_pc = strtoul(argv[++i], nullptr, 0);
+        } else if (strcmp(argv[i], "--vcd-cycles") == 0 && argc >= (i + 2)) {
+            vcd_window.cycles = strtoull(argv[++i], nullptr, 0);
+        } else if (strcmp(argv[i], "--vcd-last") == 0 && argc >= (i + 2)) {
+            vcd_window.last = strtoull(argv[++i], nullptr, 0);
+        } else if (strcmp(argv[i], "--trace") == 0 && argc >= (i + 2)) {
+            trace_out = std::string(argv[++i]);
+        } else if (strcmp(argv[i], "--profile") == 0 && argc >= (i + 2)) {
+            profile_out = std::string(argv[++i]);
+        } else if (strcmp(argv[i], "--bin") == 0 && argc >= (i + 2)) {
+            bin_path = std::string(argv[++i]);
+        } else if (strcmp(argv[i], "--elf") == 0 && argc >= (i + 2)) {
+            elf_path = std::string(argv[++i]);
+        } else if (strcmp(argv[i], "--max-cycles") == 0 && argc >= (i + 2)) {
+            max_cycles = strtoull(argv[++i], nullptr, 0);
+        } else if (strcmp(argv[i], "--reg") == 0 && argc >= (i + 2)) {
+            regs.push_back(argv[++i]);
+        } else if (strcmp(argv[i], "--uart") == 0 && argc >= (i + 2)) {
+            uart_in += argv[++i];
+        } else if (strcmp(argv[i], "--uart-at") == 0 && argc >= (i + 2)) {
+            // CYCLE=BYTES
+            char *end;
+            uint64_t cycle = strtoull(argv[++i], &end, 0);
+            if (*end != '=') {
+                std::cerr << "expected --uart-at CYCLE=BYTES, not \"" << argv[i] << "\"" << std::endl;
+                return 2;
+            }
+            uart_scheduled.emplace_back(cycle, end + 1);
+        } else if (strcmp(argv[i], "--no-fast-forward") == 0) {
+            fast_forward = false;
         } else {
             std::cerr << "unknown argument \"" << argv[i] << "\"" << std::endl;
             return 2;
         }
     }
 
+    if (bin_path.has_value() && elf_path.has_value()) {
+        std::cerr << "only one of --bin and --elf may be given" << std::endl;
+        return 2;
+    }
+
+    debug_items di;
+    top.debug_info(&di, nullptr, "top ");
+
+    std::unique_ptr<VcdCapture> vcd;
     if (vcd_out.has_value()) {
-        debug_items di;
-        top.debug_info(&di, nullptr, "top ");
-        vcd.add(di);
+        vcd = std::make_unique<VcdCapture>(di, "top hart ", *vcd_out, vcd_window);
+        if (!vcd->good()) {
+            std::cerr << "could not open \"" << *vcd_out << "\"" << std::endl;
+            return 2;
+        }
     }
 
+    std::unique_ptr<Tracer> tracer;
+    if (trace_out.has_value()) {
+        tracer = std::make_unique<Tracer>(di, "top ", *trace_out);
+        if (!tracer->good()) {
+            std::cerr << "could not open \"" << *trace_out << "\"" << std::endl;
+            return 2;
+        }
+    }
+
+    std::unique_ptr<Profiler> profiler;
+    if (profile_out.has_value())
+        profiler = std::make_unique<Profiler>(di, "top hart ");
+
+    // Without a program, we run the image baked into the design and play the
+    // part of its user.
+    bool program = bin_path.has_value() || elf_path.has_value();
+
+    ProgramLoader loader(di, "top hart ");
+    if (program) {
+        loader.clear();
+        if (bin_path.has_value() && !loader.load_bin(*bin_path))
+            return 2;
+        if (elf_path.has_value() && !loader.load_elf(*elf_path))
+            return 2;
+    }
+    for (auto& reg : regs)
+        if (!loader.set_reg(reg))
+            return 2;
+
+    const debug_item& hart_state = di["top hart state"];
+
     UartConnector uart(top);
+    uart.tx(uart_in);
+    for (auto& [cycle, b] : uart_scheduled)
+        uart.tx_at(cycle, b);
+
+    SpinDetector spins(di, "top ", "top hart ");
+    Semihost semihost(top, di, "top hart ");
+    uint64_t skipped = 0;
 
     int rc = 0;
     bool done = false;
+    std::optional<uint64_t> faulted_at = std::nullopt;
 
     auto start = std::chrono::high_resolution_clock::now();
 
@@ -44,15 +143,25 @@ int main(int argc, char **argv) {
     } state = RECV_QUERY;
     std::string recvd;
 
-    for (int i = 0; i < 100000 && !done; ++i) {
+    for (uint64_t i = 0; i < max_cycles && !done; ++i) {
+        if (uart.advance(i))
+            spins.disturb();
+
         top.p_clk.set(true);
         top.step();
-        vcd.sample(vcd_time++);
+        if (vcd)
+            vcd->sample(i, vcd_time);
+        vcd_time++;
 
         switch (uart.tick()) {
         case UartConnector::NOP:
             break;
         case UartConnector::RECEIVED:
+            if (program) {
+                std::cout << (char)uart.last_byte() << std::flush;
+                break;
+            }
+
             recvd += (char)uart.last_byte();
 
             switch (state) {
@@ -74,23 +183,82 @@ int main(int argc, char **argv) {
             break;
         }
 
+        if (profiler)
+            profiler->tick(i);
+
+        if (fast_forward) {
+            if (auto lap = spins.tick(i)) {
+                // Nothing can change until the next byte arrives (or ever),
+                // so go round the loop as many times as fit in the meantime.
+                // The cycle it arrives on has to be stepped, not skipped, so
+                // the laps end before it.
+                uint64_t until = std::min(uart.next_arrival().value_or(max_cycles), max_cycles);
+                uint64_t laps = (until - i - 1) / *lap;
+                if (profiler && laps)
+                    profiler->skip(i, *lap, laps);
+                i += laps * *lap;
+                vcd_time += 2 * laps * *lap;
+                skipped += laps * *lap;
+                if (tracer && laps)
+                    tracer->skip(laps * *lap);
+            }
+        }
+
+        if (program) {
+            // The UART is bypassed, so anything the hart wrote before
+            // faulting has already arrived.
+            hart_state.outline->eval();
+            if (hart_state.curr[0] == 1 /* FAULTED */) {
+                faulted_at = vcd_time >> 1;
+                done = true;
+            }
+        }
+
         top.p_clk.set(false);
         top.step();
-        vcd.sample(vcd_time++);
+        if (vcd)
+            vcd->sample(i, vcd_time);
+        vcd_time++;
+
+        // Outputs only settle after the falling edge's step.
+        if (tracer)
+            tracer->tick(i);
+        if (semihost.tick(i)) {
+            spins.disturb();
+            if (semihost.exit_code().has_value())
+                done = true;
+        }
+    }
+
+    if (program && faulted_at.has_value()) {
+        const debug_item& xmem = di["top hart xmem"];
+        std::cout << std::endl
+                  << "hart faulted on cycle " << std::dec << *faulted_at
+                  << ", fault_code=" << di["top hart fault_code"].curr[0]
+                  << ", pc=0x" << std::hex << di["top hart pc"].curr[0]
+                  << ", a0=0x" << xmem.curr[10]
+                  << std::dec << std::endl;
+    }
+
+    if (auto exit_code = semihost.exit_code()) {
+        std::cout << std::endl << "hart exited with code " << *exit_code << std::endl;
+        rc = (int)*exit_code;
     }
 
     if (!done) rc = 1;
 
+    if (profiler && !profiler->write(*profile_out)) {
+        std::cerr << "could not write \"" << *profile_out << "\"" << std::endl;
+        rc = 2;
+    }
+
     auto finish = std::chrono::high_resolution_clock::now();
     auto duration = std::chrono::duration_cast<std::chrono::nanoseconds>(finish - start).count();
 
     std::cout << "finished on cycle " << std::dec << (vcd_time >> 1) << ", rc=" << rc << std::endl;
+    if (skipped)
+        std::cout << "fast-forwarded " << skipped << " cycles of busy-wait" << std::endl;
     std::cout << "took " << duration << "ns = " << (duration / (vcd_time >> 1)) << "ns/cyc" << std::endl;
 
-    if (vcd_out.has_value()) {
-        std::ofstream of(*vcd_out);
-        of << vcd.buffer;
-    }
-
     return rc;
 }
@@ -1,13 +1,10 @@
-import niar
-
-from . import rtl
-from .targets import cxxrtl, icebreaker
-
 __all__ = ["Sae"]
 
 
-class Sae(niar.Project):
-    name = "sae"
-    top = rtl.Top
-    targets = [icebreaker]
-    cxxrtl_targets = [cxxrtl]
\ No newline at end of file
+def __getattr__(name):
+    # Only the CLI needs the project (and with it niar and amaranth.build);
+    # don't make everything that imports a submodule pay for it.
+    if name == "Sae":
+        from .project import Sae
+        return Sae
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,3 +1,3 @@
-from . import Sae
+from .project import Sae, cli
 
-Sae().main()
+cli(Sae())
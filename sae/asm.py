@@ -0,0 +1,783 @@
+import argparse
+import re
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .image import EM_RISCV
+from .rtl.isa_rv32 import RV32I
+
+__all__ = ["AsmError", "Assembler", "Program", "assemble"]
+
+
+class AsmError(ValueError):
+    filename: str
+    lineno: Optional[int]
+    line: Optional[str]
+
+    def __init__(self, message, *, filename="<input>", lineno=None, line=None):
+        super().__init__(message)
+        self.message = message
+        self.filename = filename
+        self.lineno = lineno
+        self.line = line
+
+    def __str__(self):
+        where = self.filename if self.lineno is None else f"{self.filename}:{self.lineno}"
+        if self.line is None:
+            return f"{where}: {self.message}"
+        return f"{where}: {self.message}\n    {self.line.strip()}"
+
+
+class _Undefined(Exception):
+    pass
+
+
+@dataclass
+class Program:
+    """
+    An assembled program: `image` is loaded at `base`, followed by `bss`
+    zeroed bytes.
+    """
+
+    base: int
+    image: bytes
+    bss: int
+    entry: int
+    symbols: dict[str, int]
+    globals: set[str] = field(default_factory=set)
+    # The symbols that are addresses, not `.equ` constants.
+    labels: set[str] = field(default_factory=set)
+
+    def sysmem_init(self):
+        """Halfwords for a hart's sysmem, from address 0; see `Hart.sysmem_init_for`."""
+        data = bytes(self.base) + self.image
+        data += b"\0" * (len(data) & 1)
+        return [lo | (hi << 8) for lo, hi in zip(data[::2], data[1::2])]
+
+    def elf(self):
+        """A static ELF32 executable with one loadable segment and a symbol table."""
+        return _elf(self)
+
+
+# Sections are laid out in this order whatever order they're written in, as
+# rv/linker.ld does; sections within a group in order of first appearance.
+_SECTION_GROUPS = [".text.startup", ".text", ".rodata", ".sdata", ".data", ".sbss", ".bss"]
+_NOBITS = (".sbss", ".bss")
+
+
+def _section_group(name):
+    for i, prefix in enumerate(_SECTION_GROUPS):
+        if name == prefix or name.startswith(prefix + "."):
+            return i
+    return None
+
+
+@dataclass
+class _Section:
+    name: str
+    items: list = field(default_factory=list)
+    align: int = 4
+    addr: int = 0
+    nobits: bool = False
+
+
+@dataclass
+class _Offset:
+    offset: object
+    reg: RV32I.Reg
+
+
+@dataclass
+class _Item:
+    kind: str
+    args: tuple
+    lineno: int
+    line: str
+    size: int = 0
+    addr: int = 0
+
+
+_REGS = {name.lower(): reg for reg in RV32I.Reg for name in reg.aliases}
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<num>0[xX][0-9a-fA-F_]+|0[bB][01_]+(?![\w.$])|[0-9][0-9_]*)(?P<local>[bf])?(?![\w.$])
+      | %(?P<reloc>hi|lo)\(
+      | (?P<sym>[A-Za-z_.$][\w.$]*)
+      | '(?P<char>\\.|[^\\'])'
+      | (?P<op><<|>>|[-+*/&|^~()])
+    )""", re.X)
+
+_BINARY = {"|": 1, "^": 2, "&": 3, "<<": 4, ">>": 4, "+": 5, "-": 5, "*": 6, "/": 6}
+
+
+def _div(a, b):
+    # Truncating, as C does, and exact however large the operands.
+    if b == 0:
+        raise ValueError("Division by zero.")
+    quotient = abs(a) // abs(b)
+    return -quotient if (a < 0) != (b < 0) else quotient
+
+
+_APPLY = {
+    "|": int.__or__,
+    "^": int.__xor__,
+    "&": int.__and__,
+    "<<": int.__lshift__,
+    ">>": int.__rshift__,
+    "+": int.__add__,
+    "-": int.__sub__,
+    "*": int.__mul__,
+    "/": _div,
+}
+
+_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "0": "\0", "\\": "\\", "\"": "\"", "'": "'"}
+_ESCAPE = re.compile(r"\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)")
+
+_COMMENT = re.compile(r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)')|[#;].*""")
+_LABEL = re.compile(r"\s*([A-Za-z_.$][\w.$]*|[0-9]+):")
+_MNEMONIC = re.compile(r"\s*([A-Za-z_.][\w.]*)\s*")
+
+
+def _shown(name):
+    """`name` as written in the source: a local label's forward reference."""
+    if "\x02" in name:
+        number = name[2:name.index("\x02")]
+        return f"{number}f"
+    return name
+
+
+def _hi(v):
+    return ((v + 0x800) >> 12) & 0xFFFFF
+
+
+def _lo(v):
+    v &= 0xFFF
+    return v - 0x1000 if v & 0x800 else v
+
+
+def _unescape(s):
+    def sub(m):
+        e = m[1]
+        if e[0] == "x":
+            return chr(int(e[1:], 16))
+        if e[0] in "01234567":
+            return chr(int(e, 8))
+        return _ESCAPES.get(e, e)
+    return _ESCAPE.sub(sub, s)
+
+
+def _split_operands(text):
+    ops = []
+    depth = 0
+    quote = None
+    start = 0
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if quote:
+            if c == "\\":
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            ops.append(text[start:i].strip())
+            start = i + 1
+        i += 1
+    if last := text[start:].strip():
+        ops.append(last)
+    elif ops:
+        ops.append(last)
+    return ops
+
+
+class Assembler:
+    """
+    A two-pass assembler for RV32I, built on the `RV32I` instruction encoders.
+
+    Source is GNU-as flavoured: `label:` and numeric local labels (`1:`,
+    referenced as `1b` or `1f`), `.word`/`.half`/`.byte`/`.string` and friends,
+    `.align`, `.equ`, sections, expressions with `%hi`/`%lo`, and the usual
+    pseudo-instructions. `li`, `call` and `tail` take one instruction where
+    their operand allows it and two otherwise; sizes are iterated to a fixed
+    point before anything is encoded.
+
+    Lines are given with `feed`; `program` lays everything out and encodes it.
+    """
+
+    def __init__(self, *, base=0, filename="<input>"):
+        self.base = base
+        self.filename = filename
+        self.lineno = 0
+        self._sections = {}
+        self._section = self._switch(".text")
+        self._globals = set()
+        self._locals = {}
+
+    def feed(self, source):
+        """Feed a string of source, or any iterable of lines."""
+        if isinstance(source, str):
+            source = source.splitlines()
+        for line in source:
+            self.lineno += 1
+            try:
+                self._feed_line(line)
+            except AsmError:
+                raise
+            except Exception as e:
+                raise self._error(str(e), lineno=self.lineno, line=line) from e
+
+    def _error(self, message, *, lineno=None, line=None):
+        return AsmError(message, filename=self.filename, lineno=lineno, line=line)
+
+    def _switch(self, name):
+        if _section_group(name) is None:
+            raise ValueError(f"Unknown section {name!r}.")
+        if (section := self._sections.get(name)) is None:
+            section = self._sections[name] = _Section(name, nobits=name.startswith(_NOBITS))
+        self._section = section
+        return section
+
+    def _add(self, kind, args, line):
+        self._section.items.append(_Item(kind, args, self.lineno, line))
+
+    def _feed_line(self, line):
+        text = _COMMENT.sub(lambda m: m[1] or "", line) if ("#" in line or ";" in line) else line
+
+        pos = 0
+        while m := _LABEL.match(text, pos):
+            name = m[1]
+            if name.isdigit():
+                count = self._locals[name] = self._locals.get(name, 0) + 1
+                name = f".L{name}\x02{count}"
+            self._add("label", (name,), line)
+            pos = m.end()
+
+        m = _MNEMONIC.match(text, pos)
+        if not m:
+            if text[pos:].strip():
+                raise ValueError("Expected an instruction or directive.")
+            return
+        mnemonic = m[1].lower()
+        ops = _split_operands(text[m.end():])
+
+        if mnemonic[0] == ".":
+            self._directive(mnemonic, ops, line)
+        else:
+            self._add("insn", (mnemonic, [self._operand(op) for op in ops]), line)
+
+    def _directive(self, directive, ops, line):
+        match directive:
+            case ".text" | ".data" | ".rodata" | ".bss":
+                self._switch(directive)
+            case ".section":
+                self._switch(ops[0])
+            case ".globl" | ".global":
+                self._globals.update(ops)
+            case ".local" | ".type" | ".size" | ".file" | ".ident" | ".option" | ".attribute":
+                pass
+            case ".equ" | ".set":
+                name, value = ops
+                self._add("equ", (name, self._expr(value)), line)
+            case ".byte" | ".half" | ".short" | ".2byte" | ".word" | ".long" | ".4byte":
+                width = {"b": 1, "h": 2, "s": 2, "2": 2}.get(directive[1], 4)
+                self._add("data", (width, [self._expr(op) for op in ops]), line)
+            case ".ascii" | ".string" | ".asciz":
+                nul = b"" if directive == ".ascii" else b"\0"
+                data = b"".join(self._string(op) + nul for op in ops)
+                self._add("bytes", (data,), line)
+            case ".zero" | ".space" | ".skip":
+                self._add("space", (self._expr(ops[0]), self._expr(ops[1]) if len(ops) > 1 else 0), line)
+            case ".align" | ".p2align" | ".balign":
+                n = self._constant(ops[0])
+                boundary = n if directive == ".balign" else 1 << n
+                if boundary & (boundary - 1):
+                    raise ValueError(f"Alignment {boundary} isn't a power of two.")
+                self._section.align = max(self._section.align, boundary)
+                self._add("align", (boundary,), line)
+            case _:
+                raise ValueError(f"Unknown directive {directive!r}.")
+
+    def _string(self, op):
+        if len(op) < 2 or op[0] != "\"" or op[-1] != "\"":
+            raise ValueError(f"Expected a string, not {op!r}.")
+        return _unescape(op[1:-1]).encode("latin-1")
+
+    def _constant(self, op):
+        value = self._expr(op)
+        if type(value) is not int:
+            raise ValueError(f"Expected a constant, not {op!r}.")
+        return value
+
+    def _operand(self, op):
+        if (reg := _REGS.get(op.lower())) is not None:
+            return reg
+        if op.endswith(")") and (i := op.rfind("(")) >= 0:
+            if (reg := _REGS.get(op[i + 1:-1].strip().lower())) is not None:
+                offset = op[:i].strip()
+                return _Offset(self._expr(offset) if offset else 0, reg)
+        return self._expr(op)
+
+    def _expr(self, text):
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            m = _TOKEN.match(text, pos)
+            if not m:
+                raise ValueError(f"Can't parse expression {text!r}.")
+            pos = m.end()
+            if (num := m["num"]) is not None:
+                if m["local"]:
+                    count = self._locals.get(num, 0)
+                    if m["local"] == "b":
+                        if not count:
+                            raise ValueError(f"No local label {num} before {num}b.")
+                    else:
+                        count += 1
+                    tokens.append(("sym", f".L{num}\x02{count}"))
+                else:
+                    tokens.append(int(num, 0))
+            elif (reloc := m["reloc"]) is not None:
+                tokens += [("reloc", reloc), ("op", "(")]
+            elif (sym := m["sym"]) is not None:
+                tokens.append((".",) if sym == "." else ("sym", sym))
+            elif (char := m["char"]) is not None:
+                tokens.append(ord(_unescape(char)))
+            else:
+                tokens.append(("op", m["op"]))
+        if not tokens:
+            raise ValueError("Expected an expression.")
+
+        tokens.reverse()
+        node = self._parse_binary(tokens, 0)
+        if tokens:
+            raise ValueError(f"Can't parse expression {text!r}.")
+        return node
+
+    def _parse_binary(self, tokens, min_prec):
+        lhs = self._parse_unary(tokens)
+        while tokens and tokens[-1][0] == "op" and _BINARY.get(tokens[-1][1], 0) > min_prec:
+            op = tokens.pop()[1]
+            rhs = self._parse_binary(tokens, _BINARY[op])
+            lhs = _APPLY[op](lhs, rhs) if type(lhs) is type(rhs) is int else (op, lhs, rhs)
+        return lhs
+
+    def _parse_unary(self, tokens):
+        if not tokens:
+            raise ValueError("Unexpected end of expression.")
+        token = tokens.pop()
+        if type(token) is int or token[0] in ("sym", "."):
+            return token
+        if token[0] == "reloc":
+            tokens.pop()
+            inner = self._parse_binary(tokens, 0)
+            self._expect_close(tokens)
+            if type(inner) is int:
+                return _hi(inner) if token[1] == "hi" else _lo(inner)
+            return (token[1], inner)
+        match token[1]:
+            case "(":
+                inner = self._parse_binary(tokens, 0)
+                self._expect_close(tokens)
+                return inner
+            case "+":
+                return self._parse_unary(tokens)
+            case "-":
+                inner = self._parse_unary(tokens)
+                return -inner if type(inner) is int else ("neg", inner)
+            case "~":
+                inner = self._parse_unary(tokens)
+                return ~inner if type(inner) is int else ("not", inner)
+        raise ValueError(f"Unexpected {token[1]!r} in expression.")
+
+    @staticmethod
+    def _expect_close(tokens):
+        if not tokens or tokens.pop() != ("op", ")"):
+            raise ValueError("Expected ')'.")
+
+    # Layout and encoding.
+
+    def _eval(self, node, dot):
+        if type(node) is int:
+            return node
+        match node:
+            case ("sym", name):
+                try:
+                    return self._symbols[name]
+                except KeyError:
+                    raise _Undefined(name) from None
+            case (".",):
+                return dot
+            case ("hi", inner):
+                return _hi(self._eval(inner, dot))
+            case ("lo", inner):
+                return _lo(self._eval(inner, dot))
+            case ("neg", inner):
+                return -self._eval(inner, dot)
+            case ("not", inner):
+                return ~self._eval(inner, dot)
+            case (op, lhs, rhs):
+                return _APPLY[op](self._eval(lhs, dot), self._eval(rhs, dot))
+        assert False, node
+
+    def _sections_in_order(self):
+        return sorted(
+            (s for s in self._sections.values() if s.items),
+            key=lambda s: _section_group(s.name))
+
+    def program(self):
+        """Lay out and encode everything fed so far."""
+        sections = self._sections_in_order()
+        self._symbols = {}
+        labels = set()
+
+        # Relaxable items only ever grow, so this settles.
+        for _ in range(64):
+            changed = False
+            addr = self.base
+            for section in sections:
+                addr = -(-addr // section.align) * section.align
+                section.addr = addr
+                for item in section.items:
+                    item.addr = addr
+                    match item.kind:
+                        case "label" | "equ":
+                            value = addr if item.kind == "label" else self._try_eval(item, item.args[1])
+                            name = item.args[0]
+                            if item.kind == "label":
+                                labels.add(name)
+                            if value is not None and self._symbols.get(name) != value:
+                                self._symbols[name] = value
+                                changed = True
+                        case "align":
+                            item.size = -addr % item.args[0]
+                        case _:
+                            size = self._size(item)
+                            if size > item.size:
+                                item.size = size
+                                changed = True
+                    addr += item.size
+            if not changed:
+                break
+        else:
+            raise self._error("Layout didn't settle.")
+
+        image = bytearray()
+        end = self.base
+        for section in sections:
+            end = section.addr + sum(item.size for item in section.items)
+            if section.nobits:
+                # Laid out last, so never followed by anything in the image.
+                continue
+            image += bytes(section.addr - self.base - len(image))
+            for item in section.items:
+                try:
+                    data = self._emit(item, section)
+                except _Undefined as e:
+                    raise self._error(f"Undefined symbol {_shown(e.args[0])!r}.",
+                                      lineno=item.lineno, line=item.line) from None
+                except AsmError:
+                    raise
+                except Exception as e:
+                    raise self._error(str(e), lineno=item.lineno, line=item.line) from e
+                assert len(data) == item.size, (item, data)
+                image += data
+
+        symbols = {name: value for name, value in self._symbols.items() if not name.startswith(".L")}
+        entry = symbols.get("_start", self.base)
+        return Program(base=self.base, image=bytes(image), bss=end - self.base - len(image), entry=entry,
+                       symbols=symbols, globals=self._globals & symbols.keys(),
+                       labels=labels & symbols.keys())
+
+    def _try_eval(self, item, node, dot=None):
+        try:
+            return self._eval(node, item.addr if dot is None else dot)
+        except _Undefined:
+            return None
+        except ValueError as e:
+            raise self._error(str(e), lineno=item.lineno, line=item.line) from e
+
+    def _size(self, item):
+        args = item.args
+        match item.kind:
+            case "data":
+                return args[0] * len(args[1])
+            case "bytes":
+                return len(args[0])
+            case "space":
+                if (n := self._try_eval(item, args[0])) is None:
+                    return 0
+                return n
+            case "insn":
+                mnemonic, ops = args
+                match mnemonic:
+                    case "li":
+                        value = self._try_eval(item, ops[1]) if len(ops) == 2 else 0
+                        return 4 if value is None or len(self._li(value)) == 1 else 8
+                    case "call" | "tail":
+                        target = self._try_eval(item, ops[-1]) if ops else None
+                        return 4 if target is None or _fits(target - item.addr, 21) else 8
+                    case "la" | "lla":
+                        return 8
+                return 4
+        assert False, item
+
+    def _emit(self, item, section):
+        args = item.args
+        match item.kind:
+            case "label" | "equ" | "align":
+                if section.name.startswith(".text") and item.size % 4 == 0:
+                    # Pad code with nops.
+                    return RV32I.NOP.value().to_bytes(4, "little") * (item.size // 4)
+                return bytes(item.size)
+            case "data" | "bytes" | "insn" if section.nobits:
+                raise ValueError(f"Initialised data in {section.name}.")
+            case "data":
+                width, exprs = args
+                mask = (1 << (width * 8)) - 1
+                return b"".join((self._eval(e, item.addr) & mask).to_bytes(width, "little")
+                                for e in exprs)
+            case "bytes":
+                return args[0]
+            case "space":
+                return bytes([self._eval(args[1], item.addr) & 0xFF]) * item.size
+            case "insn":
+                words = self._encode(item)
+                return b"".join(struct.pack("<I", w) for w in words)
+        assert False, item
+
+    @staticmethod
+    def _li(value):
+        value = ((value + 2**31) & 0xFFFF_FFFF) - 2**31
+        if _fits(value, 12):
+            return [("addi", value)]
+        if not value & 0xFFF:
+            return [("lui", _hi(value))]
+        return [("lui", _hi(value)), ("addi", _lo(value))]
+
+    def _encode(self, item):
+        mnemonic, ops = item.args
+        pc = item.addr
+        ev = lambda op: self._eval(op, pc)
+
+        match mnemonic, ops:
+            case "li", [RV32I.Reg() as rd, value]:
+                value = ev(value)
+                steps = self._li(value)
+                if item.size == 8 and len(steps) == 1:
+                    steps = [("lui", _hi(value)), ("addi", _lo(value))]
+                words = []
+                src = _REGS["zero"]
+                for op, imm in steps:
+                    if op == "lui":
+                        words.append(RV32I.LUI.value(rd=rd, imm=imm))
+                        src = rd
+                    else:
+                        words.append(RV32I.ADDI.value(rd=rd, rs1=src, imm=imm))
+                return words
+            case ("la" | "lla"), [RV32I.Reg() as rd, target]:
+                off = ev(target) - pc
+                return [RV32I.AUIPC.value(rd=rd, imm=_hi(off)),
+                        RV32I.ADDI.value(rd=rd, rs1=rd, imm=_lo(off))]
+            case ("call" | "tail"), [target]:
+                off = ev(target) - pc
+                link = _REGS["ra" if mnemonic == "call" else "zero"]
+                if item.size == 4:
+                    return [self._insn("jal", RV32I.JAL, [link, off], pc=pc, relative=False)]
+                scratch = link if mnemonic == "call" else _REGS["t1"]
+                return [RV32I.AUIPC.value(rd=scratch, imm=_hi(off)),
+                        RV32I.JALR.value(rd=link, rs1=scratch, imm=_lo(off))]
+            case ("li" | "la" | "lla" | "call" | "tail"), _:
+                raise ValueError(f"Bad operands for {mnemonic!r}.")
+
+        insn, operands = self._resolve(mnemonic, ops)
+        operands = [op if isinstance(op, (RV32I.Reg, _Offset, str)) else ev(op) for op in operands]
+        return [self._insn(mnemonic, insn, operands, pc=pc)]
+
+    def _resolve(self, mnemonic, ops):
+        zero, ra = _REGS["zero"], _REGS["ra"]
+        match mnemonic, ops:
+            case ("beqz" | "bnez" | "bltz" | "bgez"), [rs, target]:
+                return getattr(RV32I, mnemonic[:3].upper()), [rs, zero, target]
+            case "blez", [rs, target]:
+                return RV32I.BGE, [zero, rs, target]
+            case "bgtz", [rs, target]:
+                return RV32I.BLT, [zero, rs, target]
+            case ("bgt" | "ble" | "bgtu" | "bleu"), [rs, rt, target]:
+                swapped = {"bgt": "BLT", "ble": "BGE", "bgtu": "BLTU", "bleu": "BGEU"}[mnemonic]
+                return getattr(RV32I, swapped), [rt, rs, target]
+            case "neg", [rd, rs]:
+                return RV32I.SUB, [rd, zero, rs]
+            case "jal", [target]:
+                return RV32I.JAL, [ra, target]
+            case "jr", [rs]:
+                return RV32I.JALR, [zero, rs, 0]
+            case "jalr", [rs]:
+                return RV32I.JALR, [ra, rs, 0]
+            case "jalr", [rd, _Offset(offset=off, reg=rs)]:
+                return RV32I.JALR, [rd, rs, off]
+            case "fence", []:
+                return RV32I.FENCE, ["iorw", "iorw"]
+            case "fence", [pred, succ]:
+                return RV32I.FENCE, [self._fence_arg(pred), self._fence_arg(succ)]
+            case (("add" | "and" | "or" | "xor" | "slt" | "sltu" | "sll" | "srl" | "sra"),
+                  [rd, rs, imm]) if not isinstance(imm, RV32I.Reg):
+                return getattr(RV32I, mnemonic.upper() + "I"), [rd, rs, imm]
+        opname = mnemonic.upper().replace(".", "_")
+        if len(opname) == 1:
+            opname += "_"
+        insn = getattr(RV32I, opname, None)
+        if not hasattr(insn, "asm_args") or opname.startswith("_") or opname == "LI":
+            raise ValueError(f"Unknown instruction {mnemonic!r}.")
+        return insn, ops
+
+    @staticmethod
+    def _fence_arg(arg):
+        # Parsed as a symbol; "rw" and friends are the only ones that make sense.
+        match arg:
+            case ("sym", name) if re.fullmatch(r"[iorw]+", name):
+                return name
+        raise ValueError(f"Bad fence argument {arg!r}.")
+
+    def _insn(self, mnemonic, insn, operands, *, pc, relative=True):
+        names = insn.asm_args
+        if len(operands) != len(names):
+            raise ValueError(
+                f"{mnemonic!r} takes {len(names)} operands ({', '.join(names)}), "
+                f"not {len(operands)}.")
+        kwargs = {}
+        for name, op in zip(names, operands):
+            match name:
+                case "rd" | "rs1" | "rs2":
+                    if not isinstance(op, RV32I.Reg):
+                        raise ValueError(f"Expected a register for {name}.")
+                case "rs1off":
+                    if not isinstance(op, _Offset):
+                        raise ValueError(f"Expected offset(register), not {op!r}.")
+                    off = self._eval(op.offset, pc)
+                    _check(_fits(off, 12), f"Offset {off} out of range.")
+                    op = (off, op.reg)
+                case "imm" if isinstance(insn, (RV32I.B, RV32I.J)):
+                    if relative:
+                        op -= pc
+                    bits = 13 if isinstance(insn, RV32I.B) else 21
+                    _check(_fits(op, bits) and not op & 1,
+                           f"Branch target {op:+} out of range (or misaligned).")
+                case "imm" if isinstance(insn, RV32I.U):
+                    _check(0 <= op <= 0xFFFFF, f"Immediate 0x{op:x} out of range.")
+                case "imm":
+                    _check(_fits(op, 12), f"Immediate {op} out of range.")
+                case "shamt":
+                    _check(0 <= op < 32, f"Shift amount {op} out of range.")
+                case "pred" | "succ":
+                    pass
+                case _:
+                    assert False, name
+            kwargs[name] = op
+        return insn.value(**kwargs)
+
+
+def _fits(value, bits):
+    return -(1 << (bits - 1)) <= value < (1 << (bits - 1))
+
+
+def _check(cond, message):
+    if not cond:
+        raise ValueError(message)
+
+
+def assemble(source, *, base=0, filename="<input>"):
+    """Assemble `source` (a string or iterable of lines) into a `Program`."""
+    asm = Assembler(base=base, filename=filename)
+    asm.feed(source)
+    return asm.program()
+
+
+def _elf(program):
+    """Lay out an ELF32 executable: header, program header, image, then the tables."""
+    symbols = sorted(program.symbols.items(), key=lambda kv: (kv[0] in program.globals, kv[1]))
+    strtab = bytearray(b"\0")
+    symtab = bytearray(16)
+    first_global = None
+    for i, (name, value) in enumerate(symbols, start=1):
+        is_global = name in program.globals
+        if is_global and first_global is None:
+            first_global = i
+        # st_shndx: the .text section, or SHN_ABS for constants.
+        symtab += struct.pack("<IIIBBH", len(strtab), value, 0,
+                              (1 if is_global else 0) << 4, 0,
+                              1 if name in program.labels else 0xFFF1)
+        strtab += name.encode() + b"\0"
+    if first_global is None:
+        first_global = len(symbols) + 1
+
+    shstrtab = b"\0.text\0.symtab\0.strtab\0.shstrtab\0"
+    name_of = lambda n: shstrtab.index(n.encode() + b"\0")
+
+    ehsize, phsize, shsize = 52, 32, 40
+    image_off = ehsize + phsize
+    symtab_off = image_off + len(program.image)
+    symtab_off += -symtab_off % 4
+    strtab_off = symtab_off + len(symtab)
+    shstrtab_off = strtab_off + len(strtab)
+    shoff = shstrtab_off + len(shstrtab)
+    shoff += -shoff % 4
+
+    out = bytearray()
+    out += b"\x7fELF" + bytes([1, 1, 1, 0]) + bytes(8)
+    out += struct.pack("<HHIIIIIHHHHHH",
+                       2, EM_RISCV, 1, program.entry, ehsize, shoff, 0,
+                       ehsize, phsize, 1, shsize, 5, 4)
+    # PT_LOAD, RWX.
+    out += struct.pack("<IIIIIIII", 1, image_off, program.base, program.base,
+                       len(program.image), len(program.image) + program.bss, 7, 4)
+    out += program.image
+    out += bytes(symtab_off - len(out))
+    out += symtab + strtab + shstrtab
+    out += bytes(shoff - len(out))
+
+    # SHT_PROGBITS with SHF_ALLOC|SHF_EXECINSTR|SHF_WRITE; SHT_SYMTAB links .strtab.
+    sections = [
+        (0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (name_of(".text"), 1, 7, program.base, image_off, len(program.image), 0, 0, 4, 0),
+        (name_of(".symtab"), 2, 0, 0, symtab_off, len(symtab), 3, first_global, 4, 16),
+        (name_of(".strtab"), 3, 0, 0, strtab_off, len(strtab), 0, 0, 1, 0),
+        (name_of(".shstrtab"), 3, 0, 0, shstrtab_off, len(shstrtab), 0, 0, 1, 0),
+    ]
+    for section in sections:
+        out += struct.pack("<IIIIIIIIII", *section)
+    return bytes(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m sae.asm", description="Assemble RV32I source.")
+    parser.add_argument("input", type=Path)
+    parser.add_argument("-o", "--output", type=Path, required=True)
+    parser.add_argument("--elf", action="store_true",
+                        help="write an ELF executable (default if OUTPUT ends in .elf)")
+    parser.add_argument("--base", type=lambda s: int(s, 0), default=0)
+    args = parser.parse_args()
+
+    try:
+        with open(args.input) as f:
+            program = assemble(f, base=args.base, filename=str(args.input))
+    except AsmError as e:
+        parser.exit(1, f"{e}\n")
+
+    if args.elf or args.output.suffix == ".elf":
+        args.output.write_bytes(program.elf())
+    else:
+        args.output.write_bytes(program.image)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+`python -m sae bench`: run a corpus of programs on the hart and report cycles,
+retired instructions, CPI and host simulation speed, optionally comparing
+against a stored baseline.
+
+Cycle and instruction counts are deterministic, so any increase over the
+baseline (or any change in a program's result) is a regression. Simulation
+speed depends on the host and is only reported when it drops by more than
+--speed-tolerance.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from functools import partial
+
+from amaranth.lib.memory import Memory
+
+__all__ = ["BENCHMARKS", "Benchmark", "add_arguments", "compare", "run"]
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    name: str
+    # Relative to the project root: a flat binary, an ELF, or assembly source.
+    path: str
+    reg_inits: dict = field(default_factory=dict)
+    memory: int = 8192
+    max_cycles: int = 1_000_000
+
+
+BENCHMARKS = [
+    Benchmark("shrimple", "tests/test_shrimple.bin"),
+    Benchmark("shrimprw", "tests/test_shrimprw.bin", reg_inits={"uart": b"y"}),
+    Benchmark("crc16", "benchmarks/kernels/crc16.s"),
+    Benchmark("list", "benchmarks/kernels/list.s"),
+    Benchmark("matrix", "benchmarks/kernels/matrix.s"),
+    Benchmark("dhry", "benchmarks/kernels/dhry.s"),
+]
+
+
+def load(np, benchmark):
+    """Sysmem halfwords for `benchmark`."""
+    from .image import load_image
+
+    return load_image(np.path(benchmark.path)).words().tolist()
+
+
+def run(np, benchmark, *, backend, fast_forward=True):
+    """Run `benchmark` once on `backend`, returning its report entry."""
+    from .rtl.hart import Hart
+    from .rtl.isa_rv32 import RV32I
+    from .sim import run_until_fault
+
+    hart = Hart(
+        sysmem=Memory(depth=benchmark.memory // 2, shape=16, init=load(np, benchmark)),
+        reg_inits=dict(benchmark.reg_inits))
+    if backend == "cxxrtl":
+        # Don't time compiling (or loading) the model.
+        from .sim.cxxrtl import CxxrtlHart
+        CxxrtlHart.for_depth(hart.sysmem.depth)
+
+    stats = {}
+    # The backends trace every instruction to stdout.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        results = run_until_fault(
+            hart, max_cycles=benchmark.max_cycles, backend=backend, cache=False, stats=stats,
+            fast_forward=fast_forward)
+        seconds = time.perf_counter() - start
+
+    return {
+        "cycles": stats["cycles"],
+        "instret": stats["instret"],
+        "cpi": round(stats["cycles"] / stats["instret"], 3) if stats["instret"] else None,
+        "result": results[RV32I.Reg("a0")],
+        "seconds": round(seconds, 4),
+        "sim_hz": round(stats["cycles"] / seconds) if seconds else None,
+        "states": stats["states"],
+        "mix": stats["mix"],
+    }
+
+
+def compare(report, baseline, *, speed_tolerance):
+    """
+    Compare `report` against `baseline`. Returns (regressions, warnings) as
+    lists of messages.
+    """
+    regressions, warnings = [], []
+    for name, entry in report["benchmarks"].items():
+        if (base := baseline["benchmarks"].get(name)) is None:
+            warnings.append(f"{name}: not in baseline")
+            continue
+        if entry["result"] != base["result"]:
+            regressions.append(
+                f"{name}: result 0x{entry['result']:x}, baseline 0x{base['result']:x}")
+        for key in ("cycles", "instret"):
+            if entry[key] > base[key]:
+                regressions.append(
+                    f"{name}: {key} {entry[key]}, baseline {base[key]} "
+                    f"(+{(entry[key] - base[key]) / base[key]:.1%})")
+        if (report["backend"] == baseline["backend"] and entry["sim_hz"] and base["sim_hz"] and
+                entry["sim_hz"] < base["sim_hz"] * (1 - speed_tolerance)):
+            warnings.append(
+                f"{name}: simulated at {entry['sim_hz']} Hz, baseline {base['sim_hz']} Hz")
+    return regressions, warnings
+
+
+def add_arguments(np, parser):
+    from .sim import BACKENDS
+
+    parser.set_defaults(func=partial(main, np))
+    parser.add_argument(
+        "-k",
+        "--only",
+        action="append",
+        choices=[b.name for b in BENCHMARKS],
+        help="run only this benchmark — may be specified multiple times",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="cxxrtl",
+        help="simulation backend (default: cxxrtl)",
+    )
+    parser.add_argument(
+        "--no-fast-forward",
+        dest="fast_forward",
+        action="store_false",
+        help="simulate busy-waits cycle by cycle instead of skipping over them",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="where to write the JSON report (default: build/bench.json)",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="the baseline to compare against (default: benchmarks/baseline.json)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="write this run's report to the baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--speed-tolerance",
+        type=float,
+        default=0.25,
+        help="fractional drop in simulation speed to warn about (default: 0.25)",
+    )
+
+
+def main(np, args):
+    selected = [b for b in BENCHMARKS if not args.only or b.name in args.only]
+    report = {"backend": args.backend, "benchmarks": {}}
+    for benchmark in selected:
+        entry = report["benchmarks"][benchmark.name] = run(
+            np, benchmark, backend=args.backend, fast_forward=args.fast_forward)
+        print(f"{benchmark.name:<10} {entry['cycles']:>9} cycles {entry['instret']:>8} insns  "
+              f"CPI {entry['cpi']:<6}  {entry['sim_hz']:>9} Hz")
+
+    output = args.output or np.path.build("bench.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+    baseline_path = args.baseline or np.path("benchmarks", "baseline.json")
+    try:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = None
+
+    if args.update_baseline:
+        # Keep entries for benchmarks this run skipped.
+        if baseline is None or baseline["backend"] != report["backend"]:
+            baseline = {"backend": report["backend"], "benchmarks": {}}
+        baseline["benchmarks"].update(report["benchmarks"])
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"updated {baseline_path}")
+        return
+
+    if baseline is None:
+        print(f"no baseline at {baseline_path}")
+        return
+
+    regressions, warnings = compare(report, baseline, speed_tolerance=args.speed_tolerance)
+    for message in warnings:
+        print(f"warning: {message}")
+    for message in regressions:
+        print(f"regression: {message}")
+    if regressions:
+        sys.exit(1)
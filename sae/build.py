@@ -0,0 +1,316 @@
+"""
+`python -m sae build`: niar's build, timed stage by stage, with the elaborated
+design cached.
+
+Elaboration is deterministic, so the build plan it produces (the RTLIL and the
+toolchain's scripts) is cached on `cache.rtl_digest`, the build's options, and
+the program and register inits the design is constructed with; an unchanged
+design goes straight to the toolchain. The toolchain is skipped in turn when
+the RTLIL matches the last build's, reusing its bitstream.
+
+The toolchain runs as one script, so its stages are timed by when each wrote
+its output: Yosys the netlist, nextpnr the ASCII bitstream, icepack the binary.
+
+Each build also reports the Fmax nextpnr achieved per clock, the endpoints of
+each clock's critical path, and the cells Yosys mapped to, as JSON beside the
+bitstream. It's compared against a stored baseline per board: any Fmax drop
+beyond --fmax-tolerance or any growth in a kind of cell is a regression.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from array import array
+from functools import partial
+
+from niar import build as niar_build
+from niar.cmdrunner import CommandRunner
+from niar.logging import logger
+
+from .cache import DiskCache, rtl_digest
+
+__all__ = ["PLANS", "add_arguments", "compare", "plan_for", "report", "toolchain_stages"]
+
+# Build plans, by digest of the design and the options it's built with.
+PLANS = DiskCache("plans")
+
+# Toolchain stages, each done when it writes the output with this suffix.
+STAGES = [("synthesis", ".json"), ("place and route", ".asc"), ("packing", ".bin")]
+
+# What Yosys maps to on iCE40, by the cell types counted towards each.
+CELLS = {
+    "lut": ("SB_LUT4",),
+    "ff": ("SB_DFF",),
+    "carry": ("SB_CARRY",),
+    "ebr": ("SB_RAM40_4K",),
+    "spram": ("SB_SPRAM256KA",),
+    "dsp": ("SB_MAC16",),
+}
+
+STATISTICS = re.compile(r"^\d+(\.\d+)*\. Printing statistics\.$")
+FMAX = re.compile(r"^Info: Max frequency for clock +'([^']+)': ([\d.]+) MHz")
+CRITICAL_PATH = re.compile(r"^Info: Critical path report for clock '([^']+)'")
+ENDPOINT = re.compile(r"\b(Source|Sink) (\S+)")
+UTILISATION = re.compile(r"^Info:\s+(\w+):\s+(\d+)/\s*(\d+)\s+\d+%")
+
+
+def _inputs(design):
+    """
+    A digest of what `design` was constructed with: the hart's memory
+    contents and register inits, which its RTLIL has baked in.
+    """
+    hart = design.hart
+    digest = hashlib.sha256()
+    digest.update(f"{hart.sysmem.depth}\n".encode())
+    digest.update(array("H", hart.sysmem.init).tobytes())
+    inits = sorted((str(reg), repr(value)) for reg, value in hart.reg_inits.items())
+    digest.update(repr(inits).encode())
+    return digest.hexdigest()
+
+
+def plan_for(np, platform, *, debug_verilog=False, force=False):
+    """
+    The build plan for `np` on `platform`, and whether it came from the cache.
+    `force` elaborates anyway.
+
+    The design is constructed either way, since that's cheap and loads the
+    program it's built with; only elaborating it is skipped.
+    """
+    design = niar_build.construct_top(np, platform)
+    key = rtl_digest("build", np.name, type(platform).__name__, debug_verilog,
+                     _inputs(design))
+    if not force and (plan := PLANS.get(key)) is not None:
+        for elaboratable in (design, design.hart, design.hart.sysmem, design.hart.xmem):
+            elaboratable._MustUse__silence = True
+        return plan, True
+
+    plan = platform.prepare(design, np.name, debug_verilog=debug_verilog, yosys_opts="-g")
+    PLANS.put(key, plan)
+    return plan, False
+
+
+def toolchain_stages(path, name, started):
+    """
+    (stage, seconds) for each toolchain stage that finished in `path` since
+    `started` (a `time.time()`), in order.
+    """
+    stages = []
+    for stage, suffix in STAGES:
+        try:
+            finished = os.stat(os.path.join(path, f"{name}{suffix}")).st_mtime
+        except FileNotFoundError:
+            break
+        if finished < started:
+            break
+        stages.append((stage, finished - started))
+        started = finished
+    return stages
+
+
+def _cells(rpt):
+    """Cell counts from the last statistics Yosys printed in `rpt`."""
+    counts = {}
+    for line in rpt.splitlines():
+        if STATISTICS.match(line):
+            counts = {}
+            continue
+        # "SB_LUT4  2010", or "2010  SB_LUT4" from newer Yosys.
+        match line.split():
+            case [cell, count] if cell.startswith("SB_") and count.isdigit():
+                counts[cell] = int(count)
+            case [count, cell] if cell.startswith("SB_") and count.isdigit():
+                counts[cell] = int(count)
+    return {kind: sum(count for cell, count in counts.items() if cell.startswith(prefixes))
+            for kind, prefixes in CELLS.items()}
+
+
+def report(path, name):
+    """
+    The report entry for the build of `name` in `path`, from the Yosys (.rpt)
+    and nextpnr (.tim) logs.
+    """
+    with open(os.path.join(path, f"{name}.rpt")) as f:
+        cells = _cells(f.read())
+
+    fmax, critical_paths, utilisation = {}, {}, {}
+    clock = None
+    with open(os.path.join(path, f"{name}.tim")) as f:
+        for line in f:
+            # nextpnr estimates these after placement and reports again after
+            # routing; the last word is the one that counts.
+            if m := FMAX.match(line):
+                fmax[m[1]] = float(m[2])
+            elif m := CRITICAL_PATH.match(line):
+                clock = m[1]
+                critical_paths[clock] = {}
+            elif clock is not None and line.startswith("Info:  "):
+                # The path's steps, indented under its heading.
+                if m := ENDPOINT.search(line):
+                    critical_paths[clock]["from" if m[1] == "Source" else "to"] = m[2]
+            else:
+                clock = None
+                if m := UTILISATION.match(line):
+                    utilisation[m[1]] = [int(m[2]), int(m[3])]
+
+    return {
+        "fmax_mhz": fmax,
+        "critical_paths": critical_paths,
+        "cells": cells,
+        "utilisation": utilisation,
+    }
+
+
+def compare(report, baseline, *, fmax_tolerance):
+    """
+    Compare `report` against `baseline`. Returns (regressions, warnings) as
+    lists of messages.
+    """
+    regressions, warnings = [], []
+    for board, entry in report["boards"].items():
+        if (base := baseline["boards"].get(board)) is None:
+            warnings.append(f"{board}: not in baseline")
+            continue
+        for clock, mhz in entry["fmax_mhz"].items():
+            if (base_mhz := base["fmax_mhz"].get(clock)) is None:
+                warnings.append(f"{board}: clock {clock!r} not in baseline")
+            elif mhz < base_mhz * (1 - fmax_tolerance):
+                regressions.append(
+                    f"{board}: {clock} Fmax {mhz} MHz, baseline {base_mhz} MHz "
+                    f"({(mhz - base_mhz) / base_mhz:.1%})")
+        for kind, count in entry["cells"].items():
+            if count > (base_count := base["cells"].get(kind, 0)):
+                regressions.append(f"{board}: {count} {kind}, baseline {base_count}")
+    return regressions, warnings
+
+
+def add_arguments(np, parser):
+    niar_build.add_arguments(np, parser)
+    parser.set_defaults(func=partial(main, np))
+    parser.add_argument(
+        "--baseline",
+        help="the baseline to compare against (default: benchmarks/synthesis.json)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="write this build's report to the baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--fmax-tolerance",
+        type=float,
+        default=0.05,
+        help="fractional drop in Fmax to allow, for place and route noise (default: 0.05)",
+    )
+    parser.add_argument(
+        "--warn-only",
+        action="store_true",
+        help="report regressions against the baseline without failing",
+    )
+
+
+def main(np, args):
+    from amaranth.build.run import LocalBuildProducts
+
+    logger.info("building %s for %s", np.name, args.board)
+
+    platform = np.target_by_name(args.board)
+    subdir = type(platform).__name__
+    timings = []
+
+    start = time.perf_counter()
+    plan, cached = plan_for(np, platform, debug_verilog=args.verilog, force=args.force)
+    timings.append(("elaboration (cached)" if cached else "elaboration",
+                    time.perf_counter() - start))
+    fn = f"{np.name}.il"
+    size = len(plan.files[fn])
+    logger.debug(f"{fn!r}: {size:,} bytes")
+
+    # The toolchain is skipped if the RTLIL on disk is what it last built, so
+    # it has to be this build's RTLIL before that's checked.
+    il_path = np.path.build(subdir, fn)
+    os.makedirs(os.path.dirname(il_path), exist_ok=True)
+    with open(il_path, "w") as f:
+        f.write(plan.files[fn])
+
+    cr = CommandRunner(force=args.force)
+    products = None
+    started = time.time()
+
+    def execute_build():
+        nonlocal products
+        products = plan.execute_local(np.path.build(subdir))
+
+    # The outf doesn't exist here; it's only used for the digest name basis.
+    cr.add_process(execute_build, infs=[il_path], outf=np.path.build(subdir, np.name))
+    cr.run()
+    if products is None:
+        products = LocalBuildProducts(np.path.build(subdir))
+    else:
+        timings += toolchain_stages(np.path.build(subdir), np.name, started)
+
+    if args.program:
+        start = time.perf_counter()
+        platform.toolchain_program(products, np.name)
+        timings.append(("programming", time.perf_counter() - start))
+
+    heading = re.compile(r"^\d+\.\d+\. Printing statistics\.$", flags=re.MULTILINE)
+    next_heading = re.compile(r"^\d+\.\d+\. ", flags=re.MULTILINE)
+    niar_build.log_file_between(
+        logging.INFO, np.path.build(subdir, f"{np.name}.rpt"), heading, next_heading)
+
+    logger.info("Device utilisation:")
+    heading = re.compile(r"^Info: Device utilisation:$", flags=re.MULTILINE)
+    next_heading = re.compile(r"^Info: Placed ", flags=re.MULTILINE)
+    niar_build.log_file_between(
+        logging.INFO, np.path.build(subdir, f"{np.name}.tim"), heading, next_heading,
+        prefix="Info: ")
+
+    logger.info("Stage timings:")
+    for stage, seconds in timings:
+        logger.info(f"  {stage:<20} {seconds:8.2f}s")
+
+    entry = report(np.path.build(subdir), np.name)
+    for clock, mhz in entry["fmax_mhz"].items():
+        path = entry["critical_paths"].get(clock, {})
+        logger.info(f"Fmax for {clock}: {mhz} MHz, critical path "
+                    f"{path.get('from', '?')} -> {path.get('to', '?')}")
+    build_report = {"boards": {args.board: entry}}
+    with open(np.path.build(subdir, "synthesis.json"), "w") as f:
+        json.dump(build_report, f, indent=2)
+        f.write("\n")
+
+    baseline_path = args.baseline or np.path("benchmarks", "synthesis.json")
+    try:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = None
+
+    if args.update_baseline:
+        # Keep entries for the other boards.
+        baseline = baseline or {"boards": {}}
+        baseline["boards"].update(build_report["boards"])
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        logger.info(f"updated {baseline_path}")
+        return
+
+    if baseline is None:
+        logger.warning(f"no baseline at {baseline_path} to compare against; "
+                       "record one with --update-baseline")
+        return
+
+    regressions, warnings = compare(
+        build_report, baseline, fmax_tolerance=args.fmax_tolerance)
+    for message in warnings:
+        logger.warning(message)
+    for message in regressions:
+        logger.log(logging.WARNING if args.warn_only else logging.ERROR,
+                   f"regression: {message}")
+    if regressions and not args.warn_only:
+        sys.exit(1)
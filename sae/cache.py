@@ -0,0 +1,108 @@
+import hashlib
+import os
+import pickle
+import shutil
+from importlib import metadata
+from pathlib import Path
+
+__all__ = ["DiskCache", "build_dir", "rtl_digest", "source_digest"]
+
+
+def build_dir(*components):
+    """
+    A path in the project's build directory. niar puts it beside the
+    pyproject.toml above the project's source; find that without importing
+    niar, which simulation and test workers otherwise never need.
+    """
+    origin = Path(__file__).absolute().parent
+    while not (origin / "pyproject.toml").is_file():
+        if origin.parent == origin:
+            raise RuntimeError("Can't find the project root.")
+        origin = origin.parent
+    return origin.joinpath("build", *components)
+
+
+def source_digest(*modules):
+    """
+    A digest of sae's version and the source of `modules`, so cached values are
+    dropped when the code that produced them changes.
+    """
+    digest = hashlib.sha256()
+    try:
+        digest.update(metadata.version("sae").encode())
+    except metadata.PackageNotFoundError:
+        pass
+    for module in modules:
+        digest.update(Path(module.__file__).read_bytes())
+    return digest.hexdigest()
+
+
+def rtl_digest(*params):
+    """
+    A digest of everything elaborating the design depends on: sae's version,
+    the source of its RTL, ISA definitions and platforms, and of the image
+    loaders that fill its memories, the versions of the Amaranth libraries it's
+    built from, and `params` (by repr). Elaborated artifacts can be cached on
+    it without elaborating first.
+    """
+    root = Path(__file__).absolute().parent
+    digest = hashlib.sha256()
+    for dist in ("sae", "amaranth", "amaranth-stdio", "amaranth-boards", "niar"):
+        try:
+            digest.update(f"{dist}=={metadata.version(dist)}\n".encode())
+        except metadata.PackageNotFoundError:
+            pass
+    paths = [*sorted((root / "rtl").glob("*.py")), *sorted((root / "isa").glob("*.py")),
+             root / "platforms.py", root / "targets.py",
+             root / "image.py", root / "asm.py", root / "st.py"]
+    for path in paths:
+        digest.update(path.relative_to(root).as_posix().encode())
+        digest.update(path.read_bytes())
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Pickled values under the project's build directory, keyed by strings
+    (usually digests).
+
+    Writes are atomic, so xdist workers can share a cache. Set SAE_CACHE=0 to
+    neither read nor write it; `clear` (or deleting `path`) empties it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._path = None
+
+    @property
+    def enabled(self):
+        return os.environ.get("SAE_CACHE", "1") != "0"
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = build_dir("cache", self.name)
+        return self._path
+
+    def get(self, key):
+        """The value stored under `key`, or None."""
+        if not self.enabled:
+            return None
+        try:
+            with open(self.path / key, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self.path / f"{key}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f)
+        os.replace(tmp_path, self.path / key)
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
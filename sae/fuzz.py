@@ -0,0 +1,380 @@
+"""
+`python -m sae fuzz`: run random RV32I programs on the hart and on a
+functional reference (`sae.sim.reference`), and compare the registers, pc and
+fault each ends with.
+
+Programs are straight-line code with forward branches and jumps only, so every
+run ends on the terminator after the code; loads and stores stay within a data
+area after it. When the two disagree, the program is shrunk to as few items as
+still disagree, and written out as a `.st` test asserting the reference's
+results, ready to drop into tests/.
+
+Seeds are spread across a process pool; each worker generates, checks and
+shrinks its own programs.
+"""
+
+import contextlib
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import partial
+from typing import Optional
+
+from .rtl.isa_rv32 import RV32I
+
+__all__ = ["Item", "Program", "add_arguments", "check", "generate", "reproducer", "shrink",
+           "xregs"]
+
+TERMINATOR = 0xFFFF_FFFF
+
+# Bytes of data after the terminator for loads and stores to work on.
+DATA_SIZE = 64
+
+_OP_IMM = ["addi", "slti", "sltiu", "xori", "ori", "andi"]
+_SHIFT_IMM = ["slli", "srli", "srai"]
+_OP = ["add", "sub", "sll", "slt", "sltu", "xor", "srl", "sra", "or", "and"]
+_LOADS = {"lb": 1, "lh": 2, "lw": 4, "lbu": 1, "lhu": 2}
+_STORES = {"sb": 1, "sh": 2, "sw": 4}
+_BRANCHES = ["beq", "bne", "blt", "bge", "bltu", "bgeu"]
+
+
+@dataclass(frozen=True)
+class Item:
+    """
+    One step of a program. `kind` is "op" for a plain instruction with `args`;
+    "mem" for a load or store to offset `addr` of the data area, through a
+    base register it loads with the address first; "branch" or "jal" to skip the next `skip`
+    items; or "jalr" to do the same through an `auipc` into a scratch register.
+    """
+
+    kind: str
+    mnemonic: str
+    args: tuple = ()
+    addr: int = 0
+    skip: int = 0
+
+
+@dataclass(frozen=True)
+class Program:
+    items: tuple[Item, ...]
+    # Initial values for some registers, by number; the rest are the hart's.
+    inits: dict[int, int] = field(default_factory=dict)
+    data: tuple[int, ...] = ()
+
+
+def _reg(rng, *, nonzero=False):
+    return rng.randrange(1 if nonzero else 0, 32)
+
+
+def _item(rng):
+    roll = rng.random()
+    if roll < 0.3:
+        mnemonic = rng.choice(_OP_IMM)
+        return Item("op", mnemonic, (_reg(rng), _reg(rng), rng.randrange(-2048, 2048)))
+    if roll < 0.4:
+        mnemonic = rng.choice(_SHIFT_IMM)
+        return Item("op", mnemonic, (_reg(rng), _reg(rng), rng.randrange(32)))
+    if roll < 0.6:
+        mnemonic = rng.choice(_OP)
+        return Item("op", mnemonic, (_reg(rng), _reg(rng), _reg(rng)))
+    if roll < 0.65:
+        mnemonic = rng.choice(["lui", "auipc"])
+        return Item("op", mnemonic, (_reg(rng), rng.randrange(1 << 20)))
+    if roll < 0.85:
+        mnemonic = rng.choice([*_LOADS, *_STORES])
+        size = _LOADS.get(mnemonic) or _STORES[mnemonic]
+        # Any alignment: the MMU's unaligned paths are the interesting ones.
+        return Item("mem", mnemonic, (_reg(rng), _reg(rng, nonzero=True)),
+                    addr=rng.randrange(DATA_SIZE - size + 1))
+    if roll < 0.95:
+        return Item("branch", rng.choice(_BRANCHES), (_reg(rng), _reg(rng)),
+                    skip=rng.randrange(4))
+    if roll < 0.98:
+        return Item("jal", "jal", (_reg(rng),), skip=rng.randrange(4))
+    return Item("jalr", "jalr", (_reg(rng), _reg(rng, nonzero=True)), skip=rng.randrange(4))
+
+
+def generate(seed, *, length=64):
+    """A random program of `length` items, the same every time for `seed`."""
+    rng = random.Random(seed)
+    inits = {xn: rng.randrange(1, 1 << 32) for xn in rng.sample(range(3, 32), rng.randrange(8))}
+    data = tuple(rng.randrange(1 << 32) for _ in range(DATA_SIZE // 4))
+    return Program(tuple(_item(rng) for _ in range(length)), inits, data)
+
+
+def _size(item):
+    return {"mem": 12, "jalr": 8}.get(item.kind, 4)
+
+
+def layout(program):
+    """
+    The program as (source, word) pairs: code, the terminator, then the data.
+    `source` is the line of `.st` that assembles to `word`.
+    """
+    addrs = [0]
+    for item in program.items:
+        addrs.append(addrs[-1] + _size(item))
+    end = addrs[-1]
+    data_base = end + 4
+
+    def target(i, item):
+        return addrs[min(i + 1 + item.skip, len(program.items))]
+
+    lines = []
+    for i, item in enumerate(program.items):
+        args = item.args
+        match item.kind:
+            case "op":
+                lines.append((item.mnemonic, args))
+            case "mem":
+                reg, base = args
+                # Offsets are non-negative in .st, so point the base below.
+                offset = min(item.addr, 16)
+                # LUI and ADDI, since the data area is beyond ADDI's reach alone
+                # in longer programs.
+                addr = data_base + item.addr - offset
+                hi = (addr + 0x800) >> 12
+                lines.append(("lui", (base, hi)))
+                lines.append(("addi", (base, base, addr - (hi << 12))))
+                lines.append((item.mnemonic, (reg, (offset, base))))
+            case "branch":
+                lines.append((item.mnemonic, (*args, target(i, item) - addrs[i])))
+            case "jal":
+                lines.append(("jal", (*args, target(i, item) - addrs[i])))
+            case "jalr":
+                rd, scratch = args
+                lines.append(("auipc", (scratch, 0)))
+                lines.append(("jalr", (rd, scratch, target(i, item) - addrs[i])))
+
+    result = [(_source(mnemonic, args), _encode(mnemonic, args)) for mnemonic, args in lines]
+    result.append((f".word 0x{TERMINATOR:08X}", TERMINATOR))
+    result += [(f".word 0x{word:08X}", word) for word in program.data]
+    return result
+
+
+def _source(mnemonic, args):
+    parts = []
+    for name, a in zip(getattr(RV32I, mnemonic.upper()).asm_args, args):
+        if name in ("rd", "rs1", "rs2"):
+            parts.append(f"x{a}")
+        elif name == "rs1off":
+            parts.append(f"{a[0]}(x{a[1]})")
+        else:
+            parts.append(str(a))
+    return f"{mnemonic} {', '.join(parts)}"
+
+
+def _encode(mnemonic, args):
+    insn = getattr(RV32I, mnemonic.upper())
+    kwargs = {}
+    for name, a in zip(insn.asm_args, args):
+        if name in ("rd", "rs1", "rs2"):
+            kwargs[name] = RV32I.Reg(f"x{a}")
+        elif name == "rs1off":
+            kwargs[name] = (a[0], RV32I.Reg(f"x{a[1]}"))
+        else:
+            kwargs[name] = a
+    return insn.value(**kwargs)
+
+
+def sysmem_init(program):
+    """Halfwords for the hart's sysmem, laid out the way a `.st` test's are."""
+    body = []
+    for _, word in layout(program):
+        body += [word & 0xFFFF, word >> 16]
+    return body + [0xFFFF, 0xFFFF]
+
+
+def _hart(program):
+    from amaranth.lib.memory import Memory
+
+    from .rtl.hart import Hart
+
+    init = sysmem_init(program)
+    return Hart(
+        sysmem=Memory(depth=len(init), shape=16, init=init),
+        reg_inits={RV32I.Reg(f"x{xn}"): value for xn, value in program.inits.items()},
+        track_reg_written=True)
+
+
+def xregs(program):
+    """The register file the hart starts `program` with."""
+    hart = _hart(program)
+    # Only built for its register inits.
+    for elaboratable in (hart, hart.sysmem, hart.xmem):
+        elaboratable._MustUse__silence = True
+    return hart.xmem.init
+
+
+def check(program, *, backend):
+    """
+    Run `program` on the hart and the reference. Returns None if they agree,
+    and otherwise (hart's results, reference's results).
+    """
+    from .sim import reference, run_until_fault
+
+    # Every instruction laid out, and the terminator, with slack.
+    max_cycles = 2 * (sum(_size(item) // 4 for item in program.items) + 1) + 2
+    expected = reference.run_until_fault(
+        sysmem_init(program), xregs(program), max_cycles=max_cycles)
+    hart = _hart(program)
+    try:
+        # The backends trace every instruction to stdout.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            actual = run_until_fault(hart, max_cycles=max_cycles, backend=backend, cache=False)
+    except RuntimeError as e:
+        actual = {"error": str(e)}
+    if actual == expected:
+        return None
+    return actual, expected
+
+
+def shrink(program, fails):
+    """
+    The smallest program we can find, by dropping register inits, ever
+    smaller runs of items and then the data, for which `fails(program)` still
+    holds.
+    """
+    for xn in list(program.inits):
+        candidate = replace(program, inits={k: v for k, v in program.inits.items() if k != xn})
+        if fails(candidate):
+            program = candidate
+
+    chunk = len(program.items) // 2
+    while chunk:
+        i = 0
+        while i < len(program.items):
+            candidate = replace(program, items=program.items[:i] + program.items[i + chunk:])
+            if candidate.items and fails(candidate):
+                program = candidate
+            else:
+                i += chunk
+        chunk //= 2
+
+    if program.data and fails(candidate := replace(program, data=())):
+        program = candidate
+    return program
+
+
+def reproducer(program, name, expected):
+    """`program` as a `.st` test asserting the `expected` results."""
+    from .rtl.hart import FaultCode
+
+    lines = [f"{name}:"]
+    inits = ", ".join(f"x{xn}=0x{value:X}" for xn, value in sorted(program.inits.items()))
+    lines.append(f"    .init {inits}".rstrip())
+    lines += [f"    {source}" for source, _ in layout(program)]
+    asserts = [f"x{reg.value}=0x{value:X}" for reg, value in expected.items()
+               if isinstance(reg, RV32I.Reg)]
+    # .assert expects an illegal instruction fault on the terminator unless told.
+    if expected["faultcode"] != FaultCode.ILLEGAL_INSTRUCTION:
+        asserts.append(f"faultcode={int(expected['faultcode'])}")
+        if expected["faultinsn"]:
+            asserts.append(f"faultinsn=0x{expected['faultinsn']:X}")
+    elif expected["faultinsn"] != TERMINATOR:
+        asserts.append(f"faultinsn=0x{expected['faultinsn']:X}")
+    lines.append(f"    .assert {', '.join(asserts)}")
+    return "\n".join(lines) + "\n"
+
+
+def _fails(backend, program):
+    from .sim.reference import Unsupported
+
+    try:
+        return check(program, backend=backend) is not None
+    except Unsupported:
+        return False
+
+
+def run_seed(seed, *, backend, length):
+    """
+    Check the program for `seed`, returning a shrunk `.st` reproducer if it
+    fails, or the `Unsupported` exception if the reference can't run it.
+    """
+    from .sim.reference import Unsupported
+
+    program = generate(seed, length=length)
+    try:
+        if check(program, backend=backend) is None:
+            return None
+    except Unsupported as e:
+        return e
+    program = shrink(program, partial(_fails, backend))
+    _, expected = check(program, backend=backend)
+    return reproducer(program, f"test_fuzz_{seed}", expected)
+
+
+def add_arguments(np, parser):
+    from .sim import BACKENDS
+
+    parser.set_defaults(func=partial(main, np))
+    parser.add_argument(
+        "-n",
+        "--count",
+        type=int,
+        default=100,
+        help="how many programs to try (default: 100)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="the first program's seed; the rest follow on (default: 0)",
+    )
+    parser.add_argument(
+        "--length",
+        type=int,
+        default=64,
+        help="items per program (default: 64)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="cxxrtl",
+        help="simulation backend (default: cxxrtl)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="where to write reproducers (default: build/fuzz)",
+    )
+
+
+def main(np, args):
+    if args.backend == "cxxrtl":
+        # Compile the model once up front, not in every worker at the same time.
+        from .sim.cxxrtl import CxxrtlHart
+        CxxrtlHart.for_depth(1)
+
+    output = args.output or np.path.build("fuzz")
+    seeds = range(args.seed, args.seed + args.count)
+    failures = skipped = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        runs = pool.map(partial(run_seed, backend=args.backend, length=args.length), seeds,
+                        chunksize=max(1, args.count // (4 * (args.jobs or 1))))
+        for seed, st in zip(seeds, runs):
+            if st is None:
+                continue
+            if isinstance(st, Exception):
+                skipped += 1
+                print(f"seed {seed}: skipped; the reference can't run it: {st}")
+                continue
+            failures += 1
+            os.makedirs(output, exist_ok=True)
+            path = os.path.join(output, f"test_fuzz_{seed}.st")
+            with open(path, "w") as f:
+                f.write(st)
+            print(f"seed {seed}: hart and reference disagree; reproducer in {path}")
+
+    print(f"{args.count} programs, {failures} failing, {skipped} skipped")
+    if failures:
+        sys.exit(1)
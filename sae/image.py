@@ -0,0 +1,125 @@
+import mmap
+import struct
+import sys
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+
+__all__ = ["Image", "load_image"]
+
+EM_RISCV = 243
+
+PT_LOAD = 1
+SHT_SYMTAB = 2
+SHN_UNDEF = 0
+SHN_ABS = 0xFFF1
+
+_TYPECODES = {16: "H", 32: "I"}
+
+
+@dataclass
+class Image:
+    """
+    A program laid out in memory from address 0, as a hart's sysmem sees it.
+    `symbols` holds the program's addresses by name; it leaves out absolute
+    symbols (constants), and is empty for flat binaries.
+    """
+
+    data: bytearray
+    entry: int = 0
+    symbols: dict[str, int] = field(default_factory=dict)
+
+    def words(self, width=16):
+        """`data` as little-endian `width`-bit words, the last zero-padded."""
+        words = array(_TYPECODES[width])
+        with memoryview(self.data) as data:
+            whole = len(data) - len(data) % words.itemsize
+            words.frombytes(data[:whole])
+            if whole < len(data):
+                words.frombytes(bytes(data[whole:]).ljust(words.itemsize, b"\0"))
+        if sys.byteorder == "big":
+            words.byteswap()
+        return words
+
+
+def load_image(path, *, limit=None):
+    """
+    Load a flat binary, an ELF executable, or assembly source. ELF PT_LOAD
+    segments are placed at their physical addresses with BSS zero-filled; the
+    symbol table is kept.
+
+    With `limit`, the size of the sysmem the image is for in bytes, an image
+    that doesn't fit raises `ValueError`; it's checked before anything's
+    allocated, so a segment placed far away (say, at an MMIO address) fails
+    early rather than allocating everything up to it.
+    """
+    if Path(path).suffix == ".s":
+        from .asm import assemble
+
+        with open(path) as f:
+            program = assemble(f, filename=str(path))
+        data = bytearray(bytes(program.base) + program.image + bytes(program.bss))
+        _check_fits(path, len(data), limit)
+        return Image(data, entry=program.entry,
+                     symbols={name: program.symbols[name] for name in program.labels})
+
+    with open(path, "rb") as f:
+        size = Path(path).stat().st_size
+        if f.read(4) == b"\x7fELF":
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                with memoryview(m) as view:
+                    return _load_elf(view, path, limit)
+        # A flat binary is loaded whole, so read it straight into place.
+        _check_fits(path, size, limit)
+        data = bytearray(size)
+        f.seek(0)
+        f.readinto(data)
+        return Image(data)
+
+
+def _check_fits(path, size, limit):
+    if limit is not None and size > limit:
+        raise ValueError(f"{path}: {size} bytes don't fit in a {limit}-byte sysmem")
+
+
+def _load_elf(view, path, limit):
+    ident = bytes(view[:16])
+    if ident[4] != 1 or ident[5] != 1:
+        raise ValueError(f"{path}: not a little-endian ELF32 file")
+    (_, machine, _, entry, phoff, shoff, _, _, phentsize, phnum, shentsize, shnum,
+     _) = struct.unpack_from("<HHIIIIIHHHHHH", view, 16)
+    if machine != EM_RISCV:
+        raise ValueError(f"{path}: not a RISC-V executable (e_machine={machine})")
+
+    segments = []
+    for i in range(phnum):
+        (p_type, offset, _, paddr, filesz, memsz, _, _) = struct.unpack_from(
+            "<IIIIIIII", view, phoff + i * phentsize)
+        if p_type == PT_LOAD and memsz:
+            if limit is not None and paddr + memsz > limit:
+                raise ValueError(
+                    f"{path}: segment at 0x{paddr:08x} ({memsz} bytes) is outside a "
+                    f"{limit}-byte sysmem")
+            segments.append((paddr, offset, filesz, memsz))
+
+    # Only the segments are copied out of the file.
+    data = bytearray(max((paddr + memsz for paddr, _, _, memsz in segments), default=0))
+    for paddr, offset, filesz, _ in segments:
+        # Everything past filesz is BSS, already zero.
+        data[paddr:paddr + filesz] = view[offset:offset + filesz]
+
+    sections = [struct.unpack_from("<IIIIIIIIII", view, shoff + i * shentsize)
+                for i in range(shnum)]
+    symbols = {}
+    for _, sh_type, _, _, offset, size, link, _, _, entsize in sections:
+        if sh_type != SHT_SYMTAB:
+            continue
+        strtab = bytes(view[sections[link][4]:sections[link][4] + sections[link][5]])
+        for sym in range(offset + entsize, offset + size, entsize):
+            name, value, _, info, _, shndx = struct.unpack_from("<IIIBBH", view, sym)
+            # Skip unnamed, undefined, absolute, and section/file symbols.
+            if not name or shndx in (SHN_UNDEF, SHN_ABS) or (info & 0xF) in (3, 4):
+                continue
+            symbols[strtab[name:strtab.index(b"\0", name)].decode()] = value
+
+    return Image(data, entry=entry, symbols=symbols)
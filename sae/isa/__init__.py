@@ -3,9 +3,10 @@ from functools import wraps
 
 from amaranth.lib.enum import IntEnum, nonmember
 
+from .decoder import Decoder
 from .ilayout import ILayout, ITransform
 
-__all__ = ["ISA", "fn_insn", "RegisterSpecifier", "ILayout", "ITransform"]
+__all__ = ["ISA", "fn_insn", "RegisterSpecifier", "ILayout", "ITransform", "Decoder"]
 
 
 class ISA:
@@ -25,8 +26,26 @@ class ISA:
                 cls.layouts.append(obj)
             if isinstance(obj, ILayout): # XXX Insufficient — what of fn_insn-generated?
                 cls.insns.append(obj)
+        cls._decoder = None
         super().__init_subclass__()
 
+    @classmethod
+    def decode(cls, word):
+        """
+        Returns `(insn, operands)` for the instruction `word` encodes, or
+        None. Partial instructions (named with a leading underscore) are never
+        returned. A subclass decodes its bases' instructions as well as its
+        own, those it redefines replaced.
+        """
+        if cls._decoder is None:
+            insns = {}
+            for base in reversed(cls.__mro__):
+                for insn in base.__dict__.get("insns", []):
+                    insns[insn.__name__] = insn
+            cls._decoder = Decoder(
+                [insn for name, insn in insns.items() if not name.startswith("_")])
+        return cls._decoder.decode(word)
+
 
 def fn_insn(inner):
     class InsnHelper:
@@ -0,0 +1,47 @@
+__all__ = ["Decoder"]
+
+
+class Decoder:
+    """
+    Finds which of an ISA's instructions a word encodes.
+
+    Built once from the instructions' `fixed_bits`: each node of the trie
+    switches on the bits every remaining candidate fixes, so a lookup costs a
+    handful of dict accesses however many instructions there are. Where
+    candidates overlap (e.g. ADDI, MV and NOP), the most specific that matches
+    wins.
+    """
+
+    def __init__(self, insns):
+        self._root = self._build(insns, consumed=0)
+
+    @classmethod
+    def _build(cls, insns, *, consumed):
+        key_mask = ~consumed
+        for insn in insns:
+            key_mask &= insn.fixed_bits()[0]
+        if not insns or not key_mask:
+            # Most specific first; ties in definition order.
+            return sorted(insns, key=lambda insn: -insn.fixed_bits()[0].bit_count())
+
+        buckets = {}
+        for insn in insns:
+            buckets.setdefault(insn.fixed_bits()[1] & key_mask, []).append(insn)
+        return key_mask, {
+            key: cls._build(bucket, consumed=consumed | key_mask)
+            for key, bucket in buckets.items()
+        }
+
+    def decode(self, word):
+        """Returns `(insn, operands)` for `word`, or None if nothing matches."""
+        node = self._root
+        while type(node) is tuple:
+            key_mask, children = node
+            node = children.get(word & key_mask)
+            if node is None:
+                return None
+        for insn in node:
+            mask, match = insn.fixed_bits()
+            if word & mask == match and (operands := insn.operands_for(word)) is not None:
+                return insn, operands
+        return None
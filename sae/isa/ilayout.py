@@ -1,4 +1,5 @@
 import inspect
+from enum import Enum
 from functools import reduce, wraps
 
 from amaranth import Shape
@@ -88,6 +89,16 @@ class ILayout:
         cls.shape = StructLayout(fields)
         cls.shape.__name__ = cls.__name__
 
+        # What `value` needs to pack a word with plain integer operations:
+        # each field's position and mask, and the enum (if any) whose
+        # members it holds.
+        cls._packing = [
+            (name, start, 2 ** (end - start) - 1,
+             fields[name] if isinstance(fields[name], type) and issubclass(fields[name], Enum) else None)
+            for name, (start, end) in field_ranges.items()
+        ]
+
+        cls._resolved = {}
         cls.defaults = cls.resolve_values(cls.defaults)
 
     @classmethod
@@ -100,18 +111,22 @@ class ILayout:
             case int():
                 return value
             case str():
+                if (resolved := cls._resolved.get((name, value))) is not None:
+                    return resolved
                 try:
                     field = cls.fields[name]
                     # Try item access, then calling (e.g. for Enum _missing_).
                     try:
-                        return field[value]
+                        resolved = field[value]
                     except KeyError:
-                        return field(value)
+                        resolved = field(value)
                 except Exception as e:
                     raise TypeError(
                         f"Cannot resolve default value for element of '{cls.__fullname__}': "
                         f"{name!r}={value!r}."
                     ) from e
+                cls._resolved[name, value] = resolved
+                return resolved
             case _:
                 assert False, (
                     f"unhandled type resolving '{cls.__fullname__}': "
@@ -127,6 +142,9 @@ class ILayout:
         self._needs_name = True
         self.__fullname__ = f"{type(self).__module__}.{type(self).__qualname__} child"
         self.xfrms = []
+        self._fixed_bits = None
+        # The instruction this is a pseudo-instruction of; see `base`.
+        self._called_from = None
 
         # "valid_args" are those that can be specified in a __call__.
         self.valid_args = list(self.layout)
@@ -140,6 +158,18 @@ class ILayout:
             except ValueError:
                 pass
 
+    @property
+    def base(self):
+        """
+        The instruction this is a pseudo-instruction of, as MV is of ADDI, or
+        itself if it's not one.
+        """
+        insn = self
+        while ((parent := insn._called_from) is not None and
+               not getattr(parent, "__name__", "_").startswith("_")):
+            insn = parent
+        return insn
+
     def __repr__(self):
         return f"<{self.__fullname__}>"
 
@@ -153,6 +183,10 @@ class ILayout:
 
         clone = self.clone()
         clone.kwargs.update(kwargs)
+        # Fixing only operands makes a pseudo-instruction (as MV = ADDI(imm=0));
+        # fixing any other field makes an instruction of its own (as SUB).
+        if all(arg in self.asm_args for arg in kwargs):
+            clone._called_from = self
         for arg in kwargs:
             try:
                 clone.asm_args.remove(arg)
@@ -170,24 +204,51 @@ class ILayout:
                 f"'{self.__fullname__}' called without supplying "
                 f"values for arguments: {missing!r}.")
 
-        return self.shape.const(args).as_value().value
+        # Equivalent to `self.shape.const(args).as_value().value`, without
+        # building any Amaranth values.
+        word = 0
+        for name, start, mask, enum in self._packing:
+            value = args[name]
+            if enum is not None:
+                if not isinstance(value, enum):
+                    if (member := self._resolved.get((name, value))) is None:
+                        member = self._resolved[name, value] = enum(value)
+                    value = member
+                value = value.value
+            word |= (value & mask) << start
+        return word
+
+    def fixed_bits(self):
+        """
+        Returns `(mask, match)` for the bits this instruction always encodes
+        the same way: only words where `word & mask == match` can match it.
+        """
+        if self._fixed_bits is None:
+            known = self.args_for()
+            mask = match = 0
+            self._operand_fields = []
+            for elem in self.layout:
+                start, end = self.field_ranges[elem]
+                field_mask = 2 ** (end - start) - 1
+                if elem in known:
+                    mask |= field_mask << start
+                    match |= (known[elem] & field_mask) << start
+                else:
+                    self._operand_fields.append((elem, start, field_mask))
+            self._fixed_bits = (mask, match)
+        return self._fixed_bits
 
     def match_value(self, inp):
-        known = self.args_for()
-
-        rem = list(self.layout)
-        for elem, value in known.items():
-            start, end = self.field_ranges[elem]
-            matching = (inp >> start) & (2 ** (end - start) - 1)
-            if matching != value:
-                return None
-            rem.remove(elem)
-
-        kwargs = {}
-        for elem in rem:
-            start, end = self.field_ranges[elem]
-            matching = (inp >> start) & (2 ** (end - start) - 1)
-            kwargs[elem] = matching
+        mask, match = self.fixed_bits()
+        if inp & mask != match:
+            return None
+        return self.operands_for(inp)
+
+    def operands_for(self, inp):
+        """Extracts the operands from `inp`, which must match `fixed_bits`."""
+        self.fixed_bits()
+        kwargs = {elem: (inp >> start) & field_mask
+                  for elem, start, field_mask in self._operand_fields}
 
         try:
             return reduce(lambda kwargs, xfn: xfn.reverse(kwargs), self.xfrms, kwargs)
@@ -0,0 +1,13 @@
+import niar
+from amaranth_boards.icebreaker import ICEBreakerPlatform
+
+__all__ = ["icebreaker", "cxxrtl"]
+
+
+class icebreaker(ICEBreakerPlatform):
+    pass
+
+
+class cxxrtl(niar.CxxrtlPlatform):
+    default_clk_frequency = 12_000_000.0
+    uart_bypass = True
@@ -0,0 +1,44 @@
+from argparse import ArgumentParser
+
+import niar
+from niar import cxxrtl as niar_cxxrtl
+
+from .rtl import Top
+from .platforms import cxxrtl, icebreaker
+
+__all__ = ["Sae", "cli"]
+
+
+class Sae(niar.Project):
+    name = "sae"
+    top = Top
+    targets = [icebreaker]
+    cxxrtl_targets = [cxxrtl]
+
+
+def cli(np):
+    """
+    niar's command line plus our own subcommands. niar.Project won't take
+    extra properties, so they can't hang off `Sae` itself.
+    """
+    from . import bench, build, fuzz
+    from .sim import checkpoint, profile
+
+    parser = ArgumentParser(prog=np.name)
+    subparsers = parser.add_subparsers(required=True)
+
+    build.add_arguments(
+        np, subparsers.add_parser("build", help="build the design, and optionally program it"))
+    niar_cxxrtl.add_arguments(
+        np, subparsers.add_parser("cxxrtl", help="run the C++ simulator tests"))
+    bench.add_arguments(
+        np, subparsers.add_parser("bench", help="run the benchmark suite on the hart"))
+    profile.add_arguments(
+        np, subparsers.add_parser("profile", help="profile a program on the hart"))
+    checkpoint.add_arguments(
+        np, subparsers.add_parser("checkpoint", help="save a program's state partway through"))
+    fuzz.add_arguments(
+        np, subparsers.add_parser("fuzz", help="fuzz the hart against a reference model"))
+
+    args = parser.parse_args()
+    args.func(args)
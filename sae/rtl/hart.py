@@ -1,16 +1,17 @@
-from itertools import islice
 from pathlib import Path
 from typing import Optional
 
 from amaranth import Array, C, Cat, Elaboratable, Module, Mux, Shape, Signal
+from amaranth.lib import data
 from amaranth.lib.enum import Enum, IntEnum
 from amaranth.lib.memory import Memory
 
+from ..image import load_image
 from .isa_rv32 import RV32I
 from .mmu import MMU, AccessWidth
 from .uart import UART
 
-__all__ = ["Hart", "State", "FaultCode"]
+__all__ = ["Hart", "State", "FaultCode", "RVFI"]
 
 
 class State(Enum, shape=1):
@@ -24,6 +25,32 @@ class FaultCode(IntEnum):
     PC_MISALIGNED = 2
 
 
+class RVFI(data.StructLayout):
+    """
+    One retired instruction, after the RISC-V Formal Interface.
+
+    `mem_addr` is the access's own (possibly unaligned) address and the masks
+    are unshifted: 0b0001, 0b0011 or 0b1111 from the low byte of the data.
+    """
+
+    def __init__(self):
+        super().__init__({
+            "valid": 1,
+            "order": 64,
+            "insn": 32,
+            "trap": 1,
+            "pc_rdata": 32,
+            "pc_wdata": 32,
+            "rd_addr": 5,
+            "rd_wdata": 32,
+            "mem_addr": 32,
+            "mem_rmask": 4,
+            "mem_wmask": 4,
+            "mem_rdata": 32,
+            "mem_wdata": 32,
+        })
+
+
 class Hart(Elaboratable):
     ILEN = 32
     XLEN = 32
@@ -32,6 +59,8 @@ class Hart(Elaboratable):
     sysmem: Memory
     reg_inits: dict[str, int]
     track_reg_written: bool
+    semihosting: bool
+    rvfi: Optional[Signal]
 
     plat_uart: Optional[object]
 
@@ -43,6 +72,10 @@ class Hart(Elaboratable):
     pc: Signal
     insn: Signal
 
+    ecall: Signal
+    ecall_done: Signal
+    ecall_ret: Signal
+
     xmem: Memory
     xreg_written: Optional[Array[Signal]]
     xwr_en: Signal
@@ -54,7 +87,8 @@ class Hart(Elaboratable):
     xrd2_reg: Signal
     xrd2_val: Signal
 
-    def __init__(self, *, sysmem=None, reg_inits=None, track_reg_written=False):
+    def __init__(self, *, sysmem=None, reg_inits=None, track_reg_written=False, semihosting=False,
+                 rvfi=False):
         self.sysmem = sysmem or self.sysmem_for(
             Path(__file__).parent.parent.parent / "tests" / "test_shrimprw.bin",
             memory=8192)
@@ -62,6 +96,10 @@ class Hart(Elaboratable):
         if RV32I.Reg("x1") not in self.reg_inits:
             self.reg_inits[RV32I.Reg("x1")] = 0xFFFF_FFFF  # ensure RET faults
         self.track_reg_written = track_reg_written
+        # ECALLs wait for the testbench to service them; see sae.sim.semihost.
+        self.semihosting = semihosting
+        # One record per retired (or trapped) instruction; see RVFI.
+        self.rvfi = Signal(RVFI()) if rvfi else None
 
         self.plat_uart = None
 
@@ -73,13 +111,18 @@ class Hart(Elaboratable):
         self.pc = Signal(self.XLEN)
         self.insn = Signal(self.ILEN)
 
+        self.ecall = Signal()
+        self.ecall_done = Signal()
+        self.ecall_ret = Signal(self.XLEN)
+
         # TODO: don't allocate for x0. Probably cheaper just to take it though ..
         self.xmem = Memory(
             depth=self.XCOUNT,
             shape=self.XLEN,
             init=[self.reg_reset(xn) for xn in range(self.XCOUNT)])
         if self.track_reg_written:
-            self.xreg_written = Array(Signal() for _ in range(self.XCOUNT))
+            self.xreg_written = Array(
+                Signal(name=f"xreg_written_{xn}") for xn in range(self.XCOUNT))
 
         self.xwr_en = Signal()
         self.xwr_reg = Signal(range(self.XCOUNT))
@@ -92,22 +135,12 @@ class Hart(Elaboratable):
 
     @classmethod
     def sysmem_for(cls, path, *, memory):
-        init = cls.sysmem_init_for(path)
+        init = cls.sysmem_init_for(path, memory=memory)
         return Memory(depth=memory // 2, shape=16, init=init)
 
     @staticmethod
-    def sysmem_init_for(path):
-        init = []
-        it = iter(path.read_bytes())
-        while batch := tuple(islice(it, 2)):
-            match batch:
-                case [a, b]:
-                    init.append((b << 8) | a)
-                case [e]:
-                    init.append(e)
-                case _:
-                    assert False, "!?"
-        return init
+    def sysmem_init_for(path, *, memory=None):
+        return load_image(path, limit=memory).words().tolist()
 
     def reg_reset(self, xn):
         if xn == 0:
@@ -273,7 +306,10 @@ class Hart(Elaboratable):
                             with m.Case(0):
                                 with m.Switch(v_i.imm):
                                     with m.Case(RV32I.I.SFunct.ECALL >> 3):
-                                        m.d.sync += self.write_xreg(1, 0x1234CAFE)
+                                        if self.semihosting:
+                                            m.next = "ecall"
+                                        else:
+                                            m.d.sync += self.write_xreg(1, 0x1234CAFE)
                                     with m.Case(RV32I.I.SFunct.EBREAK >> 3):
                                         m.d.sync += self.write_xreg(1, 0x77774444)
                                     with m.Default():
@@ -309,11 +345,12 @@ class Hart(Elaboratable):
                 m.d.comb += alu_b.eq(self.xrd2_val)
                 with m.If(funct7[0]):
                     m.d.comb += alu_b.eq(imm)
-                with m.If(funct7[5]):
-                    with m.If(funct3 == RV32I.R.Funct.ADDSUB):
-                        m.d.comb += alu_b.eq(-self.xrd2_val)
-                    with m.Elif(funct3 == RV32I.R.Funct.SR):
-                        m.d.comb += alu_b.eq(Cat(self.xrd2_val[:5], C(0, 5), C(1, 1)))
+                with m.Elif(funct3 == RV32I.R.Funct.SR):
+                    # Shaped like SRLI/SRAI's immediate: the shift amount, and
+                    # bit 10 set only for SRA.
+                    m.d.comb += alu_b.eq(Cat(self.xrd2_val[:5], C(0, 5), funct7[5]))
+                with m.Elif(funct7[5] & (funct3 == RV32I.R.Funct.ADDSUB)):
+                    m.d.comb += alu_b.eq(-self.xrd2_val)
 
                 m.next = "fetch.init"
                 with m.Switch(funct3):
@@ -431,11 +468,83 @@ class Hart(Elaboratable):
                     # the write being finished by the next read.
                     m.next = "fetch.init"
 
+            if self.semihosting:
+                with m.State("ecall"):
+                    m.d.comb += self.ecall.eq(1)
+                    with m.If(self.ecall_done):
+                        m.d.sync += self.write_xreg(10, self.ecall_ret)
+                        m.next = "fetch.init"
+
             with m.State("faulted"):
                 m.d.comb += self.state.eq(State.FAULTED)
 
+        # For simulation harnesses to see where the cycles go.
+        self.fsm = fsm
+
+        if self.rvfi is not None:
+            self.elaborate_rvfi(m, fsm, mmu)
+
         return m
 
+    def elaborate_rvfi(self, m, fsm, mmu):
+        # Everything is observed from outside the FSM: an instruction starts
+        # when its fetch completes, and retires on the first cycle of the
+        # following fetch.init, when its register write is being committed.
+        # One that faults reports a trap on the first cycle of faulted.
+        rvfi = self.rvfi
+        retiring = Signal()
+        order = Signal(64)
+        pc_rdata = Signal(self.XLEN)
+        mem = Signal(data.StructLayout({
+            "addr": 32, "rmask": 4, "wmask": 4, "rdata": 32, "wdata": 32}))
+
+        def mask(width):
+            return Mux(width == AccessWidth.WORD, 0b1111,
+                       Mux(width == AccessWidth.HALF, 0b0011, 0b0001))
+
+        with m.If(fsm.ongoing("fetch.wait") & mmu.read.resp.valid):
+            m.d.sync += [
+                retiring.eq(1),
+                pc_rdata.eq(self.pc),
+                mem.eq(0),
+            ]
+        with m.If(fsm.ongoing("op.load")):
+            m.d.sync += [
+                mem.addr.eq(mmu.read.req.payload.addr),
+                mem.rmask.eq(mask(mmu.read.req.payload.width)),
+            ]
+        with m.If(fsm.ongoing("l.wait") & mmu.read.resp.valid):
+            m.d.sync += mem.rdata.eq(mmu.read.resp.payload)
+        with m.If(fsm.ongoing("op.store")):
+            m.d.sync += [
+                mem.addr.eq(mmu.write.req.payload.addr),
+                mem.wmask.eq(mask(mmu.write.req.payload.width)),
+                mem.wdata.eq(mmu.write.req.payload.data),
+            ]
+
+        trap = fsm.ongoing("faulted")
+        writing = self.xwr_en & self.xwr_reg.any() & ~trap
+        m.d.comb += [
+            rvfi.valid.eq(retiring & (fsm.ongoing("fetch.init") | trap)),
+            rvfi.order.eq(order),
+            rvfi.insn.eq(self.insn),
+            rvfi.trap.eq(trap),
+            rvfi.pc_rdata.eq(pc_rdata),
+            rvfi.pc_wdata.eq(self.pc),
+            rvfi.rd_addr.eq(Mux(writing, self.xwr_reg, 0)),
+            rvfi.rd_wdata.eq(Mux(writing, self.xwr_val, 0)),
+            rvfi.mem_addr.eq(mem.addr),
+            rvfi.mem_rmask.eq(mem.rmask),
+            rvfi.mem_wmask.eq(mem.wmask),
+            rvfi.mem_rdata.eq(mem.rdata),
+            rvfi.mem_wdata.eq(mem.wdata),
+        ]
+        with m.If(rvfi.valid):
+            m.d.sync += [
+                retiring.eq(0),
+                order.eq(order + 1),
+            ]
+
     def write_xreg(self, xn, value):
         return [
             self.xwr_en.eq(1),
@@ -181,7 +181,9 @@ class RV32I(ISA):
             return {"imm": (self.imm11_5 << 5) | shamt}
 
         def layout_to_inputs(self, *, imm):
-            return {"shamt": imm}
+            if imm >> 5 != self.imm11_5:
+                return None
+            return {"shamt": imm & 0b11111}
 
     ADDI = I(funct3=I.IFunct.ADDI)
     SLTI = I(funct3=I.IFunct.SLTI)
@@ -87,7 +87,7 @@ class MMU(Component):
         # ready/valid, is it?
         for cid, p in self.peripherals.items():
             pc = p.connection(cid)
-            m.submodules += pc
+            m.submodules[f"periph_{cid:04x}"] = pc
 
             with m.If(self.read.req.payload.addr[31] & (self.read.req.payload.addr[:16] == pc.cid)):
                 connect(m, self.read, pc.read)
@@ -132,7 +132,7 @@ class MMURead(Component):
         req_addr = Signal.like(self.read.req.payload.addr)
         req_width = Signal.like(self.read.req.payload.width)
 
-        with m.FSM():
+        with m.FSM() as fsm:
             with m.State("init"):
                 m.d.comb += self.read.req.ready.eq(1)
 
@@ -204,6 +204,8 @@ class MMURead(Component):
                 ]
                 m.next = "init"
 
+        self.fsm = fsm
+
         return m
 
 
@@ -225,7 +227,7 @@ class MMUWrite(Component):
 
         req_payload = Signal.like(self.write.req.payload.data)
 
-        with m.FSM():
+        with m.FSM() as fsm:
             with m.State("init"):
                 m.d.sync += self.port.en.eq(0)
 
@@ -308,4 +310,6 @@ class MMUWrite(Component):
                 ]
                 m.next = "init"
 
+        self.fsm = fsm
+
         return m
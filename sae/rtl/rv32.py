@@ -1,22 +1,26 @@
-from amaranth import C
+import struct
+from functools import cache, lru_cache
 
 from .isa_rv32 import RV32I
 
 __all__ = [
     "disasm",
+    "disasm_array",
+    "disasm_image",
 ]
 
+# Traces retire the same few hundred words over and over.
+DISASM_CACHE_SIZE = 4096
 
-def decode(struct, value):
-    view = struct.shape(C(value, 32))
-    result = {}
 
-    for field in struct.shape.members:
-        slice = view[field]
-        assert type(slice).__name__ == "Slice"
-        v = (slice.value.value & (2**slice.stop - 1)) >> slice.start
-        result[field] = v
-    return result
+@cache
+def _fields(layout):
+    return [(name, start, 2 ** (end - start) - 1)
+            for name, (start, end) in layout.field_ranges.items()]
+
+
+def decode(layout, value):
+    return {name: (value >> start) & mask for name, start, mask in _fields(layout)}
 
 
 def c2(count, value):
@@ -36,91 +40,108 @@ def c2foff(count, value):
         return f"0x{v:x}"
 
 
+# The layout each major opcode's fields are laid out in.
+_LAYOUTS = {
+    RV32I.Opcode.LOAD: RV32I.I,
+    RV32I.Opcode.MISC_MEM: RV32I.I,
+    RV32I.Opcode.OP_IMM: RV32I.I,
+    RV32I.Opcode.JALR: RV32I.I,
+    RV32I.Opcode.SYSTEM: RV32I.I,
+    RV32I.Opcode.OP: RV32I.R,
+    RV32I.Opcode.LUI: RV32I.U,
+    RV32I.Opcode.AUIPC: RV32I.U,
+    RV32I.Opcode.STORE: RV32I.S,
+    RV32I.Opcode.BRANCH: RV32I.B,
+    RV32I.Opcode.JAL: RV32I.J,
+}
 
-def disasm(op: int) -> str:
-    v_i = decode(RV32I.I, op)
-    v_b = decode(RV32I.B, op)
-    v_u = decode(RV32I.U, op)
-    v_r = decode(RV32I.R, op)
-    v_j = decode(RV32I.J, op)
-    v_s = decode(RV32I.S, op)
 
+def _opcode(op):
     try:
-        opcode = RV32I.Opcode(v_i["opcode"])
+        return RV32I.Opcode(op & 0x7F)
     except ValueError:
-        opcode = v_i["opcode"]
+        return op & 0x7F
+
 
+@lru_cache(maxsize=DISASM_CACHE_SIZE)
+def disasm(op: int) -> str:
+    opcode = _opcode(op)
+    layout = _LAYOUTS.get(opcode)
+    return _format(op, opcode, decode(layout, op) if layout else {})
+
+
+def _format(op, opcode, v):
     match opcode:
         case RV32I.Opcode.LOAD:
-            return f"{RV32I.I.LFunct(v_i['funct3']).name.lower()} x{v_i['rd']}, {c2foff(12, v_i['imm'])}(x{v_i['rs1']})"
+            return f"{RV32I.I.LFunct(v['funct3']).name.lower()} x{v['rd']}, {c2foff(12, v['imm'])}(x{v['rs1']})"
         case RV32I.Opcode.MISC_MEM:
-            match v_i["funct3"]:
+            match v["funct3"]:
                 case RV32I.I.MMFunct.FENCE:
-                    succ = v_i["imm"] & 0xF
-                    pred = (v_i["imm"] >> 4) & 0xF
-                    fm = v_i["imm"] >> 8
+                    succ = v["imm"] & 0xF
+                    pred = (v["imm"] >> 4) & 0xF
+                    fm = v["imm"] >> 8
                     if fm == 0b1000 and succ == pred == 0b0011:
                         return "fence.tso"
                     return f"fence {RV32I.arg_fence(pred)}, {RV32I.arg_fence(succ)}"
         case RV32I.Opcode.OP_IMM:
-            funct = RV32I.I.IFunct(v_i["funct3"])
-            if funct == RV32I.I.IFunct.ADDI and v_i["imm"] == 0:
-                if v_i["rd"] == v_i["rs1"] == 0:
+            funct = RV32I.I.IFunct(v["funct3"])
+            if funct == RV32I.I.IFunct.ADDI and v["imm"] == 0:
+                if v["rd"] == v["rs1"] == 0:
                     return "nop"
-                return f"mv x{v_i['rd']}, x{v_i['rs1']}"
-            if funct == RV32I.I.IFunct.ADDI and v_i["rs1"] == 0:
-                return f"li x{v_i['rd']}, 0x{v_i['imm']:x}"
-            if funct == RV32I.I.IFunct.SLTIU and v_i["imm"] == 1:
-                return f"seqz x{v_i['rd']}, x{v_i['rs1']}"
-            if funct == RV32I.I.IFunct.XORI and v_i["imm"] == 0xFFF:
-                return f"not x{v_i['rd']}, x{v_i['rs1']}"
+                return f"mv x{v['rd']}, x{v['rs1']}"
+            if funct == RV32I.I.IFunct.ADDI and v["rs1"] == 0:
+                return f"li x{v['rd']}, 0x{v['imm']:x}"
+            if funct == RV32I.I.IFunct.SLTIU and v["imm"] == 1:
+                return f"seqz x{v['rd']}, x{v['rs1']}"
+            if funct == RV32I.I.IFunct.XORI and v["imm"] == 0xFFF:
+                return f"not x{v['rd']}, x{v['rs1']}"
             match funct:
                 case RV32I.I.IFunct.ADDI | RV32I.I.IFunct.SLTI:
-                    return f"{funct.name.lower()} x{v_i['rd']}, x{v_i['rs1']}, {c2foff(12, v_i['imm'])}"
+                    return f"{funct.name.lower()} x{v['rd']}, x{v['rs1']}, {c2foff(12, v['imm'])}"
                 case RV32I.I.IFunct.SLTIU | RV32I.I.IFunct.ANDI | RV32I.I.IFunct.ORI | RV32I.I.IFunct.XORI | RV32I.I.IFunct.SLLI:
-                    return f"{funct.name.lower()} x{v_i['rd']}, x{v_i['rs1']}, 0x{v_i['imm']:x}"
+                    return f"{funct.name.lower()} x{v['rd']}, x{v['rs1']}, 0x{v['imm']:x}"
                 case RV32I.I.IFunct.SRI:
-                    opc = "srai" if (v_i["imm"] >> 10) & 1 else "srli"
-                    return f"{opc} x{v_i['rd']}, x{v_i['rs1']}, 0x{v_i['imm'] & 0b111111:x}"
+                    opc = "srai" if (v["imm"] >> 10) & 1 else "srli"
+                    return f"{opc} x{v['rd']}, x{v['rs1']}, 0x{v['imm'] & 0b111111:x}"
         case RV32I.Opcode.OP:
-            funct = RV32I.R.Funct(v_r["funct3"])
-            if funct == RV32I.R.Funct.SLTU and v_r["rs1"] == 0:
-                return f"snez x{v_r['rd']}, x{v_r['rs2']}"
+            funct = RV32I.R.Funct(v["funct3"])
+            if funct == RV32I.R.Funct.SLTU and v["rs1"] == 0:
+                return f"snez x{v['rd']}, x{v['rs2']}"
             match funct:
                 case RV32I.R.Funct.ADDSUB:
-                    opc = "sub" if (v_r["funct7"] >> 5) & 1 else "add"
-                    return f"{opc} x{v_r['rd']}, x{v_r['rs1']}, x{v_r['rs2']}"
+                    opc = "sub" if (v["funct7"] >> 5) & 1 else "add"
+                    return f"{opc} x{v['rd']}, x{v['rs1']}, x{v['rs2']}"
                 case RV32I.R.Funct.SLT | RV32I.R.Funct.SLTU | RV32I.R.Funct.AND | RV32I.R.Funct.OR | RV32I.R.Funct.XOR | RV32I.R.Funct.SLL:
-                    return f"{funct.name.lower()} x{v_r['rd']}, x{v_r['rs1']}, x{v_r['rs2']}"
+                    return f"{funct.name.lower()} x{v['rd']}, x{v['rs1']}, x{v['rs2']}"
                 case RV32I.R.Funct.SR:
-                    opc = "sra" if (v_r["funct7"] >> 5) & 1 else "srl"
-                    return f"{opc} x{v_r['rd']}, x{v_r['rs1']}, x{v_r['rs2']}"
+                    opc = "sra" if (v["funct7"] >> 5) & 1 else "srl"
+                    return f"{opc} x{v['rd']}, x{v['rs1']}, x{v['rs2']}"
         case RV32I.Opcode.LUI | RV32I.Opcode.AUIPC:
-            return f"{opcode.name.lower()} x{v_u['rd']}, 0x{v_u['imm']:x}"
+            return f"{opcode.name.lower()} x{v['rd']}, 0x{v['imm']:x}"
         case RV32I.Opcode.STORE:
-            imm = v_s["imm4_0"] | v_s["imm11_5"] << 5
-            return f"{RV32I.S.Funct(v_s['funct3']).name.lower()} x{v_s['rs2']}, {c2foff(12, imm)}(x{v_s['rs1']})"
+            imm = v["imm4_0"] | v["imm11_5"] << 5
+            return f"{RV32I.S.Funct(v['funct3']).name.lower()} x{v['rs2']}, {c2foff(12, imm)}(x{v['rs1']})"
         case RV32I.Opcode.BRANCH:
             imm = (
-                v_b["imm4_1"] << 1
-                | v_b["imm10_5"] << 5
-                | v_b["imm11"] << 11
-                | v_b["imm12"] << 12)
-            return f"{RV32I.B.Funct(v_b['funct3']).name.lower()} x{v_b['rs1']}, x{v_b['rs2']}, {c2foff(13, imm)}"
+                v["imm4_1"] << 1
+                | v["imm10_5"] << 5
+                | v["imm11"] << 11
+                | v["imm12"] << 12)
+            return f"{RV32I.B.Funct(v['funct3']).name.lower()} x{v['rs1']}, x{v['rs2']}, {c2foff(13, imm)}"
         case RV32I.Opcode.JALR:
-            return f"jalr x{v_i['rd']}, x{v_i['rs1']}, {c2foff(12, v_i['imm'])}"
+            return f"jalr x{v['rd']}, x{v['rs1']}, {c2foff(12, v['imm'])}"
         case RV32I.Opcode.JAL:
             imm = (
-                v_j["imm10_1"] << 1
-                | v_j["imm11"] << 11
-                | v_j["imm19_12"] << 12
-                | v_j["imm20"] << 20)
-            if v_j["rd"] == 0:
+                v["imm10_1"] << 1
+                | v["imm11"] << 11
+                | v["imm19_12"] << 12
+                | v["imm20"] << 20)
+            if v["rd"] == 0:
                 return f"j {c2foff(21, imm)}"
-            return f"jal x{v_j['rd']}, {c2foff(21, imm)}"
+            return f"jal x{v['rd']}, {c2foff(21, imm)}"
         case RV32I.Opcode.SYSTEM:
-            if v_i["funct3"] == 0:
-                funct = RV32I.I.SFunct(v_i["imm"] << 3)
+            if v["funct3"] == 0:
+                funct = RV32I.I.SFunct(v["imm"] << 3)
                 return funct.name.lower()
         case 0x00:
             if op & 0xFFFF == 0:
@@ -129,3 +150,60 @@ def disasm(op: int) -> str:
             if op == 0xFFFFFFFF:
                 return "invalid"
     raise RuntimeError(f"unknown insn: {op:0>8x}")
+
+
+def disasm_image(image, *, base=0):
+    """
+    Disassembles each little-endian word of the bytes-like `image`, returning
+    `(addr, word, text)` tuples. Words that aren't instructions come out as
+    `.word` directives.
+    """
+    view = memoryview(image).cast("B")
+    result = []
+    for i, (word,) in enumerate(struct.iter_unpack("<I", view[:len(view) & ~3])):
+        try:
+            text = disasm(word)
+        except (RuntimeError, ValueError):
+            text = f".word 0x{word:08x}"
+        result.append((base + i * 4, word, text))
+    return result
+
+
+def decode_array(layout, words):
+    """`decode` for every word of the NumPy array `words` at once."""
+    return {name: (words >> start) & mask for name, start, mask in _fields(layout)}
+
+
+def disasm_array(words):
+    """
+    Disassembles a NumPy array of instruction words (or anything
+    `numpy.asarray` takes), returning an object array of the same shape.
+
+    Fields are extracted from all words of each layout with vectorised shifts
+    and masks, and text is only formatted once per distinct word, so long
+    traces cost about as much as the code they execute. Words that aren't
+    instructions come out as `.word` directives.
+    """
+    import numpy as np
+
+    words = np.asarray(words, dtype=np.uint32)
+    unique, inverse = np.unique(words, return_inverse=True)
+    texts = np.empty(unique.shape, dtype=object)
+
+    opcodes = unique & 0x7F
+    for value in np.unique(opcodes).tolist():
+        sel = np.flatnonzero(opcodes == value)
+        opcode = _opcode(value)
+        layout = _LAYOUTS.get(opcode)
+        if layout is None:
+            fields = {}
+        else:
+            fields = {name: column.tolist()
+                      for name, column in decode_array(layout, unique[sel]).items()}
+        for j, (i, op) in enumerate(zip(sel.tolist(), unique[sel].tolist())):
+            try:
+                texts[i] = _format(op, opcode, {name: column[j] for name, column in fields.items()})
+            except (RuntimeError, ValueError):
+                texts[i] = f".word 0x{op:08x}"
+
+    return texts[inverse].reshape(words.shape)
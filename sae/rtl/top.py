@@ -0,0 +1,60 @@
+from amaranth import Module, ResetInserter, Signal
+from amaranth.lib import stream
+from amaranth.lib.wiring import Component, In, Out
+
+from ..platforms import cxxrtl, icebreaker
+from .hart import RVFI, Hart
+from .uart import UARTStreams
+
+__all__ = ["Top"]
+
+
+class Top(Component):
+    def __init__(self, *args, platform, **kwargs):
+        match platform:
+            case cxxrtl():
+                # The harness services ECALLs; see cxxrtl/Semihost.h. It traces
+                # retirements off the RVFI port; see cxxrtl/Tracer.h.
+                self.hart = Hart(*args, semihosting=True, rvfi=True, **kwargs)
+                super().__init__({
+                    "uart_rd": In(stream.Signature(8)),
+                    "uart_wr": Out(stream.Signature(8)),
+                    "ecall": Out(1),
+                    "ecall_done": In(1),
+                    "ecall_ret": In(Hart.XLEN),
+                    "rvfi": Out(RVFI()),
+                })
+
+            case _:
+                self.hart = Hart(*args, **kwargs)
+                super().__init__({})
+
+    def elaborate(self, platform):
+        m = Module()
+
+        rst = Signal()
+        m.d.sync += rst.eq(0)
+
+        match platform:
+            case icebreaker():
+                plat_button = platform.request("button")
+                with m.If(plat_button.i):
+                    m.d.sync += rst.eq(1)
+
+                self.hart.plat_uart = platform.request("uart")
+
+            case cxxrtl():
+                # The harness exchanges bytes with the UART directly, rather
+                # than bit-banging its serial lines.
+                self.hart.plat_uart = UARTStreams(rd=self.uart_rd, wr=self.uart_wr)
+
+                m.d.comb += [
+                    self.ecall.eq(self.hart.ecall),
+                    self.hart.ecall_done.eq(self.ecall_done),
+                    self.hart.ecall_ret.eq(self.ecall_ret),
+                    self.rvfi.eq(self.hart.rvfi),
+                ]
+
+        m.submodules.hart = ResetInserter(rst)(self.hart)
+
+        return m
@@ -1,12 +1,14 @@
+from dataclasses import dataclass
+
 from amaranth import Module
 from amaranth.lib import stream
 from amaranth.lib.fifo import SyncFIFOBuffered
-from amaranth.lib.wiring import Component, In, Out
+from amaranth.lib.wiring import Component, In, Out, connect, flipped
 from amaranth_stdio.serial import AsyncSerial
 
 from .mmu import MMUReadBusSignature, MMUWriteBusSignature
 
-__all__ = ["UART"]
+__all__ = ["UART", "UARTStreams"]
 
 
 class UARTConnection(Component):
@@ -62,6 +64,16 @@ class UARTConnection(Component):
 
         return m
 
+@dataclass
+class UARTStreams:
+    """
+    Where a bypassed UART's streams go instead of a serial port: bytes for the
+    core arrive on `rd`, and bytes the core writes leave on `wr`.
+    """
+    rd: stream.Interface
+    wr: stream.Interface
+
+
 class UART(Component):
     wr: In(stream.Signature(8))
     rd: Out(stream.Signature(8))
@@ -82,8 +94,13 @@ class UART(Component):
     def elaborate(self, platform):
         m = Module()
 
-        if getattr(platform, "simulation", False):
-            # Blackboxed in tests.
+        if getattr(platform, "uart_bypass", False):
+            # Transaction-level: there's no serial port, and bytes are exchanged
+            # directly at our stream interface. When not routed elsewhere by
+            # UARTStreams, the simulator drives it.
+            if self._plat_uart is not None:
+                connect(m, flipped(self.rd), flipped(self._plat_uart.rd))
+                connect(m, flipped(self.wr), flipped(self._plat_uart.wr))
             return m
 
         freq = platform.default_clk_frequency
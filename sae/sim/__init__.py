@@ -0,0 +1,273 @@
+import copy
+import os
+from functools import partial, singledispatch
+from pathlib import Path
+
+from amaranth.lib.memory import Memory
+
+from ..rtl.hart import FaultCode, Hart, State
+from ..rtl.isa_rv32 import RV32I
+from ..rtl.rv32 import disasm
+from . import results
+from .checkpoint import Checkpoint, CheckpointAt
+from .mix import InstructionMix
+from .profile import Profiler
+from .pysim import print_mmu
+from .semihost import Semihost, Sysmem
+from .spin import SpinDetector
+from .states import StateCounter
+from .uart import UARTQueue
+
+__all__ = [
+    "BACKENDS", "run_until_fault", "print_mmu", "Checkpoint", "CheckpointAt", "Semihost",
+    "UARTQueue",
+]
+
+BACKENDS = ["pysim", "cxxrtl"]
+
+Reg = RV32I.Reg
+
+
+def default_backend():
+    backend = os.environ.get("SAE_SIM", "pysim")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown simulation backend {backend!r} (from SAE_SIM).")
+    return backend
+
+
+@singledispatch
+def run_until_fault(hart: Hart, *, max_cycles=1000, backend=None, uart=None, semihost=None,
+                    cache=None, stats=None, checkpoint_at=None, resume=None, fast_forward=True):
+    """
+    Run `hart` until it faults, returning the final pc, registers and fault.
+
+    With `cache` (default: $SAE_SIM_CACHE=1), results are looked up in and
+    stored to `results.RESULTS`, keyed on the design, program and register
+    inits. Runs given their own `uart` or `semihost` can't be replayed from a
+    cache, and a semihosting hart might read files, so those always simulate.
+
+    If `stats` is a dict, the run's clock cycles and retired instructions are
+    stored in it as "cycles" and "instret", cycles per FSM state as "states",
+    a `profile.Profiler` as "profile", and the instruction mix (see
+    `mix.InstructionMix`) as "mix"; such runs always simulate too.
+
+    With `checkpoint_at` (a `CheckpointAt`), the run stops at the first
+    instruction boundary it names and returns a `Checkpoint` instead; if the
+    hart faults first, the results are returned as usual. With `resume`, the
+    run starts from a `Checkpoint` rather than reset, carrying on with its UART
+    and semihost state unless given others. `hart` should be built as the
+    checkpointed one was, and `stats` only counts from the checkpoint on.
+
+    Busy-waits that nothing can end before the UART's next byte (or ever) are
+    fast-forwarded over a lap at a time, as they'd have run; `fast_forward`
+    (like cxxrtl/main.cc's --no-fast-forward) can turn that off to step every
+    cycle. The results are the same either way.
+    """
+    backend = backend or default_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown simulation backend {backend!r}.")
+    if cache is None:
+        cache = results.enabled()
+
+    if resume is not None:
+        # Leave the checkpoint as it was, so it can be resumed again.
+        if uart is None:
+            uart = copy.deepcopy(resume.uart)
+        if semihost is None:
+            semihost = copy.deepcopy(resume.semihost)
+
+    key = None
+    if (cache and uart is None and semihost is None and stats is None and checkpoint_at is None
+            and resume is None and not hart.semihosting):
+        key = results.run_key(hart, backend=backend, max_cycles=max_cycles)
+        if (stored := results.load(key)) is not None:
+            for elaboratable in (hart, hart.sysmem, hart.xmem):
+                elaboratable._MustUse__silence = True
+            return stored
+
+    if uart is None:
+        uart = UARTQueue((hart.reg_inits or {}).get("uart", b""))
+    if semihost is None:
+        semihost = Semihost()
+    loop = partial(_run, hart=hart, max_cycles=max_cycles, uart=uart, semihost=semihost,
+                   stats=stats, checkpoint_at=checkpoint_at, resume=resume,
+                   fast_forward=fast_forward)
+
+    match backend:
+        case "pysim":
+            from . import pysim
+            ran = pysim.simulate(hart, loop)
+        case "cxxrtl":
+            from . import cxxrtl
+            ran = cxxrtl.simulate(hart, loop)
+
+    if key is not None:
+        results.store(key, ran)
+    return ran
+
+
+async def _run(access, *, hart, max_cycles, uart, semihost, stats, checkpoint_at, resume,
+               fast_forward):
+    """
+    The run loop, shared by the backends. Each drives it with an `access` to
+    its simulation of `hart`:
+
+    - `access.peek(name)` and `access.poke(name, value)` get and set the
+      hart's signals by name (see either backend for the names);
+    - `access.xreg(i)` is register `i`, and `access.written(i)` whether it's
+      been written;
+    - `access.read_mem(i)` and `access.write_mem(i, value)` get and set
+      sysmem halfwords;
+    - `access.fsm_states()` is the hart's and MMU's FSM states, decoded by
+      `access.decodings`;
+    - `await access.tick()` advances a clock cycle, `access.restore(checkpoint)`
+      loads a checkpoint's state, and `access.trace()` prints anything the
+      backend adds to each instruction's trace.
+    """
+    def offer():
+        datum = uart.offer
+        access.poke("uart_rd_valid", datum is not None)
+        access.poke("uart_rd_payload", datum or 0)
+
+    if resume is not None:
+        assert len(resume.sysmem) == hart.sysmem.depth, "checkpoint is for another sysmem"
+        access.restore(resume)
+
+    offer()
+
+    mem = Sysmem(access.read_mem, access.write_mem, hart.sysmem.depth)
+
+    first = True
+    clock = resume.clock if resume else 0
+    cycles = resume.instret - 1 if resume else -1
+    start = (clock, cycles)
+    written = set()
+    spins = SpinDetector()
+    idle = Checkpoint.idle_states(access.decodings)
+    counter = StateCounter(access.decodings) if stats is not None else None
+    profiler = Profiler() if stats is not None else None
+    mix = InstructionMix() if stats is not None else None
+    while State.RUNNING == State(access.peek("state")):
+        if first:
+            first = False
+        else:
+            if counter is not None:
+                counter.sample(access.fsm_states())
+            await access.tick()
+            clock += 1
+            if uart.advance(clock):
+                spins.disturb()
+                offer()
+        if access.peek("mmu_write_valid"):
+            spins.disturb()
+        if access.peek("uart_wr_valid"):
+            uart.core_wrote(access.peek("uart_wr_payload"))
+        if access.peek("uart_rd_ready"):
+            spins.disturb()
+            uart.core_read()
+            offer()
+        if hart.semihosting:
+            ecall = access.peek("ecall")
+            if ecall:
+                spins.disturb()
+                ret = semihost.service(
+                    access.xreg(17), [access.xreg(i) for i in range(10, 13)], mem, clock=clock)
+                if semihost.exited:
+                    break
+                access.poke("ecall_ret", ret)
+            access.poke("ecall_done", ecall)
+
+        if (checkpoint_at is not None and
+                checkpoint_at.reached(clock, access.peek("pc")) and
+                access.fsm_states() == idle and
+                not access.peek("mmu_write_port_en")):
+            return Checkpoint.take(
+                clock=clock,
+                instret=cycles + 1,
+                pc=access.peek("pc"),
+                xregs=[access.xreg(i) for i in range(32)],
+                written=[i for i in range(1, 32)
+                         if not hart.track_reg_written or access.written(i)],
+                xwr=(access.peek("xwr_en"), access.peek("xwr_reg"), access.peek("xwr_val")),
+                sysmem=[access.read_mem(i) for i in range(hart.sysmem.depth)],
+                uart=uart,
+                semihost=semihost)
+
+        if access.peek("resolving"):
+            if cycles == max_cycles:
+                raise RuntimeError("max cycles reached")
+            cycles += 1
+            pc = access.peek("pc")
+            insn = access.peek("insn")
+            if profiler is not None:
+                profiler.retire(pc, insn)
+            xregs = [access.xreg(i) for i in range(32)]
+            if mix is not None:
+                mix.retire(pc, insn, xregs)
+            print(f"pc={pc:08x} [{insn:0>8x}]  {disasm(insn):<20}", end="")
+            for i in range(1, 32):
+                if i in written or xregs[i]:
+                    written.add(i)
+                    rn = Reg(f"x{i}").name
+                    print(f"  {rn}={xregs[i]:08x}", end="")
+            print()
+            access.trace()
+
+            if fast_forward and (lap := spins.observe((pc, *xregs), clock=clock, cycles=cycles)):
+                laps = SpinDetector.laps(
+                    lap, clock=clock, cycles=cycles, max_cycles=max_cycles,
+                    until=uart.next_arrival)
+                if laps:
+                    print(f"fast-forwarding {laps} laps ({laps * lap[0]} cycles) of busy-wait")
+                    clock += laps * lap[0]
+                    cycles += laps * lap[1]
+                    if counter is not None:
+                        counter.repeat(lap[0], laps)
+                        profiler.repeat(lap[1], laps)
+                        mix.repeat(lap[1], laps)
+                    if uart.advance(clock):
+                        offer()
+
+    if stats is not None:
+        stats["cycles"] = clock - start[0]
+        # Every instruction the hart got as far as resolving: one that faults
+        # while resolving counts, one that's illegal once fetched doesn't.
+        stats["instret"] = cycles - start[1]
+        stats["states"] = counter.breakdown()
+        stats["profile"] = profiler
+        stats["mix"] = mix.summary()
+
+    results = {}
+    results["pc"] = access.peek("pc")
+    for i in range(1, 32):
+        if not hart.track_reg_written or access.written(i):
+            results[Reg(f"x{i}")] = access.xreg(i)
+    results["faultcode"] = FaultCode(access.peek("fault_code"))
+    results["faultinsn"] = access.peek("fault_insn")
+    if uart_recv := uart.recv():
+        results["uart"] = uart_recv
+    if semihost.exited:
+        results["exit"] = semihost.exit_code
+    if semihost.stdout:
+        results["stdout"] = bytes(semihost.stdout)
+    return results
+
+
+@run_until_fault.register(Path)
+def run_until_fault_bin(path, *, memory=8192, max_cycles=1000, backend=None, uart=None,
+                        semihost=None, cache=None, stats=None, checkpoint_at=None, resume=None,
+                        fast_forward=True, **kwargs):
+    return run_until_fault(
+        Hart(sysmem=Hart.sysmem_for(path, memory=memory), **kwargs),
+        max_cycles=max_cycles, backend=backend, uart=uart, semihost=semihost, cache=cache,
+        stats=stats, checkpoint_at=checkpoint_at, resume=resume, fast_forward=fast_forward)
+
+
+@run_until_fault.register(list)
+def run_until_fault_por(mem, *, max_cycles=1000, backend=None, uart=None, semihost=None,
+                        cache=None, stats=None, checkpoint_at=None, resume=None,
+                        fast_forward=True, **kwargs):
+    return run_until_fault(
+        Hart(sysmem=Memory(depth=len(mem), shape=16, init=mem), **kwargs),
+        max_cycles=max_cycles, backend=backend, uart=uart, semihost=semihost, cache=cache,
+        stats=stats, checkpoint_at=checkpoint_at, resume=resume, fast_forward=fast_forward)
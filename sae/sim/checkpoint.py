@@ -0,0 +1,178 @@
+"""
+Snapshots of a running hart, to resume from later instead of simulating from
+reset.
+
+Checkpoints are only taken between instructions, when the hart's FSM is about
+to fetch and its MMU is idle: everything else the design holds is either reset
+or about to be overwritten then, so the pc, the register file, sysmem and
+which registers have been written are the whole of its state. A register write
+committing that cycle is folded in. Either backend can resume a checkpoint
+either took.
+"""
+
+import contextlib
+import os
+import pickle
+from array import array
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Optional
+
+from .semihost import Semihost
+from .uart import UARTQueue
+
+__all__ = ["Checkpoint", "CheckpointAt", "add_arguments"]
+
+MAGIC = b"sae-checkpoint"
+VERSION = 1
+
+# The state of the hart's, MMU read and MMU write FSMs between instructions.
+IDLE = ("fetch.init", "init", "init")
+
+
+@dataclass(frozen=True)
+class CheckpointAt:
+    """Where to take a checkpoint: the first boundary at or after `clock`, or at `pc`."""
+
+    clock: Optional[int] = None
+    pc: Optional[int] = None
+
+    def reached(self, clock, pc):
+        return ((self.clock is not None and clock >= self.clock) or
+                (self.pc is not None and pc == self.pc))
+
+
+@dataclass
+class Checkpoint:
+    # Clock cycles elapsed, and instructions resolved.
+    clock: int
+    instret: int
+    pc: int
+    xregs: list[int]
+    written: set[int]
+    sysmem: array
+    uart: UARTQueue = field(default_factory=UARTQueue)
+    semihost: Semihost = field(default_factory=Semihost)
+
+    @staticmethod
+    def idle_states(decodings):
+        """The raw FSM state values between instructions, given `StateCounter` decodings."""
+        return tuple({name: value for value, name in decoding.items()}[idle]
+                     for decoding, idle in zip(decodings, IDLE))
+
+    @classmethod
+    def take(cls, *, clock, instret, pc, xregs, written, xwr, sysmem, uart, semihost):
+        """
+        `xwr` is the pending register write as (en, reg, val); `sysmem` is a
+        sequence of halfwords.
+        """
+        xregs = list(xregs)
+        written = set(written)
+        en, reg, val = xwr
+        if en and reg:
+            xregs[reg] = val
+            written.add(reg)
+        return cls(clock=clock, instret=instret, pc=pc, xregs=xregs, written=written,
+                   sysmem=array("H", sysmem), uart=uart, semihost=semihost)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump((MAGIC, VERSION, self), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            try:
+                magic, version, checkpoint = pickle.load(f)
+            except (pickle.UnpicklingError, EOFError, ValueError) as e:
+                raise ValueError(f"{path}: not a checkpoint") from e
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a checkpoint")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported checkpoint version {version}")
+        return checkpoint
+
+
+def add_arguments(np, parser):
+    from . import BACKENDS
+
+    parser.set_defaults(func=partial(main, np))
+    parser.add_argument(
+        "program",
+        type=Path,
+        help="a flat binary, ELF executable, or assembly source",
+    )
+    parser.add_argument(
+        "output",
+        type=Path,
+        help="where to write the checkpoint",
+    )
+    at = parser.add_mutually_exclusive_group(required=True)
+    at.add_argument(
+        "--at-cycle",
+        type=lambda s: int(s, 0),
+        help="checkpoint at the first instruction boundary from this clock cycle",
+    )
+    at.add_argument(
+        "--at-pc",
+        type=lambda s: int(s, 0),
+        help="checkpoint when the hart is about to fetch from this address",
+    )
+    parser.add_argument(
+        "--resume",
+        type=Path,
+        help="start from this checkpoint instead of reset",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="cxxrtl",
+        help="simulation backend (default: cxxrtl)",
+    )
+    parser.add_argument(
+        "--memory",
+        type=lambda s: int(s, 0),
+        default=8192,
+        help="sysmem size in bytes (default: 8192)",
+    )
+    parser.add_argument(
+        "--max-cycles",
+        type=lambda s: int(s, 0),
+        default=1_000_000,
+        help="give up after this many instructions (default: 1000000)",
+    )
+    parser.add_argument(
+        "--no-fast-forward",
+        dest="fast_forward",
+        action="store_false",
+        help="simulate busy-waits cycle by cycle instead of skipping over them",
+    )
+    parser.add_argument(
+        "--uart",
+        default="",
+        help="bytes to send the hart over the UART",
+    )
+
+
+def main(np, args):
+    from ..rtl.hart import Hart
+    from . import run_until_fault
+
+    hart = Hart(
+        sysmem=Hart.sysmem_for(args.program, memory=args.memory),
+        reg_inits={"uart": args.uart.encode()})
+    resume = Checkpoint.load(args.resume) if args.resume else None
+    # The backends trace every instruction to stdout.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        ran = run_until_fault(
+            hart, max_cycles=args.max_cycles, backend=args.backend, resume=resume,
+            checkpoint_at=CheckpointAt(clock=args.at_cycle, pc=args.at_pc),
+            fast_forward=args.fast_forward)
+
+    if not isinstance(ran, Checkpoint):
+        print(f"hart stopped at pc=0x{ran['pc']:08x} before reaching the checkpoint")
+        raise SystemExit(1)
+    ran.save(args.output)
+    print(f"checkpoint at cycle {ran.clock}, pc=0x{ran.pc:08x}, "
+          f"{ran.instret} instructions in: {args.output}")
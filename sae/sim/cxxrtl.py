@@ -0,0 +1,338 @@
+import ctypes
+import fcntl
+import hashlib
+import os
+import subprocess
+import sys
+from ctypes import POINTER, byref, c_char_p, c_size_t, c_uint32, c_void_p
+from pathlib import Path
+
+from amaranth import Fragment, Shape
+from amaranth._toolchain.yosys import find_yosys
+from amaranth.back import rtlil
+from amaranth.lib.memory import Memory
+from amaranth.utils import ceil_log2
+
+from .. import cache
+from ..rtl.hart import Hart
+from ..targets import test
+from .states import StateCounter
+
+__all__ = ["CxxrtlHart", "simulate"]
+
+# The smallest sysmem we compile a model for, in 16-bit words. Harts with
+# larger memories get a model of the next power of two up.
+MIN_DEPTH = 4096
+
+CXXFLAGS = [
+    "-std=c++17",
+    "-O1",
+    "-shared",
+    "-fPIC",
+    "-DCXXRTL_INCLUDE_CAPI_IMPL",
+]
+
+# Elaborated models, as (RTLIL, FSM decodings), by `cache.rtl_digest`.
+ELABORATIONS = cache.DiskCache("rtlil")
+
+
+class _Object(ctypes.Structure):
+    # struct cxxrtl_object from <cxxrtl/capi/cxxrtl_capi.h>.
+    _fields_ = [
+        ("type", c_uint32),
+        ("flags", c_uint32),
+        ("width", c_size_t),
+        ("lsb_at", c_size_t),
+        ("depth", c_size_t),
+        ("zero_at", c_size_t),
+        ("curr", POINTER(c_uint32)),
+        ("next", POINTER(c_uint32)),
+        ("outline", c_void_p),
+        ("attrs", c_void_p),
+    ]
+
+    VALUE = 0
+    WIRE = 1
+    MEMORY = 2
+    ALIAS = 3
+    OUTLINE = 4
+
+
+class Item:
+    def __init__(self, obj):
+        self.obj = obj
+        self.chunks = (obj.width + 31) // 32
+
+    def get(self, index=0):
+        base = index * self.chunks
+        v = 0
+        for i in reversed(range(self.chunks)):
+            v = (v << 32) | self.obj.curr[base + i]
+        return v
+
+    def set(self, value, index=0):
+        # Values have curr == next; wires are committed from next; memories
+        # only have curr.
+        target = self.obj.curr if self.obj.type == _Object.MEMORY else self.obj.next
+        assert target, "item is not writable"
+        base = index * self.chunks
+        for i in range(self.chunks):
+            target[base + i] = value & 0xFFFF_FFFF
+            value >>= 32
+
+    def load(self, values):
+        for i, value in enumerate(values):
+            self.set(value, index=i)
+
+
+class CxxrtlHart:
+    """
+    A `Hart` compiled once to a CXXRTL shared library and driven through the
+    CXXRTL C API.
+
+    The model has a fixed sysmem depth; program images and register initial
+    values are written into its memories through debug items, so any number of
+    programs can be run against one compilation.
+    """
+
+    _models: dict[tuple[int, bool], "CxxrtlHart"] = {}
+
+    depth: int
+    semihosting: bool
+    path: Path
+
+    @classmethod
+    def for_depth(cls, depth, *, semihosting=False):
+        depth = max(MIN_DEPTH, 2 ** ceil_log2(depth))
+        key = (depth, semihosting)
+        if key not in cls._models:
+            cls._models[key] = cls(depth, semihosting=semihosting)
+        return cls._models[key]
+
+    def __init__(self, depth, *, semihosting=False):
+        self.depth = depth
+        self.semihosting = semihosting
+
+        # Elaborating takes longer than loading a compiled model, so skip it
+        # when the design hasn't changed.
+        key = cache.rtl_digest("cxxrtl", cache.source_digest(sys.modules[__name__]),
+                               depth, semihosting)
+        if (elaborated := ELABORATIONS.get(key)) is None:
+            elaborated = self._elaborate()
+            ELABORATIONS.put(key, elaborated)
+        il_text, self.fsm_decodings = elaborated
+
+        digest = hashlib.sha256()
+        digest.update(il_text.encode())
+        digest.update(" ".join(CXXFLAGS).encode())
+        self.path = build_dir() / f"hart-{depth}-{digest.hexdigest()[:16]}.so"
+
+        self._compile(il_text)
+        self._load()
+
+    def _elaborate(self):
+        """The model's RTLIL, and its FSMs' `StateCounter` decodings."""
+        hart = Hart(
+            sysmem=Memory(depth=self.depth, shape=16, init=[]),
+            track_reg_written=True,
+            semihosting=self.semihosting)
+        fragment = Fragment.get(hart, platform=test())
+        uart = hart.mmu.peripherals[0x0001]
+        # The UART is bypassed in simulation; expose its receive side so we can
+        # drive it, and likewise the semihosting handshake.
+        ports = [uart.rd.valid, uart.rd.payload]
+        if self.semihosting:
+            ports += [hart.ecall_done, hart.ecall_ret]
+        il_text, _ = rtlil.convert_fragment(fragment, ports=ports, name="hart")
+        return il_text, StateCounter.decodings_for(hart)
+
+    def _compile(self, il_text):
+        os.makedirs(self.path.parent, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock:
+            # xdist workers will all want the same model at the same time.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.path.exists():
+                return
+
+            yosys = find_yosys(lambda ver: ver >= (0, 40))
+            cc_text = yosys.run(["-q", "-"], (
+                "read_rtlil <<rtlil\n"
+                f"{il_text}\n"
+                "rtlil\n"
+                "write_cxxrtl\n"
+            ), ignore_warnings=True)
+            cc_path = self.path.with_suffix(".cc")
+            cc_path.write_text(cc_text)
+
+            runtime = yosys.data_dir() / "include" / "backends" / "cxxrtl" / "runtime"
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            subprocess.run(
+                ["c++", *CXXFLAGS, f"-I{runtime}", cc_path, "-o", tmp_path],
+                check=True)
+            os.replace(tmp_path, self.path)
+
+    def _load(self):
+        lib = self.lib = ctypes.CDLL(str(self.path))
+        lib.cxxrtl_design_create.restype = c_void_p
+        lib.cxxrtl_design_create.argtypes = []
+        lib.cxxrtl_create.restype = c_void_p
+        lib.cxxrtl_create.argtypes = [c_void_p]
+        lib.cxxrtl_destroy.restype = None
+        lib.cxxrtl_destroy.argtypes = [c_void_p]
+        lib.cxxrtl_step.restype = c_size_t
+        lib.cxxrtl_step.argtypes = [c_void_p]
+        lib.cxxrtl_get_parts.restype = POINTER(_Object)
+        lib.cxxrtl_get_parts.argtypes = [c_void_p, c_char_p, POINTER(c_size_t)]
+        lib.cxxrtl_outline_eval.restype = None
+        lib.cxxrtl_outline_eval.argtypes = [c_void_p]
+
+    def instance(self):
+        return CxxrtlInstance(self)
+
+
+class CxxrtlInstance:
+    """One fresh copy of a `CxxrtlHart`'s state."""
+
+    def __init__(self, model):
+        self.model = model
+        self.lib = model.lib
+        self.handle = self.lib.cxxrtl_create(self.lib.cxxrtl_design_create())
+
+        self.clk = self["clk"]
+        self.state = self["state"]
+        self.resolving = self["resolving"]
+        self.pc = self["pc"]
+        self.insn = self["insn"]
+        self.fault_code = self["fault_code"]
+        self.fault_insn = self["fault_insn"]
+        self.xmem = self["xmem"]
+        self.sysmem = self["mmu sysmem"]
+        self.xreg_written = [None] + [self[f"xreg_written_{xn}"] for xn in range(1, 32)]
+        self.mmu_write_valid = self["mmu write__req__valid"]
+        self.mmu_write_port_en = self["mmu mmu_write port__en"]
+        self.xwr_en = self["xwr_en"]
+        self.xwr_reg = self["xwr_reg"]
+        self.xwr_val = self["xwr_val"]
+        if model.semihosting:
+            self.ecall = self["ecall"]
+            self.ecall_done = self["ecall_done"]
+            self.ecall_ret = self["ecall_ret"]
+        self.uart_rd_valid = self["rd__valid"]
+        self.uart_rd_payload = self["rd__payload"]
+        self.uart_rd_ready = self["mmu periph_0001 rd__ready"]
+        self.uart_wr_valid = self["mmu periph_0001 wr__valid"]
+        self.uart_wr_payload = self["mmu periph_0001 wr__payload"]
+        self.fsm_states = [
+            self["fsm_state"], self["mmu mmu_read fsm_state"], self["mmu mmu_write fsm_state"]]
+
+        self._outline = self.state.obj.outline
+
+    def __getitem__(self, name):
+        parts = c_size_t()
+        obj = self.lib.cxxrtl_get_parts(self.handle, name.encode(), byref(parts))
+        if not obj:
+            raise KeyError(name)
+        assert parts.value == 1, f"{name!r} has {parts.value} parts"
+        return Item(obj.contents)
+
+    def __del__(self):
+        if handle := getattr(self, "handle", None):
+            self.lib.cxxrtl_destroy(handle)
+            self.handle = None
+
+    def load(self, hart):
+        # We only borrow the hart's memory contents; it's never elaborated itself.
+        for elaboratable in (hart, hart.sysmem, hart.xmem):
+            elaboratable._MustUse__silence = True
+
+        assert hart.sysmem.depth <= self.model.depth
+        assert Shape.cast(hart.sysmem.shape).width == 16
+        self._load_sysmem(list(hart.sysmem.init), hart.sysmem.depth)
+        self.xmem.load(hart.xmem.init)
+        self.settle()
+
+    def _load_sysmem(self, init, depth):
+        # Mirror the image across the model's memory the way the hart's
+        # narrower address bus would.
+        span = 2 ** ceil_log2(depth)
+        image = init + [0] * (span - len(init))
+        self.sysmem.load(image * (self.model.depth // span))
+
+    def restore(self, checkpoint, depth):
+        """Overwrite the loaded state with `checkpoint`'s, for a sysmem of `depth`."""
+        assert len(checkpoint.sysmem) == depth, "checkpoint is for another sysmem"
+        self._load_sysmem(checkpoint.sysmem.tolist(), depth)
+        self.xmem.load(checkpoint.xregs)
+        self.pc.set(checkpoint.pc)
+        for i in checkpoint.written:
+            self.xreg_written[i].set(1)
+        self.settle()
+
+    def settle(self):
+        self.lib.cxxrtl_step(self.handle)
+        self.lib.cxxrtl_outline_eval(self._outline)
+
+    def tick(self):
+        # Inputs set since the last tick need to propagate before the edge.
+        self.lib.cxxrtl_step(self.handle)
+        self.clk.set(1)
+        self.lib.cxxrtl_step(self.handle)
+        self.clk.set(0)
+        self.settle()
+
+
+class _Access:
+    """The run loop's access to a `CxxrtlInstance` (see `sae.sim._run`)."""
+
+    def __init__(self, sim, hart):
+        self.sim = sim
+        self.hart = hart
+        self.decodings = sim.model.fsm_decodings
+
+    def peek(self, name):
+        return getattr(self.sim, name).get()
+
+    def poke(self, name, value):
+        getattr(self.sim, name).set(value)
+
+    def xreg(self, i):
+        return self.sim.xmem.get(i)
+
+    def written(self, i):
+        return self.sim.xreg_written[i].get()
+
+    def read_mem(self, i):
+        return self.sim.sysmem.get(i)
+
+    def write_mem(self, i, value):
+        self.sim.sysmem.set(value, index=i)
+
+    def fsm_states(self):
+        return tuple(item.get() for item in self.sim.fsm_states)
+
+    async def tick(self):
+        self.sim.tick()
+
+    def restore(self, checkpoint):
+        self.sim.restore(checkpoint, self.hart.sysmem.depth)
+
+    def trace(self):
+        pass
+
+
+def simulate(hart: Hart, loop):
+    """Simulate `hart` with CXXRTL, driven by the run loop `loop`; returns what it does."""
+    sim = CxxrtlHart.for_depth(hart.sysmem.depth, semihosting=hart.semihosting).instance()
+    sim.load(hart)
+
+    # Nothing here suspends, so the loop runs to completion in one step.
+    run = loop(_Access(sim, hart))
+    try:
+        run.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise AssertionError("run loop suspended")
+
+
+def build_dir():
+    return cache.build_dir("cxxrtl-sim")
@@ -0,0 +1,98 @@
+from collections import Counter, deque
+
+from ..rtl.isa_rv32 import RV32I
+from ..rtl.mmu import AccessWidth
+from .spin import SpinDetector
+
+__all__ = ["InstructionMix"]
+
+OPCODE_LOAD = 0b0000011
+OPCODE_STORE = 0b0100011
+OPCODE_BRANCH = 0b1100011
+
+# funct3 of loads and stores, ignoring the unsigned bit.
+_WIDTHS = {0: AccessWidth.BYTE, 1: AccessWidth.HALF, 2: AccessWidth.WORD}
+_SIZES = {AccessWidth.BYTE: 1, AccessWidth.HALF: 2, AccessWidth.WORD: 4}
+
+
+def _sext12(value):
+    return value - 0x1000 if value & 0x800 else value
+
+
+class InstructionMix:
+    """
+    Counts what the instructions a hart resolves do: mnemonics (of the base
+    instructions, so `addi` rather than `mv` or `nop`), load and store widths,
+    alignment and targets, and how often branches are taken.
+
+    Backends call `retire` with each instruction's pc, word and the register
+    file as it was before the instruction ran, and `repeat` for a lap of a
+    busy-wait they fast-forward over.
+
+    An access is "aligned" to its width, "odd" if it starts on an odd address
+    (the extra-read paths in MMURead and MMUWrite), or "split" for a word on a
+    halfword boundary. Addresses with bit 31 set are MMIO.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._recent = deque(maxlen=SpinDetector.WINDOW)
+        self._branch = None
+
+    def retire(self, pc, insn, xregs):
+        keys = []
+        if self._branch is not None:
+            keys.append(("branch", "not taken" if pc == self._branch + 4 else "taken"))
+            self._branch = None
+
+        if (decoded := RV32I.decode(insn)) is not None:
+            mnemonic = decoded[0].base.__name__.lower()
+        else:
+            mnemonic = "unknown"
+        keys.append(("insn", mnemonic))
+
+        opcode = insn & 0x7F
+        if opcode in (OPCODE_LOAD, OPCODE_STORE):
+            if opcode == OPCODE_LOAD:
+                kind, imm = "load", insn >> 20
+            else:
+                kind, imm = "store", ((insn >> 25) << 5) | ((insn >> 7) & 0x1F)
+            addr = (xregs[(insn >> 15) & 0x1F] + _sext12(imm)) & 0xFFFF_FFFF
+            width = _WIDTHS.get((insn >> 12) & 0x3)
+            if width is not None:
+                if addr % _SIZES[width] == 0:
+                    alignment = "aligned"
+                elif addr & 1:
+                    alignment = "odd"
+                else:
+                    alignment = "split"
+                keys.append((kind, width.name, alignment))
+            keys.append((kind, "mmio" if addr >> 31 else "sysmem"))
+        elif opcode == OPCODE_BRANCH:
+            self._branch = pc
+
+        keys = tuple(keys)
+        self._counts.update(keys)
+        self._recent.append(keys)
+
+    def repeat(self, count, times):
+        """The last `count` instructions are resolved `times` more times over."""
+        assert count <= len(self._recent), "lap longer than the instruction history"
+        for keys in list(self._recent)[-count:]:
+            for key in keys:
+                self._counts[key] += times
+
+    def summary(self):
+        """The counts as nested dicts, busiest first."""
+        result = {"insns": {}, "load": {}, "store": {}, "regions": {}, "branches": {}}
+        for key, count in self._counts.most_common():
+            match key:
+                case ("insn", mnemonic):
+                    result["insns"][mnemonic] = count
+                case (("load" | "store") as kind, width, alignment):
+                    result[kind].setdefault(width, {})[alignment] = count
+                case (("load" | "store") as kind, region):
+                    result["regions"].setdefault(kind, {})[region] = count
+                case ("branch", outcome):
+                    result["branches"][outcome] = count
+        return result
@@ -0,0 +1,275 @@
+import bisect
+import contextlib
+import os
+from collections import Counter, deque
+from functools import partial
+from pathlib import Path
+
+from .spin import SpinDetector
+
+__all__ = ["MAGIC", "VERSION", "Profiler", "Symbolizer", "add_arguments", "collapsed", "report"]
+
+# The header of the counts `cxxrtl/main.cc --profile` writes.
+MAGIC = "saeprofile"
+VERSION = 1
+
+OPCODE_BRANCH = 0b1100011
+OPCODE_JALR = 0b1100111
+OPCODE_JAL = 0b1101111
+
+# Registers the calling convention links through.
+_LINK = (1, 5)
+
+_CALL = 1
+_RETURN = 2
+
+
+class Profiler:
+    """
+    Histograms of the instructions a hart resolves: by pc, by basic block and
+    by call stack.
+
+    Backends call `retire` with each instruction's pc and word, and `repeat`
+    for a lap of a busy-wait they fast-forward over. Calls and returns are
+    recognised the way the calling convention makes them: JAL or JALR linking
+    through ra (or t0) pushes the target, and JALR to ra (or t0) without
+    linking pops it.
+    """
+
+    pcs: Counter
+    blocks: Counter
+    stacks: Counter
+
+    def __init__(self):
+        self.pcs = Counter()
+        self.blocks = Counter()
+        self.stacks = Counter()
+        self._stack = None
+        self._block = None
+        self._next = None
+        self._pending = None
+        self._recent = deque(maxlen=SpinDetector.WINDOW)
+
+    @classmethod
+    def load(cls, path):
+        """
+        The counts `cxxrtl/main.cc --profile` wrote to `path`: after a header
+        line, one "pc", "block" or "stack" line per entry, with the pc, block
+        or `;`-separated stack in hex and then the count.
+        """
+        profiler = cls()
+        with open(path) as f:
+            if f.readline().split() != [MAGIC, str(VERSION)]:
+                raise ValueError(f"{path}: not a version {VERSION} profile")
+            for line in f:
+                kind, where, count = line.split()
+                match kind:
+                    case "pc":
+                        profiler.pcs[int(where, 16)] += int(count)
+                    case "block":
+                        profiler.blocks[int(where, 16)] += int(count)
+                    case "stack":
+                        stack = tuple(int(pc, 16) for pc in where.split(";"))
+                        profiler.stacks[stack] += int(count)
+                    case _:
+                        raise ValueError(f"{path}: unknown entry {kind!r}")
+        return profiler
+
+    @property
+    def total(self):
+        return self.pcs.total()
+
+    def retire(self, pc, insn):
+        if self._stack is None:
+            self._stack = (pc,)
+        elif self._pending == _CALL:
+            self._stack += (pc,)
+        elif self._pending == _RETURN and len(self._stack) > 1:
+            self._stack = self._stack[:-1]
+        if pc != self._next:
+            self._block = pc
+
+        self.pcs[pc] += 1
+        self.blocks[self._block] += 1
+        self.stacks[self._stack] += 1
+
+        opcode = insn & 0x7F
+        rd = (insn >> 7) & 0x1F
+        rs1 = (insn >> 15) & 0x1F
+        self._pending = None
+        if opcode in (OPCODE_JAL, OPCODE_JALR) and rd in _LINK:
+            self._pending = _CALL
+        elif opcode == OPCODE_JALR and rd == 0 and rs1 in _LINK:
+            self._pending = _RETURN
+        # Whatever comes after a control transfer starts a new block.
+        if opcode in (OPCODE_BRANCH, OPCODE_JAL, OPCODE_JALR):
+            self._next = None
+        else:
+            self._next = pc + 4
+        self._recent.append((pc, self._stack, self._next))
+
+    def repeat(self, count, times):
+        """The last `count` instructions are resolved `times` more times over."""
+        assert count <= len(self._recent), "lap longer than the instruction history"
+        lap = list(self._recent)[-count:]
+        # Going round again, the lap follows on from its own last instruction
+        # rather than whatever led into the loop, which can start its blocks
+        # elsewhere; after once round they're as every further lap has them.
+        block, expected = self._block, self._next
+        for _ in range(2):
+            blocks = []
+            for pc, _, following in lap:
+                if pc != expected:
+                    block = pc
+                blocks.append(block)
+                expected = following
+        self._block = block
+        for (pc, stack, _), block in zip(lap, blocks):
+            self.pcs[pc] += times
+            self.blocks[block] += times
+            self.stacks[stack] += times
+
+
+class Symbolizer:
+    """Names addresses by the nearest symbol at or below them."""
+
+    def __init__(self, symbols):
+        by_addr = {}
+        for name, addr in sorted(symbols.items(), key=lambda kv: (kv[1], kv[0])):
+            by_addr.setdefault(addr, name)
+        self._addrs = sorted(by_addr)
+        self._names = [by_addr[addr] for addr in self._addrs]
+
+    def function(self, pc):
+        """The symbol `pc` falls under, or its address if none does."""
+        if (i := bisect.bisect_right(self._addrs, pc)) == 0:
+            return f"0x{pc:08x}"
+        return self._names[i - 1]
+
+    def __call__(self, pc):
+        """`pc` as symbol+offset."""
+        if (i := bisect.bisect_right(self._addrs, pc)) == 0:
+            return f"0x{pc:08x}"
+        offset = pc - self._addrs[i - 1]
+        return self._names[i - 1] + (f"+0x{offset:x}" if offset else "")
+
+
+def report(profiler, symbols, *, top=20):
+    """A text report of the hottest functions and basic blocks."""
+    symbolize = Symbolizer(symbols)
+    total = profiler.total or 1
+    functions = Counter()
+    for pc, count in profiler.pcs.items():
+        functions[symbolize.function(pc)] += count
+
+    lines = [f"{profiler.total} instructions", "", "hot functions:"]
+    for name, count in functions.most_common(top):
+        lines.append(f"  {count:>10}  {count / total:>6.1%}  {name}")
+    lines += ["", "hot basic blocks:"]
+    for block, count in profiler.blocks.most_common(top):
+        lines.append(f"  {count:>10}  {count / total:>6.1%}  0x{block:08x}  {symbolize(block)}")
+    return "\n".join(lines) + "\n"
+
+
+def collapsed(profiler, symbols):
+    """Collapsed stacks, one per line, as flamegraph.pl and friends read them."""
+    symbolize = Symbolizer(symbols)
+    folded = Counter()
+    for stack, count in profiler.stacks.items():
+        folded[";".join(symbolize.function(pc) for pc in stack)] += count
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(folded.items()))
+
+
+def add_arguments(np, parser):
+    from . import BACKENDS
+
+    parser.set_defaults(func=partial(main, np))
+    parser.add_argument(
+        "program",
+        type=Path,
+        help="a flat binary, ELF executable, or assembly source",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="cxxrtl",
+        help="simulation backend (default: cxxrtl)",
+    )
+    parser.add_argument(
+        "--memory",
+        type=lambda s: int(s, 0),
+        default=8192,
+        help="sysmem size in bytes (default: 8192)",
+    )
+    parser.add_argument(
+        "--max-cycles",
+        type=lambda s: int(s, 0),
+        default=1_000_000,
+        help="give up after this many instructions (default: 1000000)",
+    )
+    parser.add_argument(
+        "--no-fast-forward",
+        dest="fast_forward",
+        action="store_false",
+        help="simulate busy-waits cycle by cycle instead of skipping over them",
+    )
+    parser.add_argument(
+        "--uart",
+        default="",
+        help="bytes to send the hart over the UART",
+    )
+    parser.add_argument(
+        "--resume",
+        type=Path,
+        help="profile from this checkpoint on, instead of from reset",
+    )
+    parser.add_argument(
+        "--harness",
+        type=Path,
+        help="report on the counts `cxxrtl/main.cc --profile` wrote here, instead of simulating",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="how many functions and blocks to list (default: 20)",
+    )
+    parser.add_argument(
+        "--collapsed",
+        type=Path,
+        help="also write collapsed stacks here, for flamegraph.pl",
+    )
+
+
+def main(np, args):
+    from ..image import load_image
+
+    image = load_image(args.program, limit=args.memory)
+    if args.harness:
+        profiler = Profiler.load(args.harness)
+    else:
+        profiler = _simulate(image, args)
+
+    print(report(profiler, image.symbols, top=args.top), end="")
+    if args.collapsed:
+        args.collapsed.write_text(collapsed(profiler, image.symbols))
+
+
+def _simulate(image, args):
+    from amaranth.lib.memory import Memory
+
+    from ..rtl.hart import Hart
+    from . import run_until_fault
+    from .checkpoint import Checkpoint
+
+    hart = Hart(
+        sysmem=Memory(depth=args.memory // 2, shape=16, init=image.words().tolist()),
+        reg_inits={"uart": args.uart.encode()})
+    resume = Checkpoint.load(args.resume) if args.resume else None
+    stats = {}
+    # The backends trace every instruction to stdout.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        run_until_fault(
+            hart, max_cycles=args.max_cycles, backend=args.backend, stats=stats, resume=resume,
+            fast_forward=args.fast_forward)
+    return stats["profile"]
@@ -0,0 +1,124 @@
+from amaranth import Fragment
+from amaranth.sim import Simulator
+
+from ..rtl.hart import Hart
+from ..rtl.mmu import AccessWidth
+from ..targets import test
+from .states import StateCounter
+
+__all__ = ["simulate", "print_mmu"]
+
+SYSMEM_TO_SHOW = 8
+
+
+class _Access:
+    """The run loop's access to `hart` (see `sae.sim._run`), through testbench context `ctx`."""
+
+    def __init__(self, ctx, hart):
+        self.ctx = ctx
+        self.hart = hart
+        self.decodings = StateCounter.decodings_for(hart)
+        periph = hart.mmu.peripherals[0x0001]
+        self._signals = {
+            "state": hart.state,
+            "resolving": hart.resolving,
+            "pc": hart.pc,
+            "insn": hart.insn,
+            "fault_code": hart.fault_code,
+            "fault_insn": hart.fault_insn,
+            "mmu_write_valid": hart.mmu.write.req.valid,
+            "mmu_write_port_en": hart.mmu.mmu_write.port.en,
+            "xwr_en": hart.xwr_en,
+            "xwr_reg": hart.xwr_reg,
+            "xwr_val": hart.xwr_val,
+            "uart_rd_valid": periph.rd.valid,
+            "uart_rd_payload": periph.rd.payload,
+            "uart_rd_ready": periph.rd.ready,
+            "uart_wr_valid": periph.wr.valid,
+            "uart_wr_payload": periph.wr.payload,
+        }
+        if hart.semihosting:
+            self._signals |= {
+                "ecall": hart.ecall,
+                "ecall_done": hart.ecall_done,
+                "ecall_ret": hart.ecall_ret,
+            }
+        self._fsms = (hart.fsm, hart.mmu.mmu_read.fsm, hart.mmu.mmu_write.fsm)
+
+    def peek(self, name):
+        return self.ctx.get(self._signals[name])
+
+    def poke(self, name, value):
+        self.ctx.set(self._signals[name], value)
+
+    def xreg(self, i):
+        return self.ctx.get(self.hart.xmem.data[i])
+
+    def written(self, i):
+        return self.ctx.get(self.hart.xreg_written[i])
+
+    def read_mem(self, i):
+        return self.ctx.get(self.hart.sysmem.data[i])
+
+    def write_mem(self, i, value):
+        self.ctx.set(self.hart.sysmem.data[i], value)
+
+    def fsm_states(self):
+        return tuple(self.ctx.get(fsm.state) for fsm in self._fsms)
+
+    async def tick(self):
+        await self.ctx.tick()
+
+    def restore(self, checkpoint):
+        self.ctx.set(self.hart.pc, checkpoint.pc)
+        for i, value in enumerate(checkpoint.xregs):
+            self.ctx.set(self.hart.xmem.data[i], value)
+        for i, value in enumerate(checkpoint.sysmem):
+            self.ctx.set(self.hart.sysmem.data[i], value)
+        if self.hart.track_reg_written:
+            for i in checkpoint.written:
+                self.ctx.set(self.hart.xreg_written[i], 1)
+
+    def trace(self):
+        print_mmu(self.ctx, self.hart.mmu, prefix="  ")
+        print()
+
+
+def simulate(hart: Hart, loop):
+    """Simulate `hart` in pysim, driven by the run loop `loop`; returns what it does."""
+    ran = None
+
+    async def bench(ctx):
+        nonlocal ran
+        ran = await loop(_Access(ctx, hart))
+
+    sim = Simulator(Fragment.get(hart, platform=test()))
+    sim.add_clock(1e6)
+    sim.add_testbench(bench)
+    sim.run()
+
+    return ran
+
+
+def print_mmu(ctx, mmu, *, prefix=""):
+    mr = mmu.read
+    print(
+        f"{prefix}MR: "
+        f"a={ctx.get(mr.req.payload.addr):0>8x}  w={AccessWidth(ctx.get(mr.req.payload.width)).name}  " # XXX use value, not name of AW
+        f"v={ctx.get(mr.resp.payload):0>8x}  v={ctx.get(mr.resp.valid):b}        ",
+        end="")
+    print("data=", end="")
+    for i in range(min(SYSMEM_TO_SHOW, mmu.sysmem.depth)):
+        print(f"{ctx.get(mmu.sysmem.data[i]):0>4x} ", end="")
+    print()
+
+    mw = mmu.write
+    print(
+        f"{prefix}MW: "
+        f"a={ctx.get(mw.req.payload.addr):0>8x}  w={AccessWidth(ctx.get(mw.req.payload.width)).name}  "
+        f"d={ctx.get(mw.req.payload.data):0>8x}  r={ctx.get(mw.req.ready):b}  a={ctx.get(mw.req.valid):b}   ",
+        end="")
+    print("data=", end="")
+    for i in range(SYSMEM_TO_SHOW, min(SYSMEM_TO_SHOW * 2, mmu.sysmem.depth)):
+        print(f"{ctx.get(mmu.sysmem.data[i]):0>4x} ", end="")
+    print()
@@ -0,0 +1,156 @@
+from ..rtl.hart import FaultCode
+from ..rtl.isa_rv32 import RV32I
+
+__all__ = ["Unsupported", "run_until_fault"]
+
+Reg = RV32I.Reg
+Opcode = RV32I.Opcode
+
+MASK = 0xFFFF_FFFF
+
+
+class Unsupported(Exception):
+    """The program did something the reference doesn't model."""
+
+
+def _sext(value, bits):
+    sign = 1 << (bits - 1)
+    return (value & (sign - 1)) - (value & sign)
+
+
+def _signed(value):
+    return _sext(value, 32)
+
+
+def _alu(funct3, a, b, *, alt):
+    match funct3:
+        case 0b000:
+            return a - b if alt else a + b
+        case 0b001:
+            return a << (b & 0x1F)
+        case 0b010:
+            return int(_signed(a) < _signed(b))
+        case 0b011:
+            return int(a < b)
+        case 0b100:
+            return a ^ b
+        case 0b101:
+            return (_signed(a) if alt else a) >> (b & 0x1F)
+        case 0b110:
+            return a | b
+        case 0b111:
+            return a & b
+
+
+_BRANCHES = {
+    0b000: lambda a, b: a == b,
+    0b001: lambda a, b: a != b,
+    0b100: lambda a, b: _signed(a) < _signed(b),
+    0b101: lambda a, b: _signed(a) >= _signed(b),
+    0b110: lambda a, b: a < b,
+    0b111: lambda a, b: a >= b,
+}
+
+# funct3 of loads and stores: (bytes, signed).
+_LOADS = {
+    0b000: (1, True),
+    0b001: (2, True),
+    0b010: (4, False),
+    0b100: (1, False),
+    0b101: (2, False),
+}
+_STORES = {0b000: 1, 0b001: 2, 0b010: 4}
+
+
+def run_until_fault(sysmem, xregs, *, max_cycles=1000):
+    """
+    Run a program functionally: `sysmem` is its halfwords from address 0 and
+    `xregs` the initial register file. Returns what `sae.sim.run_until_fault`
+    would for a `Hart` with `track_reg_written`, faulting where the hart does.
+
+    Only sysmem is modelled, so MMIO raises `Unsupported`, as do addresses
+    beyond it and instructions the hart treats as anything but RV32I.
+    """
+    mem = bytearray()
+    for half in sysmem:
+        mem += half.to_bytes(2, "little")
+    x = list(xregs)
+    written = set()
+    pc = 0
+
+    def access(addr, size):
+        if addr >> 31:
+            raise Unsupported(f"MMIO access at 0x{addr:08x}")
+        if addr + size > len(mem):
+            raise Unsupported(f"access at 0x{addr:08x} is outside sysmem")
+        return slice(addr, addr + size)
+
+    def write(rd, value):
+        if rd:
+            x[rd] = value & MASK
+            written.add(rd)
+
+    def results(faultcode, faultinsn=0):
+        ran = {"pc": pc}
+        for i in sorted(written):
+            ran[Reg(f"x{i}")] = x[i]
+        ran["faultcode"] = faultcode
+        ran["faultinsn"] = faultinsn
+        return ran
+
+    for _ in range(max_cycles + 2):
+        insn = int.from_bytes(mem[access(pc, 4)], "little")
+        if not insn & 0xFFFF or insn == MASK:
+            return results(FaultCode.ILLEGAL_INSTRUCTION, insn)
+
+        opcode = insn & 0x7F
+        rd = (insn >> 7) & 0x1F
+        funct3 = (insn >> 12) & 0x7
+        rs1 = x[(insn >> 15) & 0x1F]
+        rs2 = x[(insn >> 20) & 0x1F]
+        imm_i = _sext(insn >> 20, 12)
+        imm_s = _sext(((insn >> 25) << 5) | ((insn >> 7) & 0x1F), 12)
+        imm_b = _sext(((insn >> 31) << 12) | (((insn >> 7) & 1) << 11) |
+                      (((insn >> 25) & 0x3F) << 5) | (((insn >> 8) & 0xF) << 1), 13)
+        imm_j = _sext(((insn >> 31) << 20) | (((insn >> 12) & 0xFF) << 12) |
+                      (((insn >> 20) & 1) << 11) | (((insn >> 21) & 0x3FF) << 1), 21)
+        next_pc = (pc + 4) & MASK
+
+        match opcode:
+            case Opcode.LUI:
+                write(rd, insn & 0xFFFF_F000)
+            case Opcode.AUIPC:
+                write(rd, pc + (insn & 0xFFFF_F000))
+            case Opcode.OP_IMM if funct3 in (0b001, 0b101):
+                write(rd, _alu(funct3, rs1, imm_i & 0x1F, alt=funct3 == 0b101 and insn >> 30 & 1))
+            case Opcode.OP_IMM:
+                write(rd, _alu(funct3, rs1, imm_i & MASK, alt=False))
+            case Opcode.OP:
+                write(rd, _alu(funct3, rs1, rs2, alt=insn >> 30 & 1))
+            case Opcode.LOAD if funct3 in _LOADS:
+                size, signed = _LOADS[funct3]
+                value = int.from_bytes(mem[access((rs1 + imm_i) & MASK, size)], "little")
+                write(rd, _sext(value, size * 8) if signed else value)
+            case Opcode.STORE if funct3 in _STORES:
+                size = _STORES[funct3]
+                mem[access((rs1 + imm_s) & MASK, size)] = (rs2 & (2 ** (size * 8) - 1)).to_bytes(
+                    size, "little")
+            case Opcode.BRANCH if funct3 in _BRANCHES:
+                if _BRANCHES[funct3](rs1, rs2):
+                    target = (pc + imm_b) & MASK
+                    if target & 3:
+                        return results(FaultCode.PC_MISALIGNED)
+                    next_pc = target
+            case Opcode.JAL | Opcode.JALR:
+                target = (pc + imm_j if opcode == Opcode.JAL else (rs1 + imm_i) & ~1) & MASK
+                if target & 3:
+                    pc = next_pc
+                    return results(FaultCode.PC_MISALIGNED)
+                write(rd, next_pc)
+                next_pc = target
+            case _:
+                raise Unsupported(f"instruction 0x{insn:08x} at 0x{pc:08x}")
+
+        pc = next_pc
+
+    raise RuntimeError("max cycles reached")
@@ -0,0 +1,77 @@
+import hashlib
+import os
+from array import array
+from functools import cache
+
+from amaranth.utils import ceil_log2
+
+from .. import cache as disk_cache
+from ..rtl.isa_rv32 import RV32I
+from . import semihost, spin, uart
+
+__all__ = ["RESULTS", "enabled", "design_digest", "run_key", "load", "store"]
+
+# Where results live; `RESULTS.clear()` (or deleting build/cache/sim) forgets
+# them all.
+RESULTS = disk_cache.DiskCache("sim")
+
+Reg = RV32I.Reg
+
+
+def enabled():
+    """Whether runs consult the cache when the caller doesn't say; set SAE_SIM_CACHE=1."""
+    return os.environ.get("SAE_SIM_CACHE", "0") == "1"
+
+
+@cache
+def design_digest(depth, *, track_reg_written, semihosting):
+    """
+    A digest of the design for a hart with these parameters, taken from the
+    sources it's elaborated from rather than by elaborating it.
+
+    The template hart has an empty sysmem and default register inits; those are
+    hashed as data in `run_key` instead. Its depth is rounded up the way
+    `CxxrtlHart` rounds it, so every small program shares one design and the
+    exact depth goes into the key alongside the image.
+    """
+    from .cxxrtl import MIN_DEPTH
+
+    return disk_cache.rtl_digest(
+        "hart", max(MIN_DEPTH, 2 ** ceil_log2(depth)), track_reg_written, semihosting)
+
+
+def run_key(hart, *, backend, max_cycles):
+    """The cache key for running `hart` as given on `backend`."""
+    from importlib import import_module
+
+    digest = hashlib.sha256()
+    digest.update(design_digest(
+        hart.sysmem.depth,
+        track_reg_written=hart.track_reg_written,
+        semihosting=hart.semihosting).encode())
+    # The testbench decides how time passes (fast-forwarding, the UART's
+    # timing) and what a run returns, so its source, the shared run loop in
+    # this package's too, is part of the design.
+    digest.update(disk_cache.source_digest(
+        import_module(__package__), import_module(f".{backend}", __package__),
+        semihost, spin, uart).encode())
+    digest.update(f"{backend} {max_cycles} {hart.sysmem.depth}\n".encode())
+    digest.update(array("I", hart.sysmem.init).tobytes())
+    inits = sorted((str(reg), repr(value)) for reg, value in hart.reg_inits.items())
+    digest.update(repr(inits).encode())
+    return digest.hexdigest()
+
+
+def load(key):
+    """The results stored under `key`, or None."""
+    if (stored := RESULTS.get(key)) is None:
+        return None
+    # Register enums are made inside a function and can't be pickled; they're
+    # stored by number.
+    return {Reg(name[1]) if isinstance(name, tuple) else name: value
+            for name, value in stored}
+
+
+def store(key, results):
+    RESULTS.put(key, [(("x", int(name)) if isinstance(name, Reg) else name, value)
+                      for name, value in results.items()])
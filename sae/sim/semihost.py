@@ -0,0 +1,120 @@
+import sys
+from pathlib import Path
+
+from amaranth.lib.enum import IntEnum
+
+__all__ = ["Call", "Semihost", "Sysmem"]
+
+# -1, as a0 holds it.
+ERROR = 2**32 - 1
+
+
+class Call(IntEnum):
+    """
+    Semihosting call numbers, passed in a7. Arguments go in a0–a2 and the
+    result comes back in a0. EXIT and WRITE use the Linux numbers so a minimal
+    syscall layer can target either.
+
+    A call the host doesn't know, or given a buffer outside sysmem, returns -1.
+    """
+    # a0: exit code.
+    EXIT = 93
+    # a0: fd (1 or 2), a1: buffer, a2: length. Returns the length written.
+    WRITE = 64
+    # a0: NUL-terminated path, relative to the host's root and not outside it,
+    # a1: buffer, a2: buffer size. Returns the length read, or -1.
+    READ_FILE = 0x1000
+    # Returns the low 32 bits of the clock cycle count.
+    CYCLES = 0x1001
+
+
+class Sysmem:
+    """Byte access to a hart's 16-bit-wide sysmem through a backend's accessors."""
+
+    def __init__(self, get, set, depth):
+        self._get = get
+        self._set = set
+        self.depth = depth
+
+    def _check(self, addr, length):
+        if addr < 0 or addr + length > self.depth * 2:
+            raise IndexError(f"0x{addr:x}+{length} is outside sysmem")
+
+    def read(self, addr, length):
+        self._check(addr, length)
+        data = bytearray()
+        for word in range(addr >> 1, (addr + length + 1) >> 1):
+            v = self._get(word)
+            data += bytes([v & 0xFF, v >> 8])
+        return bytes(data[addr & 1:(addr & 1) + length])
+
+    def read_cstr(self, addr):
+        data = bytearray()
+        while (b := self.read(addr + len(data), 1)) != b"\0":
+            data += b
+        return bytes(data)
+
+    def write(self, addr, data):
+        self._check(addr, len(data))
+        if addr & 1:
+            data = self.read(addr - 1, 1) + data
+            addr -= 1
+        if len(data) & 1:
+            data = data + self.read(addr + len(data), 1)
+        for i in range(0, len(data), 2):
+            self._set((addr + i) >> 1, data[i] | (data[i + 1] << 8))
+
+
+class Semihost:
+    """
+    Services a semihosting `Hart`'s ECALLs from the testbench.
+
+    Calls complete in a single cycle however much data they move, so programs
+    can hand bulk data to and from the host without going through the UART.
+    """
+
+    def __init__(self, *, root=None, echo=True):
+        self.root = Path(root or ".")
+        self.echo = echo
+        self.stdout = bytearray()
+        self.exit_code = None
+
+    @property
+    def exited(self):
+        return self.exit_code is not None
+
+    def service(self, call, args, mem, *, clock):
+        """Carry out `call` with a0–a2 in `args`. Returns the value for a0."""
+        match call:
+            case Call.EXIT:
+                self.exit_code = args[0]
+                return args[0]
+            case Call.WRITE:
+                fd, buf, length = args
+                try:
+                    data = mem.read(buf, length)
+                except IndexError:
+                    return ERROR
+                if fd == 1:
+                    self.stdout += data
+                if self.echo:
+                    stream = sys.stderr if fd == 2 else sys.stdout
+                    stream.write(data.decode(errors="replace"))
+                    stream.flush()
+                return length
+            case Call.READ_FILE:
+                path, buf, size = args
+                try:
+                    root = self.root.resolve()
+                    path = (root / mem.read_cstr(path).decode()).resolve()
+                    if not path.is_relative_to(root):
+                        return ERROR
+                    data = path.read_bytes()[:size]
+                    mem.write(buf, data)
+                except (IndexError, OSError, UnicodeDecodeError):
+                    return ERROR
+                return len(data)
+            case Call.CYCLES:
+                return clock & 0xFFFF_FFFF
+            case _:
+                return ERROR
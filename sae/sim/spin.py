@@ -0,0 +1,53 @@
+__all__ = ["SpinDetector"]
+
+
+class SpinDetector:
+    """
+    Spots the hart going round a loop that can't change anything until the
+    outside world does.
+
+    If the same pc and registers recur with no memory writes and no UART
+    traffic in between, the hart's next lap will be identical to its last:
+    it's polling an MMIO register that keeps returning the same value. The
+    simulator can then account for as many laps as it likes without running
+    them.
+    """
+
+    # Busy-waits are short; don't remember more states than this.
+    WINDOW = 64
+
+    _seen: dict[tuple, tuple[int, int]]
+
+    def __init__(self):
+        self._seen = {}
+
+    def disturb(self):
+        """Something observable happened; whatever loop we were in is over."""
+        self._seen.clear()
+
+    def observe(self, state, *, clock, cycles):
+        """
+        Record the architectural state at the start of an instruction.
+
+        Returns the (clock, cycles) length of one lap when `state` has been
+        seen before, and None otherwise.
+        """
+        if (prev := self._seen.get(state)) is not None:
+            self._seen.clear()
+            return clock - prev[0], cycles - prev[1]
+        if len(self._seen) == self.WINDOW:
+            self._seen.clear()
+        self._seen[state] = (clock, cycles)
+        return None
+
+    @staticmethod
+    def laps(lap, *, clock, cycles, max_cycles, until):
+        """
+        How many laps can be skipped before the event at `until` (None if
+        nothing's coming), without going past `max_cycles`.
+        """
+        lap_clock, lap_cycles = lap
+        laps = (max_cycles - cycles) // lap_cycles
+        if until is not None:
+            laps = min(laps, (until - clock) // lap_clock)
+        return max(laps, 0)
@@ -0,0 +1,51 @@
+from collections import Counter, deque
+
+from .spin import SpinDetector
+
+__all__ = ["StateCounter"]
+
+
+class StateCounter:
+    """
+    Counts the cycles the hart's FSM and its MMU's read and write FSMs spend
+    in each of their states.
+
+    Backends `sample` the raw state values once per cycle, and `repeat` a lap
+    of a busy-wait they fast-forward over.
+    """
+
+    FSMS = ("hart", "mmu_read", "mmu_write")
+
+    # Comfortably more cycles than a lap SpinDetector can find.
+    HISTORY = SpinDetector.WINDOW * 64
+
+    def __init__(self, decodings):
+        """`decodings` maps each FSM's state values to names, in `FSMS` order."""
+        self._decodings = decodings
+        self._counts = Counter()
+        self._recent = deque(maxlen=self.HISTORY)
+
+    @staticmethod
+    def decodings_for(hart):
+        """The decodings for an elaborated `hart`'s FSMs."""
+        return [dict(fsm.decoding) for fsm in (
+            hart.fsm, hart.mmu.mmu_read.fsm, hart.mmu.mmu_write.fsm)]
+
+    def sample(self, states):
+        self._counts[states] += 1
+        self._recent.append(states)
+
+    def repeat(self, cycles, times):
+        """The last `cycles` samples happen `times` more times over."""
+        assert cycles <= len(self._recent), "lap longer than the sample history"
+        for states in list(self._recent)[-cycles:]:
+            self._counts[states] += times
+
+    def breakdown(self):
+        """Cycles per state, per FSM, with states in declaration order."""
+        result = {fsm: dict.fromkeys(decoding.values(), 0)
+                  for fsm, decoding in zip(self.FSMS, self._decodings)}
+        for states, cycles in self._counts.items():
+            for fsm, decoding, value in zip(self.FSMS, self._decodings, states):
+                result[fsm][decoding[value]] += cycles
+        return result
@@ -0,0 +1,103 @@
+"""
+Reading the binary retirement traces `cxxrtl/main.cc --trace` writes.
+
+A trace is the magic `saetrace`, a version byte, then one record per retired
+instruction. Each record is a flags byte, then:
+
+- the cycles since the previous record, as a varint;
+- the pc's distance from the previous record's pc plus 4, zigzag-encoded as a
+  varint (so sequential execution is one zero byte);
+- if INSN, the instruction as 4 little-endian bytes. It's only written the
+  first time it's seen at that pc, or if it's changed since;
+- if RD, the register written as a byte and its new value as a varint;
+- if STORE, the address as a varint, the byte mask, and the data as a varint.
+
+A record with just SKIP set is instead followed by a varint count of cycles
+the harness fast-forwarded over without stepping; the instructions resolved
+in them aren't recorded.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+__all__ = ["MAGIC", "VERSION", "Retirement", "Store", "read_trace"]
+
+MAGIC = b"saetrace"
+VERSION = 1
+
+INSN = 0x01
+RD = 0x02
+STORE = 0x04
+TRAP = 0x08
+SKIP = 0x80
+
+
+@dataclass(frozen=True)
+class Store:
+    addr: int
+    mask: int
+    data: int
+
+
+@dataclass(frozen=True)
+class Retirement:
+    cycle: int
+    pc: int
+    insn: int
+    rd: Optional[tuple[int, int]] = None
+    store: Optional[Store] = None
+    trap: bool = False
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def byte(self):
+        b = self.data[self.pos]
+        self.pos += 1
+        return b
+
+    def u32(self):
+        v = int.from_bytes(self.data[self.pos:self.pos + 4], "little")
+        self.pos += 4
+        return v
+
+    def varint(self):
+        v = shift = 0
+        while True:
+            b = self.byte()
+            v |= (b & 0x7F) << shift
+            if b < 0x80:
+                return v
+            shift += 7
+
+
+def read_trace(path):
+    """Yield the `Retirement`s in the trace at `path`, in order."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path}: not a trace")
+    if (version := data[len(MAGIC)]) != VERSION:
+        raise ValueError(f"{path}: unsupported trace version {version}")
+
+    r = _Reader(data)
+    r.pos = len(MAGIC) + 1
+    cycle = pc = 0
+    insns = {}
+    while r.pos < len(data):
+        flags = r.byte()
+        if flags == SKIP:
+            cycle += r.varint()
+            continue
+
+        cycle += r.varint()
+        delta = r.varint()
+        pc = (pc + 4 + ((delta >> 1) ^ -(delta & 1))) & 0xFFFF_FFFF
+        if flags & INSN:
+            insns[pc] = r.u32()
+        rd = (r.byte(), r.varint()) if flags & RD else None
+        store = Store(r.varint(), r.byte(), r.varint()) if flags & STORE else None
+        yield Retirement(cycle, pc, insns[pc], rd=rd, store=store, trap=bool(flags & TRAP))
@@ -0,0 +1,70 @@
+import heapq
+from collections import deque
+
+__all__ = ["UARTQueue"]
+
+
+class UARTQueue:
+    """
+    The host's end of a bypassed UART.
+
+    Bytes queued with `send` are offered to the core one at a time on the UART's
+    read stream, optionally not arriving until a given clock cycle; bytes the
+    core writes are collected until taken with `recv`. Backends call `advance`,
+    `offer`, `core_read` and `core_wrote` as the simulation progresses.
+    """
+
+    def __init__(self, send=b"", *, echo=True):
+        self._to_core = deque(send)
+        self._from_core = bytearray()
+        self._scheduled = []
+        # Keeps sends scheduled for the same cycle in order. A plain int so
+        # queues pickle into checkpoints.
+        self._sends = 0
+        self.clock = 0
+        self.echo = echo
+
+    def send(self, data, *, at=None):
+        if at is None or at <= self.clock:
+            self._to_core.extend(data)
+        else:
+            heapq.heappush(self._scheduled, (at, self._sends, bytes(data)))
+            self._sends += 1
+
+    def advance(self, clock):
+        """Move time on to `clock`. Returns whether anything arrived."""
+        self.clock = clock
+        arrived = False
+        while self._scheduled and self._scheduled[0][0] <= clock:
+            self._to_core.extend(heapq.heappop(self._scheduled)[2])
+            arrived = True
+        return arrived
+
+    @property
+    def next_arrival(self):
+        """The clock cycle the next scheduled bytes arrive on, or None."""
+        return self._scheduled[0][0] if self._scheduled else None
+
+    def recv(self):
+        data = bytes(self._from_core)
+        self._from_core.clear()
+        return data
+
+    @property
+    def offer(self):
+        """The byte currently presented to the core, or None."""
+        return self._to_core[0] if self._to_core else None
+
+    def core_read(self):
+        if not self._to_core:
+            if self.echo:
+                print("core read from empty UART")
+            return
+        datum = self._to_core.popleft()
+        if self.echo:
+            print(f"core read from UART: 0x{datum:0>2x} '{datum:c}'")
+
+    def core_wrote(self, datum):
+        if self.echo:
+            print(f"core wrote to UART: 0x{datum:0>2x} '{datum:c}'")
+        self._from_core.append(datum)
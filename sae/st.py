@@ -1,30 +1,51 @@
+import hashlib
 import re
+import sys
 from dataclasses import dataclass
 from functools import singledispatchmethod
 from typing import Optional
 
-from funcparserlib.lexer import TokenSpec, make_tokenizer
+from funcparserlib.lexer import LexerError, Token
 from funcparserlib.parser import finished, many, maybe, tok
 
-__all__ = ["Pragma", "Op", "Parser"]
-
-
-tokenize = make_tokenizer(
-    [
-        TokenSpec("whitespace", r"\s+"),
-        TokenSpec("comment", r";.*$"),
-        TokenSpec("label", r"\w+:"),
-        TokenSpec("pragma", r"\.\w+(~?)"),
-        TokenSpec("offset_start", r"\d+\("),
-        TokenSpec("offset_end", r"\)"),
-        TokenSpec("register", "x[0-9]|x[12][0-9]|x3[01]|a[0-9]|ra|sp"),
-        TokenSpec("word", r"[a-zA-Z][a-zA-Z0-9_.]*"),
-        TokenSpec("number", r"(-\s*)?(0[xX][0-9a-fA-F_]+|0[bB][01_]+|[0-9_]+)"),
-        TokenSpec("string", r"\"([^\"\\]*(\\.)?)*\""),  # untested
-        TokenSpec("comma", r","),
-        TokenSpec("equals", r"="),
-    ]
-)
+from .cache import DiskCache, source_digest
+
+__all__ = ["Pragma", "Op", "Parser", "ST_CACHE", "assemble_op", "load_st", "parse_pairs"]
+
+
+TOKEN_SPECS = [
+    ("whitespace", r"\s+"),
+    ("comment", r";.*$"),
+    ("label", r"\w+:"),
+    ("pragma", r"\.\w+(~?)"),
+    ("offset_start", r"\d+\("),
+    ("offset_end", r"\)"),
+    ("register", "x[12][0-9]|x3[01]|x[0-9]|a[0-9]|ra|sp"),
+    ("word", r"[a-zA-Z][a-zA-Z0-9_.]*"),
+    ("number", r"(-\s*)?(0[xX][0-9a-fA-F_]+|0[bB][01_]+|[0-9_]+)"),
+    ("string", r"\"([^\"\\]*(\\.)?)*\""),  # untested
+    ("comma", r","),
+    ("equals", r"="),
+]
+
+# One pass over each line with all the specs at once. Alternation tries them
+# in order, so this picks the same token funcparserlib's make_tokenizer would.
+scanner = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_SPECS))
+
+
+def tokenize(line):
+    """Tokens of `line`, less whitespace and comments."""
+    tokens = []
+    pos = 0
+    while pos < len(line):
+        m = scanner.match(line, pos)
+        if m is None:
+            raise LexerError((1, pos + 1), line)
+        kind = m.lastgroup
+        if kind != "whitespace" and kind != "comment":
+            tokens.append(Token(kind, m[0], (1, pos + 1), (1, m.end())))
+        pos = m.end()
+    return tokens
 
 
 @dataclass
@@ -63,6 +84,8 @@ class Op:
     args: list[Register | Offset | int]
     line: str
     lineno: int
+    # The encoded instruction(s), once someone's assembled it.
+    words: Optional[list[int]] = None
 
 
 def parse_offset(p):
@@ -81,7 +104,7 @@ def parse_string(s):
     return escape_re.sub(lambda m: string_escapes[ord(m[0][1])], s[1:-1]).encode()
 
 
-def parse(tokens, *, line, lineno):
+def _grammar():
     number = tok("number") >> (lambda n: int(n, 0))
     offset = (tok("offset_start") + tok("register") + tok("offset_end")) >> parse_offset
     string = tok("string") >> parse_string
@@ -95,16 +118,25 @@ def parse(tokens, *, line, lineno):
     arglist = maybe(arg + many(-tok("comma") + arg)) >> (
         lambda p: [] if not p else [p[0]] + p[1])
 
+    # Pragmas and ops get their line and lineno in parse.
     label = tok("label") >> (lambda l: Label(l[:-1]))
-    pragma = tok("pragma") + arglist >> (
-        lambda p: Pragma(p[0][1:], p[1], line=line, lineno=lineno))
-    op = tok("word") + arglist >> (lambda p: Op(*p, line=line, lineno=lineno))
+    pragma = tok("pragma") + arglist >> (lambda p: (Pragma, p[0][1:], p[1]))
+    op = tok("word") + arglist >> (lambda p: (Op, *p))
 
     stmt = label | pragma | op
 
-    document = stmt + -finished
+    return stmt + -finished
 
-    return document.parse(tokens)
+
+document = _grammar()
+
+
+def parse(tokens, *, line, lineno):
+    parsed = document.parse(tokens)
+    if isinstance(parsed, tuple):
+        cls, head, args = parsed
+        return cls(head, args, line=line, lineno=lineno)
+    return parsed
 
 
 class Parser:
@@ -126,11 +158,7 @@ class Parser:
     @singledispatchmethod
     def feed(self, line):
         self.lineno += 1
-        tokens = [
-            token
-            for token in tokenize(line)
-            if token.type not in {"whitespace", "comment"}
-        ]
+        tokens = tokenize(line)
         if not tokens:
             return
         parsed = parse(tokens, line=line, lineno=self.lineno)
@@ -141,6 +169,7 @@ class Parser:
                     self.test_name = label
                     self.test_body = []
                     self.begun = True
+                    return
                 case _:
                     raise RuntimeError(f"what's {line!r} (in !begun), precious?")
         match parsed:
@@ -155,8 +184,12 @@ class Parser:
 
     @feed.register(list)
     def feed_list(self, list):
-        for item in list:
-            self.feed(item.strip())
+        self.feed_file(list)
+
+    def feed_file(self, lines):
+        """Feed every line of `lines`, e.g. an open file, then finish."""
+        for line in lines:
+            self.feed(line.strip())
         self.fish()
 
     def fish(self):
@@ -164,3 +197,86 @@ class Parser:
             assert self.test_body is None
         else:
             self.results.append((self.test_name, self.test_body))
+
+
+def parse_pairs(args, *, allow_atoms=False):
+    """
+    `.init`/`.assert` arguments as a dict of register (or name) to value;
+    with `allow_atoms`, also a list of the bare words among them.
+    """
+    from .rtl.isa_rv32 import RV32I
+
+    pairs = {}
+    rest = []
+    for arg in args:
+        if isinstance(arg, str):
+            rest.append(arg)
+        elif isinstance(arg.register, str):
+            pairs[arg.register] = arg.assign
+        else:
+            pairs[RV32I.Reg(arg.register.register.upper())] = arg.assign
+    if allow_atoms:
+        return pairs, rest
+    assert not rest, "unpaired arguments but allow_atoms=False"
+    return pairs
+
+
+def _translate_arg(arg, name):
+    from .rtl.isa_rv32 import RV32I
+
+    if isinstance(arg, Register):
+        return RV32I.Reg(arg.register.upper())
+    elif isinstance(arg, (int, Offset)):
+        return arg
+    elif name in ("pred", "succ"):
+        return arg
+    assert False, f"arg weh {name!r} = {arg!r}"
+
+
+def assemble_op(op):
+    """The words `op` assembles to."""
+    from .rtl.isa_rv32 import RV32I
+
+    opname = op.opcode.upper().replace(".", "_")
+    if len(opname) == 1:
+        opname += "_"
+    insn = getattr(RV32I, opname)
+    asm_args = insn.asm_args
+    assert len(op.args) == len(asm_args), (
+        f"args {op.args!r} don't fit insn args {asm_args!r}")
+    words = insn.value(**{name: _translate_arg(arg, name) for arg, name in zip(op.args, asm_args)})
+    return words if isinstance(words, list) else [words]
+
+
+ST_CACHE = DiskCache("st")
+
+
+def load_st(path):
+    """
+    Parse `path`, assembling each op as we go. Results are cached on the file's
+    contents and the code that parses and assembles it.
+    """
+    from . import isa
+    from .isa import ilayout
+    from .rtl import isa_rv32
+
+    source = path.read_bytes()
+    digest = hashlib.sha256(source)
+    digest.update(source_digest(sys.modules[__name__], isa, ilayout, isa_rv32).encode())
+    key = digest.hexdigest()
+    if (results := ST_CACHE.get(key)) is not None:
+        return results
+
+    parser = Parser()
+    parser.feed_file(source.decode().splitlines())
+    for _, body in parser.results:
+        for line in body:
+            if isinstance(line, Op):
+                try:
+                    line.words = assemble_op(line)
+                except Exception:
+                    # Left for the caller to report against the test.
+                    pass
+
+    ST_CACHE.put(key, parser.results)
+    return parser.results
@@ -0,0 +1,22 @@
+import os
+
+from sae.sim import BACKENDS
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--sim",
+        choices=BACKENDS,
+        help="simulation backend for hart tests (default: $SAE_SIM, or pysim)")
+    parser.addoption(
+        "--sim-cache",
+        action="store_true",
+        help="reuse results of identical simulation runs (also: SAE_SIM_CACHE=1)")
+
+
+def pytest_configure(config):
+    # Set in the environment so xdist workers (and anything they spawn) agree.
+    if backend := config.getoption("sim"):
+        os.environ["SAE_SIM"] = backend
+    if config.getoption("sim_cache"):
+        os.environ["SAE_SIM_CACHE"] = "1"
@@ -0,0 +1,168 @@
+import struct
+import unittest
+from pathlib import Path
+
+from sae.asm import AsmError, assemble
+from sae.rtl.hart import FaultCode
+from sae.rtl.isa_rv32 import RV32I
+from sae.rtl.rv32 import disasm_image
+from sae.sim import run_until_fault
+
+Reg = RV32I.Reg
+
+
+def texts(program):
+    return [text for _, _, text in disasm_image(program.image)]
+
+
+class TestAsm(unittest.TestCase):
+    def test_program(self):
+        program = assemble("""
+            .globl _start
+        _start:
+            li a0, 0                # sum 1..n
+            li a1, N
+        1:  add a0, a0, a1
+            addi a1, a1, -1
+            bnez a1, 1b
+            call double
+            la a2, table
+            lw a3, 4(a2)
+            li a4, 0x12345678
+            lbu a5, %lo(table + 1)(zero)
+            .word 0xffffffff
+
+        double:
+            slli a0, a0, 1
+            ret
+
+            .equ N, 10
+            .rodata
+        table:
+            .word 0xcafe, table + 3
+        """)
+
+        results = run_until_fault(program.sysmem_init(), max_cycles=2000)
+        self.assertEqual(FaultCode.ILLEGAL_INSTRUCTION, results["faultcode"])
+        self.assertEqual(110, results[Reg("a0")])
+        self.assertEqual(program.symbols["table"], results[Reg("a2")])
+        self.assertEqual(program.symbols["table"] + 3, results[Reg("a3")])
+        self.assertEqual(0x12345678, results[Reg("a4")])
+        self.assertEqual(0xca, results[Reg("a5")])
+        self.assertEqual({"_start"}, program.globals)
+
+    def test_relaxation(self):
+        program = assemble("""
+            li a0, 2047
+            li a0, 2048
+            li a0, 0x1000
+            li a0, later
+            call near
+        near:
+            call far
+            .zero 0x100000
+        far:
+            .equ later, 0x7ff
+        """)
+        self.assertEqual([
+            "li x10, 0x7ff",
+            "lui x10, 0x1", "addi x10, x10, -0x800",
+            "lui x10, 0x1",
+            "li x10, 0x7ff",
+            "jal x1, 0x4",
+            "auipc x1, 0x100", "jalr x1, x1, 0x8",
+        ], texts(program)[:8])
+
+    def test_local_labels(self):
+        program = assemble("""
+        1:  j 1f
+        1:  j 1b
+            j 1b
+        1:
+        """)
+        self.assertEqual(["j 0x4", "j 0", "j -0x4"], texts(program))
+
+    def test_sections(self):
+        program = assemble("""
+            .data
+        d:  .byte 1, 2, 3
+            .section .text.startup
+        _start:
+            nop
+            .bss
+        b:  .zero 8
+            .text
+        t:  .string "a\\tb"
+        """)
+        self.assertEqual({"_start": 0, "t": 4, "d": 8, "b": 12}, program.symbols)
+        self.assertEqual(b"\x13\0\0\0a\tb\0\x01\x02\x03", program.image)
+        self.assertEqual(9, program.bss)
+
+    def test_crt0(self):
+        source = (Path(__file__).parent.parent / "rv" / "crt0.s").read_text()
+        program = assemble(source + "main:\n    ret\n")
+        self.assertEqual([
+            "addi x2, x2, -0x4",
+            "sw x1, 0(x2)",
+            "jal x1, 0x10",
+            "lw x1, 0(x2)",
+            "addi x2, x2, 0x4",
+            "jalr x0, x1, 0",
+            "jalr x0, x1, 0",
+        ], texts(program))
+
+    def test_division(self):
+        # Truncated toward zero, and exact where a float quotient isn't.
+        program = assemble("""
+            .word -7 / 2, 7 / -2, -7 / -2
+            .word (((1 << 60) - 1) / 1) >> 32
+        """)
+        self.assertEqual((-3 & 0xFFFF_FFFF, -3 & 0xFFFF_FFFF, 3, 0x0FFF_FFFF),
+                         struct.unpack("<4I", program.image))
+
+    def test_errors(self):
+        for source, message in [
+            ("nop\n  j nowhere", r"^<input>:2: Undefined symbol 'nowhere'\.\n    j nowhere$"),
+            ("beq a0, a1, far\n.zero 0xffc\nfar:", r"^<input>:1: Branch target \+4096 out of range"),
+            ("addi a0, a0, 2048", r"^<input>:1: Immediate 2048 out of range\.\n"),
+            ("frob a0", r"^<input>:1: Unknown instruction 'frob'\.\n"),
+            ("add a0, a1", r"^<input>:1: 'add' takes 3 operands \(rd, rs1, rs2\), not 2\.\n"),
+            ("1: j 2b", r"^<input>:1: No local label 2 before 2b\.\n"),
+            ("1: j 1b\n  j 1f", r"^<input>:2: Undefined symbol '1f'\.\n    j 1f$"),
+            ("li a0, 1 / (2 - 2)", r"^<input>:1: Division by zero\.\n"),
+            ("x: .equ N, 1 / (x - x)\nli a0, N", r"^<input>:1: Division by zero\.\n"),
+            (".weird 1", r"^<input>:1: Unknown directive '\.weird'\.\n"),
+        ]:
+            with self.subTest(source=source):
+                with self.assertRaisesRegex(AsmError, message):
+                    assemble(source)
+
+    def test_elf(self):
+        program = assemble("""
+            .globl _start
+        helper:
+            ret
+        _start:
+            j helper
+            .bss
+            .zero 4
+        """, base=0x100)
+        elf = program.elf()
+
+        self.assertEqual(b"\x7fELF\x01\x01\x01", elf[:7])
+        e_type, e_machine, _, e_entry, e_phoff, e_shoff = struct.unpack_from("<HHIIII", elf, 16)
+        self.assertEqual((2, 243, 0x104), (e_type, e_machine, e_entry))
+
+        p_type, p_offset, p_vaddr, _, p_filesz, p_memsz = struct.unpack_from("<IIIIII", elf, e_phoff)
+        self.assertEqual((1, 0x100, 8, 12), (p_type, p_vaddr, p_filesz, p_memsz))
+        self.assertEqual(program.image, elf[p_offset:p_offset + p_filesz])
+
+        # .symtab is section 2, its strings in section 3.
+        _, _, _, _, sym_off, sym_size, _, sh_info = struct.unpack_from("<IIIIIIII", elf, e_shoff + 2 * 40)
+        str_off = struct.unpack_from("<I", elf, e_shoff + 3 * 40 + 16)[0]
+        symbols = {}
+        for i in range(1, sym_size // 16):
+            st_name, st_value, _, st_info = struct.unpack_from("<IIIB", elf, sym_off + i * 16)
+            name = elf[str_off + st_name:elf.index(b"\0", str_off + st_name)].decode()
+            symbols[name] = (st_value, st_info >> 4, i >= sh_info)
+        self.assertEqual({"helper": (0x100, 0, False), "_start": (0x104, 1, True)}, symbols)
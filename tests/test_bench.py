@@ -0,0 +1,33 @@
+import unittest
+
+from sae import Sae, bench
+from sae.asm import assemble
+
+
+class TestBench(unittest.TestCase):
+    def test_kernels_assemble(self):
+        np = Sae()
+        for benchmark in bench.BENCHMARKS:
+            with self.subTest(benchmark=benchmark.name):
+                self.assertTrue(bench.load(np, benchmark))
+
+    def test_run(self):
+        shrimple = next(b for b in bench.BENCHMARKS if b.name == "shrimple")
+        entry = bench.run(Sae(), shrimple, backend="pysim")
+        self.assertEqual(69, entry["result"])
+        self.assertGreater(entry["cycles"], entry["instret"])
+        self.assertEqual(round(entry["cycles"] / entry["instret"], 3), entry["cpi"])
+
+    def test_compare(self):
+        entry = {"cycles": 100, "instret": 10, "cpi": 10.0, "result": 1, "sim_hz": 1000}
+        baseline = {"backend": "cxxrtl", "benchmarks": {"a": entry, "b": entry}}
+        report = {"backend": "cxxrtl", "benchmarks": {
+            "a": {**entry, "cycles": 90, "sim_hz": 900},
+            "b": {**entry, "cycles": 110, "result": 2, "sim_hz": 500},
+            "c": entry,
+        }}
+        regressions, warnings = bench.compare(report, baseline, speed_tolerance=0.25)
+        self.assertEqual(["b: result 0x2, baseline 0x1", "b: cycles 110, baseline 100 (+10.0%)"],
+                         regressions)
+        self.assertEqual(["b: simulated at 500 Hz, baseline 1000 Hz", "c: not in baseline"],
+                         warnings)
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from amaranth.lib.memory import Memory
+
+from sae import Sae, build
+from sae.cache import rtl_digest
+from sae.rtl import Top
+from sae.sim import cxxrtl
+
+
+class TestBuild(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name)
+        for p in [patch.object(build.PLANS, "_path", self.path / "plans"),
+                  patch.object(cxxrtl.ELABORATIONS, "_path", self.path / "rtlil"),
+                  patch.dict("os.environ", {"SAE_CACHE": "1"})]:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_rtl_digest(self):
+        self.assertEqual(rtl_digest("hart", 1), rtl_digest("hart", 1))
+        self.assertNotEqual(rtl_digest("hart", 1), rtl_digest("hart", 2))
+
+    def test_plan_cached(self):
+        np = Sae()
+        platform = np.target_by_name("icebreaker")
+        plan, cached = build.plan_for(np, platform)
+        self.assertFalse(cached)
+        self.assertIn("sae.il", plan.files)
+
+        with patch.object(platform, "prepare", side_effect=AssertionError("elaborated")):
+            again, cached = build.plan_for(np, platform)
+            self.assertTrue(cached)
+            self.assertEqual(plan.files["sae.il"], again.files["sae.il"])
+            with self.assertRaisesRegex(AssertionError, "elaborated"):
+                build.plan_for(np, platform, force=True)
+            with self.assertRaisesRegex(AssertionError, "elaborated"):
+                build.plan_for(np, platform, debug_verilog=True)
+
+    def test_plan_keyed_on_program(self):
+        np = Sae()
+        platform = np.target_by_name("icebreaker")
+        plan, _ = build.plan_for(np, platform)
+
+        def construct_top(np, platform):
+            return Top(platform=platform, sysmem=Memory(depth=4096, shape=16, init=[0x0513]))
+
+        with patch.object(build.niar_build, "construct_top", construct_top):
+            # A platform is only prepared once.
+            other, cached = build.plan_for(np, np.target_by_name("icebreaker"))
+        self.assertFalse(cached)
+        self.assertNotEqual(plan.files["sae.il"], other.files["sae.il"])
+
+    def test_toolchain_stages(self):
+        started = time.time() - 100
+        for suffix, finished in [(".json", started + 30), (".asc", started + 90)]:
+            path = self.path / f"sae{suffix}"
+            path.touch()
+            os.utime(path, (finished, finished))
+        self.assertEqual([("synthesis", 30), ("place and route", 60)],
+                         build.toolchain_stages(self.path, "sae", started))
+        # Left over from an earlier build.
+        self.assertEqual([], build.toolchain_stages(self.path, "sae", started + 100))
+
+    def test_cxxrtl_elaboration_cached(self):
+        model = cxxrtl.CxxrtlHart(cxxrtl.MIN_DEPTH)
+        with patch.object(cxxrtl.CxxrtlHart, "_elaborate",
+                          side_effect=AssertionError("elaborated")):
+            again = cxxrtl.CxxrtlHart(cxxrtl.MIN_DEPTH)
+        self.assertEqual(model.path, again.path)
+        self.assertEqual(model.fsm_decodings, again.fsm_decodings)
+
+    def test_report(self):
+        (self.path / "sae.rpt").write_text(
+            "2.48. Printing statistics.\n"
+            "   Number of cells:                 12\n"
+            "     SB_LUT4                       999\n"
+            "3.1. Printing statistics.\n"
+            "\n"
+            "=== top ===\n"
+            "   Number of cells:               3571\n"
+            "     SB_CARRY                      163\n"
+            "     SB_DFFE                       312\n"
+            "     SB_DFFR                        45\n"
+            "     SB_IO                           6\n"
+            "     SB_LUT4                      2010\n"
+            "     SB_RAM40_4K                     8\n")
+        (self.path / "sae.tim").write_text(
+            "Info: Device utilisation:\n"
+            "Info: \t         ICESTORM_LC:  2390/ 5280    45%\n"
+            "Info: \t        ICESTORM_RAM:     8/   30    26%\n"
+            "Info: Placed 2390 cells\n"
+            "Info: Max frequency for clock 'clk_$glb_clk': 24.10 MHz (PASS at 12.00 MHz)\n"
+            "Info: Critical path report for clock 'clk_$glb_clk' (posedge -> posedge):\n"
+            "Info:       type curr  total name\n"
+            "Info:   clk-to-q  0.54  0.54 Source hart.fsm_state_DFFLC.O\n"
+            "Info:    routing  1.42  1.96 Net hart.fsm_state (14,17) -> (14,18)\n"
+            "Info:      setup  0.47 35.12 Sink hart.xwr_val_DFFLC.I0\n"
+            "Info: 8.62 ns logic, 26.50 ns routing\n"
+            "Info: Max frequency for clock 'clk_$glb_clk': 28.47 MHz (PASS at 12.00 MHz)\n")
+        entry = build.report(self.path, "sae")
+        self.assertEqual({"clk_$glb_clk": 28.47}, entry["fmax_mhz"])
+        self.assertEqual(
+            {"clk_$glb_clk": {"from": "hart.fsm_state_DFFLC.O", "to": "hart.xwr_val_DFFLC.I0"}},
+            entry["critical_paths"])
+        self.assertEqual(
+            {"lut": 2010, "ff": 357, "carry": 163, "ebr": 8, "spram": 0, "dsp": 0},
+            entry["cells"])
+        self.assertEqual({"ICESTORM_LC": [2390, 5280], "ICESTORM_RAM": [8, 30]},
+                         entry["utilisation"])
+
+    def test_report_count_first(self):
+        # Newer Yosys puts the count before the cell type.
+        cells = build._cells(
+            "3.1. Printing statistics.\n"
+            "\n"
+            "=== top ===\n"
+            "       3571 cells\n"
+            "        163   SB_CARRY\n"
+            "        312   SB_DFFE\n"
+            "         45   SB_DFFR\n"
+            "       2010   SB_LUT4\n"
+            "          8   SB_RAM40_4K\n")
+        self.assertEqual(
+            {"lut": 2010, "ff": 357, "carry": 163, "ebr": 8, "spram": 0, "dsp": 0}, cells)
+
+    def test_compare(self):
+        entry = {"fmax_mhz": {"clk": 30.0}, "cells": {"lut": 2000, "ff": 300}}
+        baseline = {"boards": {"a": entry, "b": entry}}
+        report = {"boards": {
+            "a": {"fmax_mhz": {"clk": 29.0}, "cells": {"lut": 1900, "ff": 300}},
+            "b": {"fmax_mhz": {"clk": 27.0, "pll": 50.0}, "cells": {"lut": 2100, "ff": 300}},
+            "c": entry,
+        }}
+        regressions, warnings = build.compare(report, baseline, fmax_tolerance=0.05)
+        self.assertEqual(["b: clk Fmax 27.0 MHz, baseline 30.0 MHz (-10.0%)",
+                          "b: 2100 lut, baseline 2000"], regressions)
+        self.assertEqual(["b: clock 'pll' not in baseline", "c: not in baseline"], warnings)
@@ -0,0 +1,122 @@
+import unittest
+from unittest.mock import patch
+
+from sae import fuzz, st
+from sae.rtl.hart import FaultCode
+from sae.rtl.isa_rv32 import RV32I
+from sae.sim import default_backend, reference
+from sae.st import assemble_op, parse_pairs
+
+
+class TestFuzz(unittest.TestCase):
+    def test_agree(self):
+        for seed in range(4):
+            with self.subTest(seed=seed):
+                self.assertIsNone(
+                    fuzz.check(fuzz.generate(seed, length=24), backend=default_backend()))
+
+    def test_long(self):
+        # The data area is beyond ADDI's reach.
+        program = fuzz.generate(0, length=400)
+        self.assertGreater(len(fuzz.sysmem_init(program)) * 2, 2048)
+        self.assertIsNone(fuzz.check(program, backend=default_backend()))
+
+    def test_mem_only(self):
+        # Three instructions each, so more than two cycles an item.
+        items = tuple(fuzz.Item("mem", mnemonic, (5, 6), addr=4 * i)
+                      for i, mnemonic in enumerate(["sw", "lw", "sh", "lbu", "sb", "lh"]))
+        program = fuzz.Program(items, data=tuple(range(fuzz.DATA_SIZE // 4)))
+        self.assertIsNone(fuzz.check(program, backend=default_backend()))
+
+    def test_unsupported_skipped(self):
+        with patch.object(reference, "run_until_fault",
+                          side_effect=reference.Unsupported("MMIO access")):
+            self.assertIsInstance(fuzz.run_seed(0, backend="pysim", length=4),
+                                  reference.Unsupported)
+
+    def test_generate(self):
+        self.assertEqual(fuzz.generate(7), fuzz.generate(7))
+        self.assertNotEqual(fuzz.generate(7), fuzz.generate(8))
+        self.assertEqual(10, len(fuzz.generate(7, length=10).items))
+
+    def test_shrink(self):
+        # Pretend the hart gets any program with a `sub` wrong.
+        def fails(program):
+            return any(item.mnemonic == "sub" for item in program.items)
+
+        program = fuzz.generate(3)
+        self.assertTrue(fails(program))
+        shrunk = fuzz.shrink(program, fails)
+        self.assertEqual(1, len(shrunk.items))
+        self.assertEqual("sub", shrunk.items[0].mnemonic)
+        self.assertEqual({}, shrunk.inits)
+
+    def test_reproducer(self):
+        # Long enough that the reproducer's addresses need LUI to match.
+        program = fuzz.generate(5, length=400)
+        expected = reference.run_until_fault(
+            fuzz.sysmem_init(program), fuzz.xregs(program), max_cycles=1000)
+        text = fuzz.reproducer(program, "test_fuzz_5", expected)
+
+        parser = st.Parser()
+        parser.feed_file(text.splitlines())
+        [(name, body)] = parser.results
+        self.assertEqual("test_fuzz_5", name)
+
+        words = []
+        for line in body:
+            match line:
+                case st.Op():
+                    words += assemble_op(line)
+                case st.Pragma(kind="word", args=[w]):
+                    words.append(w)
+                case st.Pragma(kind="init", args=args):
+                    inits = parse_pairs(args)
+                    self.assertEqual(
+                        {RV32I.Reg(f"x{xn}"): v for xn, v in program.inits.items()}, inits)
+                case st.Pragma(kind="assert", args=args):
+                    asserts = parse_pairs(args)
+        halfwords = []
+        for word in words:
+            halfwords += [word & 0xFFFF, word >> 16]
+        self.assertEqual(fuzz.sysmem_init(program), halfwords + [0xFFFF, 0xFFFF])
+        self.assertEqual(
+            {reg: value for reg, value in expected.items() if isinstance(reg, RV32I.Reg)},
+            {reg: value for reg, value in asserts.items() if isinstance(reg, RV32I.Reg)})
+
+
+class TestReference(unittest.TestCase):
+    def run_words(self, words, **kwargs):
+        sysmem = []
+        for word in words + [0xFFFF_FFFF]:
+            sysmem += [word & 0xFFFF, word >> 16]
+        xregs = [0] * 32
+        for reg, value in kwargs.items():
+            xregs[RV32I.Reg(reg).value] = value
+        return reference.run_until_fault(sysmem, xregs)
+
+    def test_alu(self):
+        ran = self.run_words([
+            RV32I.ADDI.value(rd=RV32I.Reg("x1"), rs1=RV32I.Reg("x0"), imm=-5),
+            RV32I.SRAI.value(rd=RV32I.Reg("x2"), rs1=RV32I.Reg("x1"), shamt=1),
+            RV32I.SRLI.value(rd=RV32I.Reg("x3"), rs1=RV32I.Reg("x1"), shamt=28),
+            RV32I.SLTU.value(rd=RV32I.Reg("x4"), rs1=RV32I.Reg("x3"), rs2=RV32I.Reg("x1")),
+        ])
+        self.assertEqual(0xFFFF_FFFB, ran[RV32I.Reg("x1")])
+        self.assertEqual(0xFFFF_FFFD, ran[RV32I.Reg("x2")])
+        self.assertEqual(0xF, ran[RV32I.Reg("x3")])
+        self.assertEqual(1, ran[RV32I.Reg("x4")])
+        self.assertEqual(FaultCode.ILLEGAL_INSTRUCTION, ran["faultcode"])
+        self.assertEqual(0xFFFF_FFFF, ran["faultinsn"])
+        self.assertEqual(16, ran["pc"])
+
+    def test_misaligned_jump(self):
+        ran = self.run_words([RV32I.JAL.value(rd=RV32I.Reg("x1"), imm=6)])
+        self.assertEqual(FaultCode.PC_MISALIGNED, ran["faultcode"])
+        self.assertEqual(4, ran["pc"])
+        self.assertNotIn(RV32I.Reg("x1"), ran)
+
+    def test_mmio_unsupported(self):
+        with self.assertRaises(reference.Unsupported):
+            self.run_words([RV32I.LW.value(rd=RV32I.Reg("x1"), rs1off=(0, RV32I.Reg("x2")))],
+                           x2=0x8000_0000)
@@ -0,0 +1,92 @@
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+from sae.asm import assemble
+from sae.image import load_image
+from sae.rtl.hart import FaultCode, Hart
+from sae.rtl.isa_rv32 import RV32I
+from sae.sim import run_until_fault
+
+Reg = RV32I.Reg
+
+
+class TestImage(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def write(self, name, data):
+        path = self.dir / name
+        path.write_bytes(data)
+        return path
+
+    def test_flat(self):
+        path = self.write("odd.bin", b"\x01\x02\x03\x04\x05")
+        image = load_image(path)
+        self.assertEqual(b"\x01\x02\x03\x04\x05", image.data)
+        self.assertEqual({}, image.symbols)
+        self.assertEqual([0x0201, 0x0403, 0x0005], image.words().tolist())
+        self.assertEqual([0x04030201, 0x00000005], image.words(32).tolist())
+        self.assertEqual([], load_image(self.write("empty.bin", b"")).words().tolist())
+
+    def test_shrimprw(self):
+        path = Path(__file__).parent / "test_shrimprw.bin"
+        data = path.read_bytes()
+        self.assertEqual([data[i] | (data[i + 1] << 8) for i in range(0, len(data), 2)],
+                         Hart.sysmem_init_for(path))
+
+    def test_elf(self):
+        program = assemble("""
+            .globl _start
+        _start:
+            la a0, counter
+            lw a1, 0(a0)
+            addi a1, a1, 5
+            sw a1, 0(a0)
+            .word 0xffffffff
+            .bss
+        counter:
+            .word 0
+        """, base=0x100)
+        image = load_image(self.write("prog.elf", program.elf()))
+        self.assertEqual(0x100 + len(program.image) + program.bss, len(image.data))
+        self.assertEqual(bytes(0x100) + program.image, image.data[:0x100 + len(program.image)])
+        self.assertFalse(any(image.data[0x100 + len(program.image):]))
+        self.assertEqual(program.entry, image.entry)
+        self.assertEqual(program.symbols["counter"], image.symbols["counter"])
+        self.assertIn("_start", image.symbols)
+        self.assertNotIn("N", load_image(self.write("prog.s", "    .equ N, 3\nx: nop\n".encode())).symbols)
+
+    def test_run_elf(self):
+        program = assemble("""
+            li a0, 42
+            .word 0xffffffff
+        """)
+        results = run_until_fault(self.write("prog.elf", program.elf()))
+        self.assertEqual(FaultCode.ILLEGAL_INSTRUCTION, results["faultcode"])
+        self.assertEqual(42, results[Reg("a0")])
+
+    def test_not_riscv(self):
+        elf = bytearray(assemble("nop").elf())
+        elf[18] = 62  # EM_X86_64
+        with self.assertRaisesRegex(ValueError, "not a RISC-V"):
+            load_image(self.write("x86.elf", bytes(elf)))
+
+    def test_limit(self):
+        path = self.write("big.bin", bytes(10))
+        self.assertEqual(10, len(load_image(path, limit=10).data))
+        with self.assertRaisesRegex(ValueError, "10 bytes don't fit in a 8-byte sysmem"):
+            load_image(path, limit=8)
+        with self.assertRaisesRegex(ValueError, "don't fit"):
+            Hart.sysmem_init_for(path, memory=8)
+
+        # Move the only segment out to where the MMIO lives.
+        elf = bytearray(assemble("nop").elf())
+        phoff = struct.unpack_from("<I", elf, 28)[0]
+        struct.pack_into("<I", elf, phoff + 12, 0x8000_0000)
+        path = self.write("mmio.elf", bytes(elf))
+        with self.assertRaisesRegex(ValueError, "segment at 0x80000000 .* outside a 8192-byte"):
+            load_image(path, limit=8192)
@@ -22,6 +22,21 @@ def test_base_li():
     assert RV32I.LI.value(rd="a1", imm=0x1234_5800) == [0x1234_55B7, 0x4005_8593, 0x4005_8593]
 
 
+def test_value_agrees():
+    # value() packs words itself; check it against the StructLayout it
+    # stands in for, given operands of every kind.
+    for insn, kwargs in [
+        (RV32I.ADD, dict(rd=5, rs1=RV32I.Reg.A1, rs2="a2")),
+        (RV32I.ADDI, dict(rd="a0", rs1="a1", imm=-5)),
+        (RV32I.SW, dict(rs2="a0", rs1off=(-8, "sp"))),
+        (RV32I.BGE, dict(rs1="a0", rs2="x0", imm=-16)),
+        (RV32I.FENCE, dict(pred="rw", succ="w")),
+        (RV32I.ECALL, {}),
+    ]:
+        args = insn.args_for(**kwargs)
+        assert insn.value(**kwargs) == insn.shape.const(args).as_value().value
+
+
 def test_call_nonleaf():
     with pytest.raises(TypeError,
                        match=r"^'sae\..*\.RV32I\.IL' called, but it's layoutless\.$"):
@@ -130,3 +145,65 @@ def test_match_check_xfrm():
     v = RV32I.LUI.value(**kwargs)
     assert RV32I.LUI.match_value(v) == kwargs
     assert RV32I.AUIPC.match_value(v) is None
+
+
+def test_match_not():
+    kwargs = {"rd": RV32I.Reg("a0"), "rs1": RV32I.Reg("a1")}
+    v = RV32I.NOT.value(**kwargs)
+    assert RV32I.NOT.match_value(v) == kwargs
+    assert RV32I.XORI.match_value(v) == {**kwargs, "imm": 0xFFF}
+
+
+def test_decode():
+    def decode(v):
+        insn, operands = RV32I.decode(v)
+        return insn.__name__, operands
+
+    kwargs = {"rd": RV32I.Reg("a0"), "rs1": RV32I.Reg("a1")}
+    assert decode(RV32I.ADDI.value(**kwargs, imm=3)) == ("ADDI", {**kwargs, "imm": 3})
+    # The most specific match wins.
+    assert decode(RV32I.ADDI.value(**kwargs, imm=0)) == ("MV", kwargs)
+    assert decode(RV32I.NOP.value()) == ("NOP", {})
+    assert decode(RV32I.FENCE_TSO.value()) == ("FENCE_TSO", {})
+    # Distinguished only by their transforms.
+    assert decode(RV32I.SRAI.value(**kwargs, shamt=3)) == ("SRAI", {**kwargs, "shamt": 3})
+    assert decode(RV32I.SRLI.value(**kwargs, shamt=3)) == ("SRLI", {**kwargs, "shamt": 3})
+
+    assert RV32I.decode(0x0000_0000) is None
+    assert RV32I.decode(0xFFFF_FFFF) is None
+
+
+def test_pseudo_base():
+    assert RV32I.MV.base is RV32I.ADDI
+    assert RV32I.NOP.base is RV32I.ADDI
+    assert RV32I.RET.base is RV32I.JALR
+    assert RV32I.J_.base is RV32I.JAL
+    # Instructions in their own right, made by fixing more than operands.
+    assert RV32I.ADDI.base is RV32I.ADDI
+    assert RV32I.SUB.base is RV32I.SUB
+    assert RV32I.LB.base is RV32I.LB
+    assert RV32I.FENCE_TSO.base is RV32I.FENCE_TSO
+
+
+def test_decode_subclass():
+    class RV32IWfi(RV32I):
+        WFI = RV32I._system(funct=0b000100000101_000)
+
+    assert RV32IWfi.decode(0x1050_0073) == (RV32IWfi.WFI, {})
+    # Its base's instructions too.
+    assert RV32IWfi.decode(0x0000_0013) == (RV32I.NOP, {})
+    assert RV32I.decode(0x1050_0073) is None
+
+
+def test_decode_agrees():
+    insns = [insn for insn in RV32I.insns if not insn.__name__.startswith("_")]
+    for insn in insns:
+        mask, match = insn.fixed_bits()
+        # Fill the free bits with a pattern, and check the decoder's choice
+        # against trying every instruction.
+        v = match | (0x5A5A_5A5A & ~mask)
+        decoded = RV32I.decode(v)
+        if decoded is None:
+            assert all(i.match_value(v) is None for i in insns)
+        else:
+            assert decoded[0].match_value(v) == decoded[1]
@@ -6,10 +6,9 @@ from amaranth.lib.memory import Memory
 from amaranth.sim import Simulator
 
 from sae.rtl.mmu import MMU, AccessWidth
+from sae.sim import print_mmu
 from sae.targets import test
 
-from .test_utils import print_mmu
-
 
 def mmu_sim(inner):
     @wraps(inner)
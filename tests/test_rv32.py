@@ -0,0 +1,41 @@
+import struct
+
+import pytest
+
+from sae.rtl.rv32 import disasm, disasm_array, disasm_image
+
+
+@pytest.mark.parametrize("word,text", [
+    (0x00C5_8533, "add x10, x11, x12"),
+    (0x40A5_D513, "srai x10, x11, 0xa"),
+    (0x0000_8067, "jalr x0, x1, 0"),
+    (0x00B5_0223, "sb x11, 0x4(x10)"),
+    (0x8330_000F, "fence.tso"),
+    (0x0010_0073, "ebreak"),
+    (0xC562_35EF, "jal x11, -0xdcbaa"),
+])
+def test_disasm(word, text):
+    assert disasm(word) == text
+
+
+def test_disasm_unknown():
+    with pytest.raises(RuntimeError, match=r"^unknown insn: 0000007f$"):
+        disasm(0x0000_007F)
+
+
+def test_disasm_image():
+    image = struct.pack("<III", 0x00C5_8533, 0x0000_007F, 0x0000_8067) + b"\x01"
+    assert disasm_image(memoryview(image), base=0x100) == [
+        (0x100, 0x00C5_8533, "add x10, x11, x12"),
+        (0x104, 0x0000_007F, ".word 0x0000007f"),
+        (0x108, 0x0000_8067, "jalr x0, x1, 0"),
+    ]
+
+
+def test_disasm_array():
+    np = pytest.importorskip("numpy")
+    words = np.array([[0x00C5_8533, 0x0000_007F], [0x00C5_8533, 0xC562_35EF]], dtype=np.uint32)
+    assert disasm_array(words).tolist() == [
+        ["add x10, x11, x12", ".word 0x0000007f"],
+        ["add x10, x11, x12", "jal x11, -0xdcbaa"],
+    ]
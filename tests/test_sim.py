@@ -0,0 +1,551 @@
+import contextlib
+import io
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from amaranth import Fragment
+from amaranth.lib.memory import Memory
+from amaranth.sim import Simulator
+
+from sae.rtl.hart import FaultCode, Hart
+from sae.rtl.isa_rv32 import RV32I
+from sae.asm import assemble as assemble_source
+from sae.sim import (
+    Checkpoint, CheckpointAt, Semihost, UARTQueue, pysim, results, run_until_fault)
+from sae.sim.mix import InstructionMix
+from sae.sim.profile import Profiler, Symbolizer, collapsed, report
+from sae.sim.semihost import Call, Sysmem
+from sae.sim.trace import Retirement, Store, read_trace
+from sae.targets import test
+
+Reg = RV32I.Reg
+
+
+@unittest.skipUnless(shutil.which("c++"), "no C++ compiler available")
+class TestCxxrtl(unittest.TestCase):
+    def assertBackendsAgree(self, *args, **kwargs):
+        pysim = run_until_fault(*args, backend="pysim", cache=False, **kwargs)
+        cxxrtl = run_until_fault(*args, backend="cxxrtl", cache=False, **kwargs)
+        self.assertEqual(pysim, cxxrtl)
+
+    def test_top(self):
+        self.assertBackendsAgree([0xFFFF])
+
+    def test_shrimple(self):
+        self.assertBackendsAgree(Path(__file__).parent / "test_shrimple.bin", max_cycles=2000)
+
+    def test_shrimprw(self):
+        self.assertBackendsAgree(
+            Path(__file__).parent / "test_shrimprw.bin",
+            reg_inits={"uart": b"y"},
+            max_cycles=2000)
+
+    def test_states(self):
+        stats = {}
+        for backend in ["pysim", "cxxrtl"]:
+            uart = UARTQueue(echo=False)
+            uart.send(b"y", at=20_000)
+            stats[backend] = {}
+            run_until_fault(
+                Path(__file__).parent / "test_shrimprw.bin",
+                uart=uart, backend=backend, max_cycles=10_000, stats=stats[backend])
+        profiles = [stats[backend].pop("profile") for backend in stats]
+        self.assertEqual(stats["pysim"], stats["cxxrtl"])
+        self.assertEqual(*(p.stacks for p in profiles))
+        self.assertEqual(*(p.blocks for p in profiles))
+        states = stats["pysim"]["states"]
+        self.assertEqual({"hart", "mmu_read", "mmu_write"}, states.keys())
+        for fsm, counts in states.items():
+            with self.subTest(fsm=fsm):
+                self.assertEqual(stats["pysim"]["cycles"], sum(counts.values()))
+        self.assertEqual(stats["pysim"]["instret"], states["hart"]["fetch.resolve"])
+
+
+@unittest.skipUnless(shutil.which("c++"), "no C++ compiler available")
+class TestHarness(unittest.TestCase):
+    """The standalone C++ harness, cxxrtl/main.cc."""
+
+    # Polls the UART until a byte arrives, then faults.
+    POLL = """
+    _start:
+        li t1, 0x80000001
+    1:  lbu t0, 0(t1)
+        nop
+        beqz t0, 1b
+        .word 0xffffffff
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        root = Path(__file__).parent.parent
+        subprocess.run([sys.executable, "-m", "sae", "cxxrtl", "-c"], cwd=root, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        cls.harness = root / "build" / "cxxrtl" / "sae"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.elf = Path(tmp.name) / "poll.elf"
+        self.elf.write_bytes(assemble_source(self.POLL).elf())
+
+    def run_harness(self, *args):
+        out = subprocess.run([self.harness, "--elf", self.elf, *args],
+                             check=True, capture_output=True, text=True).stdout
+        return [line for line in out.splitlines() if not line.startswith("took ")]
+
+    def test_lap_boundary(self):
+        # Arrivals over more than a lap of the loop, so one lands on the cycle
+        # a whole number of laps on from where fast-forwarding starts.
+        fast_forwarded = False
+        for at in range(100, 140):
+            with self.subTest(at=at):
+                args = ["--uart-at", f"{at}=y", "--max-cycles", "2000"]
+                ran = self.run_harness(*args)
+                if ran[-1].startswith("fast-forwarded "):
+                    fast_forwarded = True
+                    ran.pop()
+                self.assertEqual(self.run_harness(*args, "--no-fast-forward"), ran)
+        self.assertTrue(fast_forwarded)
+
+
+class TestUARTQueue(unittest.TestCase):
+    def test_shrimprw(self):
+        for backend in ["pysim", "cxxrtl"] if shutil.which("c++") else ["pysim"]:
+            with self.subTest(backend=backend):
+                uart = UARTQueue(b"xn", echo=False)
+                results = run_until_fault(
+                    Path(__file__).parent / "test_shrimprw.bin",
+                    uart=uart, backend=backend, max_cycles=4000)
+                self.assertIsNone(uart.offer)
+                self.assertEqual(b"i am ur princess\r\nagreed? [Yn] n\r\n:<\r\n", results["uart"])
+
+    def test_busy_wait(self):
+        for backend in ["pysim", "cxxrtl"] if shutil.which("c++") else ["pysim"]:
+            with self.subTest(backend=backend):
+                # Far more cycles than max_cycles would allow us to actually run.
+                uart = UARTQueue(echo=False)
+                uart.send(b"y", at=1_000_000)
+                results = run_until_fault(
+                    Path(__file__).parent / "test_shrimprw.bin",
+                    uart=uart, backend=backend, max_cycles=200_000)
+                self.assertEqual(420, results[Reg("a0")])
+                self.assertEqual(b"i am ur princess\r\nagreed? [Yn] y\r\nohhhhhh!\r\n", results["uart"])
+
+    def test_no_fast_forward(self):
+        for backend in ["pysim", "cxxrtl"] if shutil.which("c++") else ["pysim"]:
+            with self.subTest(backend=backend):
+                runs = {}
+                for fast_forward in [True, False]:
+                    uart = UARTQueue(echo=False)
+                    uart.send(b"y", at=5_000)
+                    stats = {}
+                    with contextlib.redirect_stdout(io.StringIO()) as out:
+                        results = run_until_fault(
+                            Path(__file__).parent / "test_shrimprw.bin", uart=uart,
+                            backend=backend, max_cycles=10_000, stats=stats,
+                            fast_forward=fast_forward)
+                    self.assertEqual(fast_forward, "fast-forwarding" in out.getvalue())
+                    runs[fast_forward] = (results, stats["cycles"], stats["instret"],
+                                          stats["mix"], stats["profile"].blocks)
+                self.assertEqual(runs[True], runs[False])
+
+    def test_busy_wait_forever(self):
+        for backend in ["pysim", "cxxrtl"] if shutil.which("c++") else ["pysim"]:
+            with self.subTest(backend=backend):
+                with self.assertRaisesRegex(RuntimeError, "max cycles reached"):
+                    run_until_fault(
+                        Path(__file__).parent / "test_shrimprw.bin",
+                        uart=UARTQueue(echo=False), backend=backend, max_cycles=1_000_000)
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name)
+        for p in [patch.object(results.RESULTS, "_path", self.path),
+                  patch.dict("os.environ", {"SAE_CACHE": "1"})]:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def run_cached(self, mem, **kwargs):
+        return run_until_fault(mem, backend="pysim", cache=True, **kwargs)
+
+    def test_hit(self):
+        mem = [0x0513, 0x02A0, 0xFFFF, 0xFFFF]  # li a0, 42
+        ran = self.run_cached(mem)
+        self.assertEqual(42, ran[Reg("a0")])
+        self.assertEqual(1, len(list(self.path.iterdir())))
+        with patch.object(pysim, "simulate", side_effect=AssertionError("simulated")):
+            self.assertEqual(ran, self.run_cached(mem))
+
+    def test_key(self):
+        mem = [0xFFFF]
+        self.run_cached(mem)
+        self.run_cached(mem, reg_inits={Reg("a0"): 1})
+        self.run_cached(mem, max_cycles=10)
+        self.run_cached([0xFFFF, 0xFFFF])
+        self.assertEqual(4, len(list(self.path.iterdir())))
+
+    def test_key_source(self):
+        # The shared run loop decides what a run returns as much as the backend.
+        import sae.sim
+
+        with patch.object(results.disk_cache, "source_digest",
+                          wraps=results.disk_cache.source_digest) as source_digest:
+            self.run_cached([0xFFFF])
+        self.assertIn(sae.sim, source_digest.call_args.args)
+        self.assertIn(pysim, source_digest.call_args.args)
+
+    def test_bypass(self):
+        self.run_cached([0xFFFF], uart=UARTQueue(echo=False))
+        run_until_fault([0xFFFF], backend="pysim", cache=False)
+        self.assertEqual([], list(self.path.iterdir()))
+        self.run_cached([0xFFFF])
+        results.RESULTS.clear()
+        self.assertFalse(self.path.exists())
+
+
+class TestProfiler(unittest.TestCase):
+    PROGRAM = """
+    _start:
+        li s0, 3
+    1:  call leaf
+        addi s0, s0, -1
+        bnez s0, 1b
+        .word 0xffffffff
+    leaf:
+        addi a0, a0, 1
+        ret
+    """
+
+    def test_program(self):
+        program = assemble_source(self.PROGRAM)
+        stats = {}
+        run_until_fault(program.sysmem_init(), backend="pysim", stats=stats)
+        profiler = stats["profile"]
+        self.assertEqual(stats["instret"], profiler.total)
+        leaf = program.symbols["leaf"]
+        self.assertEqual(3, profiler.pcs[leaf])
+        self.assertEqual({(0,): 1 + 3 * 3, (0, leaf): 3 * 2}, dict(profiler.stacks))
+        self.assertEqual("_start 10\n_start;leaf 6\n", collapsed(profiler, program.symbols))
+        self.assertIn("     6   37.5%  leaf", report(profiler, program.symbols))
+
+    def test_blocks(self):
+        profiler = Profiler()
+        nop = 0x00000013
+        beq = 0x00000063
+        for pc, insn in [(0, nop), (4, beq), (8, nop), (12, nop), (16, beq), (40, nop)]:
+            profiler.retire(pc, insn)
+        self.assertEqual({0: 2, 8: 3, 40: 1}, dict(profiler.blocks))
+        # Repeated, the beq at 16 follows the nop at 40, so starts its own block.
+        profiler.repeat(2, 10)
+        self.assertEqual({0: 2, 8: 3, 16: 10, 40: 11}, dict(profiler.blocks))
+        self.assertEqual(26, profiler.total)
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = Path(d) / "profile.txt"
+            # As cxxrtl/main.cc --profile writes it.
+            path.write_text(
+                "saeprofile 1\n"
+                "pc 0 1\npc 14 3\n"
+                "block 0 1\nblock 14 3\n"
+                "stack 0 1\nstack 0;14 3\n")
+            profiler = Profiler.load(path)
+            self.assertEqual({0: 1, 0x14: 3}, dict(profiler.pcs))
+            self.assertEqual({0: 1, 0x14: 3}, dict(profiler.blocks))
+            self.assertEqual({(0,): 1, (0, 0x14): 3}, dict(profiler.stacks))
+            self.assertEqual(4, profiler.total)
+
+            path.write_text("saetrace\x01")
+            with self.assertRaisesRegex(ValueError, "not a version 1 profile"):
+                Profiler.load(path)
+
+    def test_symbolizer(self):
+        symbolize = Symbolizer({"a": 0x10, "b": 0x20, "b_alias": 0x20})
+        self.assertEqual("0x0000000c", symbolize(0xC))
+        self.assertEqual("a", symbolize(0x10))
+        self.assertEqual("a+0xc", symbolize(0x1C))
+        self.assertEqual("b", symbolize.function(0x30))
+
+
+class TestInstructionMix(unittest.TestCase):
+    def test_mix(self):
+        mix = InstructionMix()
+        xregs = [0] * 32
+        xregs[10] = 0x101
+        xregs[11] = 0x8000_0001
+        retire = [
+            (0, RV32I.LW.value(rd="a0", rs1off=(1, "a0"))),     # 0x102: split
+            (4, RV32I.LH.value(rd="a0", rs1off=(0, "a0"))),     # 0x101: odd
+            (8, RV32I.SB.value(rs2="a0", rs1off=(-1, "a1"))),   # 0x80000000: MMIO
+            (12, RV32I.BEQ.value(rs1="a0", rs2="a0", imm=8)),
+            (20, RV32I.BNE.value(rs1="a0", rs2="a0", imm=8)),
+            (24, RV32I.ADDI.value(rd="a0", rs1="a0", imm=1)),
+        ]
+        for pc, insn in retire:
+            mix.retire(pc, insn, xregs)
+        mix.repeat(2, 2)
+        self.assertEqual({
+            "insns": {"bne": 3, "addi": 3, "lw": 1, "lh": 1, "sb": 1, "beq": 1},
+            "load": {"WORD": {"split": 1}, "HALF": {"odd": 1}},
+            "store": {"BYTE": {"aligned": 1}},
+            "regions": {"load": {"sysmem": 2}, "store": {"mmio": 1}},
+            "branches": {"taken": 3, "not taken": 3},
+        }, mix.summary())
+
+    def test_pseudo_instructions(self):
+        mix = InstructionMix()
+        for pc, insn in enumerate([RV32I.NOP.value(), RV32I.MV.value(rd="a0", rs1="a1"),
+                                   RV32I.RET.value(), RV32I.SUB.value(rd="a0", rs1="a0", rs2="a1"),
+                                   0xFFFF_FFFF]):
+            mix.retire(pc * 4, insn, [0] * 32)
+        self.assertEqual({"addi": 2, "jalr": 1, "sub": 1, "unknown": 1}, mix.summary()["insns"])
+
+
+class TestRVFI(unittest.TestCase):
+    PROGRAM = """
+    _start:
+        addi a0, zero, 0x40
+        addi a1, zero, 0x123
+        sh a1, 2(a0)
+        lw a2, 0(a0)
+        jal ra, 1f
+        addi a3, zero, 1
+    1:  .word 0xffffffff
+    """
+
+    def test_records(self):
+        program = assemble_source(self.PROGRAM)
+        hart = Hart(sysmem=Memory(depth=64, shape=16, init=program.sysmem_init()), rvfi=True)
+        records = []
+
+        async def bench(ctx):
+            for _ in range(100):
+                if ctx.get(hart.rvfi.valid):
+                    records.append(ctx.get(hart.rvfi))
+                    if records[-1].trap:
+                        return
+                await ctx.tick()
+
+        sim = Simulator(Fragment.get(hart, platform=test()))
+        sim.add_clock(1e-6)
+        sim.add_testbench(bench)
+        sim.run()
+
+        self.assertEqual(list(range(6)), [r.order for r in records])
+        self.assertEqual(
+            [(0, 4), (4, 8), (8, 12), (12, 16), (16, 24)],
+            [(r.pc_rdata, r.pc_wdata) for r in records[:5]])
+        self.assertEqual(24, records[5].pc_rdata)
+        self.assertEqual(
+            [(10, 0x40), (11, 0x123), (0, 0), (12, 0x0123_0000), (1, 20)],
+            [(r.rd_addr, r.rd_wdata) for r in records[:5]])
+        self.assertEqual([0] * 5 + [1], [r.trap for r in records])
+        self.assertEqual(0xFFFF_FFFF, records[5].insn)
+
+        sh, lw = records[2], records[3]
+        self.assertEqual((0x42, 0b0011, 0, 0x123), (sh.mem_addr, sh.mem_wmask, sh.mem_rmask, sh.mem_wdata))
+        self.assertEqual((0x40, 0b1111, 0, 0x0123_0000), (lw.mem_addr, lw.mem_rmask, lw.mem_wmask, lw.mem_rdata))
+        self.assertEqual(0, records[0].mem_addr)
+
+
+class TestCheckpoint(unittest.TestCase):
+    BIN = Path(__file__).parent / "test_shrimprw.bin"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def run_shrimprw(self, **kwargs):
+        return run_until_fault(
+            self.BIN, reg_inits={"uart": b"y"}, max_cycles=4000, cache=False, **kwargs)
+
+    def test_resume(self):
+        backends = ["pysim", "cxxrtl"] if shutil.which("c++") else ["pysim"]
+        full_stats = {}
+        full = self.run_shrimprw(backend="pysim", stats=full_stats)
+        for taker in backends:
+            for resumer in backends:
+                with self.subTest(taker=taker, resumer=resumer):
+                    checkpoint = self.run_shrimprw(
+                        backend=taker, checkpoint_at=CheckpointAt(clock=300))
+                    self.assertIsInstance(checkpoint, Checkpoint)
+                    self.assertGreaterEqual(checkpoint.clock, 300)
+                    checkpoint.save(self.dir / "shrimprw.ckpt")
+                    checkpoint = Checkpoint.load(self.dir / "shrimprw.ckpt")
+
+                    stats = {}
+                    self.assertEqual(full, self.run_shrimprw(
+                        backend=resumer, resume=checkpoint, stats=stats))
+                    self.assertEqual(full_stats["cycles"], checkpoint.clock + stats["cycles"])
+                    self.assertEqual(full_stats["instret"], checkpoint.instret + stats["instret"])
+
+    def test_pc(self):
+        program = assemble_source(TestProfiler.PROGRAM)
+        leaf = program.symbols["leaf"]
+        checkpoint = run_until_fault(
+            program.sysmem_init(), backend="pysim", checkpoint_at=CheckpointAt(pc=leaf))
+        self.assertEqual(leaf, checkpoint.pc)
+        self.assertEqual(2, checkpoint.instret)
+        self.assertEqual(3, checkpoint.xregs[Reg("s0").value])
+        # ra was written by the call, as the checkpoint was taken.
+        self.assertEqual(8, checkpoint.xregs[Reg("ra").value])
+
+    def test_not_a_checkpoint(self):
+        path = self.dir / "junk"
+        path.write_bytes(b"junk")
+        with self.assertRaisesRegex(ValueError, "not a checkpoint"):
+            Checkpoint.load(path)
+
+
+class TestTrace(unittest.TestCase):
+    def test_read(self):
+        nop = 0x00000013
+        sw = 0x00112023
+        trace = (
+            b"saetrace\x01"
+            # INSN|RD at cycle 7, pc 0 (-4 from 0 + 4).
+            b"\x03\x07\x07" + nop.to_bytes(4, "little") + b"\x02\xfc\x3f"
+            # Fast-forwarded over 100 cycles.
+            b"\x80\x64"
+            # INSN|STORE 3 cycles later at pc 8.
+            b"\x05\x03\x08" + sw.to_bytes(4, "little") + b"\x80\x01\x0f\x2a"
+            # pc 0 again, its insn already known; a trap.
+            b"\x08\x01\x17"
+        )
+        with tempfile.TemporaryDirectory() as d:
+            path = Path(d) / "trace.bin"
+            path.write_bytes(trace)
+            self.assertEqual([
+                Retirement(7, 0, nop, rd=(2, 8188)),
+                Retirement(110, 8, sw, store=Store(0x80, 0xF, 42)),
+                Retirement(111, 0, nop, trap=True),
+            ], list(read_trace(path)))
+
+            path.write_bytes(b"not a trace")
+            with self.assertRaisesRegex(ValueError, "not a trace"):
+                list(read_trace(path))
+
+
+def assemble(*insns, data=b""):
+    """Lay out `insns` followed by `data`, returning halfwords and the address of `data`."""
+    words = []
+    for insn in insns:
+        ops = insn() if callable(insn) else insn
+        words += ops if isinstance(ops, list) else [ops]
+    data_addr = len(words) * 4
+    body = []
+    for w in words:
+        body += [w & 0xFFFF, w >> 16]
+    data += b"\0" * (len(data) & 1)
+    body += [data[i] | (data[i + 1] << 8) for i in range(0, len(data), 2)]
+    return body, data_addr
+
+
+def li(rd, imm):
+    return RV32I.LI.value(rd=rd, imm=imm)
+
+
+class TestSemihost(unittest.TestCase):
+    BACKENDS = ["pysim", "cxxrtl"] if shutil.which("c++") else ["pysim"]
+
+    def run_program(self, body, *, backend, **kwargs):
+        return run_until_fault(
+            body + [0] * 64, semihosting=True, track_reg_written=True,
+            semihost=Semihost(echo=False, **kwargs), backend=backend, max_cycles=200)
+
+    def test_write_exit(self):
+        msg = b"hello from the hart\n"
+        # The data address only depends on the instruction count, so lay it out twice.
+        program = lambda msg_addr: assemble(
+            li("a7", Call.WRITE), li("a0", 1), li("a1", msg_addr), li("a2", len(msg)),
+            RV32I.ECALL.value(),
+            li("a7", Call.EXIT), li("a0", 7),
+            RV32I.ECALL.value(),
+            data=msg)
+        body, msg_addr = program(0)
+        body, _ = program(msg_addr)
+        for backend in self.BACKENDS:
+            with self.subTest(backend=backend):
+                results = self.run_program(body, backend=backend)
+                self.assertEqual(7, results["exit"])
+                self.assertEqual(msg, results["stdout"])
+                self.assertEqual(FaultCode.UNSET, results["faultcode"])
+
+    def test_read_file(self):
+        contents = bytes(range(1, 200))
+        with tempfile.TemporaryDirectory() as root:
+            (Path(root) / "input.bin").write_bytes(contents)
+            path = b"input.bin\0"
+            program = lambda data_addr: assemble(
+                li("a7", Call.READ_FILE), li("a0", data_addr), li("a1", data_addr + 16),
+                li("a2", 256),
+                RV32I.ECALL.value(),
+                RV32I.ADDI.value(rd="a2", rs1="a0", imm=0),
+                li("a7", Call.WRITE), li("a0", 1), li("a1", data_addr + 16),
+                RV32I.ECALL.value(),
+                li("a7", Call.EXIT), li("a0", 0),
+                RV32I.ECALL.value(),
+                data=path.ljust(16, b"\0") + b"\0" * 256)
+            body, data_addr = program(0)
+            body, _ = program(data_addr)
+            for backend in self.BACKENDS:
+                with self.subTest(backend=backend):
+                    results = self.run_program(body, backend=backend, root=root)
+                    self.assertEqual(0, results["exit"])
+                    self.assertEqual(contents, results["stdout"])
+
+    def test_cycles(self):
+        body, _ = assemble(
+            li("a7", Call.CYCLES),
+            RV32I.ECALL.value(),
+            RV32I.RET.value())
+        results = {}
+        for backend in self.BACKENDS:
+            with self.subTest(backend=backend):
+                results[backend] = self.run_program(body, backend=backend)
+                self.assertEqual(FaultCode.PC_MISALIGNED, results[backend]["faultcode"])
+                self.assertGreater(results[backend][Reg("a0")], 0)
+        self.assertEqual(1, len({r[Reg("a0")] for r in results.values()}))
+
+    def test_errors(self):
+        words = [0] * 32
+        mem = Sysmem(words.__getitem__, words.__setitem__, len(words))
+        semihost = Semihost(echo=False)
+        self.assertEqual(0xFFFF_FFFF, semihost.service(0x1234, [0, 0, 0], mem, clock=0))
+        self.assertEqual(0xFFFF_FFFF, semihost.service(Call.WRITE, [1, 60, 8], mem, clock=0))
+        self.assertEqual(0xFFFF_FFFF, semihost.service(Call.READ_FILE, [64, 0, 8], mem, clock=0))
+        self.assertEqual(b"", semihost.stdout)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "root"
+            root.mkdir()
+            (root / "inside").write_bytes(b"in")
+            (Path(tmp) / "outside").write_bytes(b"out")
+            semihost = Semihost(root=root, echo=False)
+            for path, ret in [(b"inside", 2), (b"../outside", 0xFFFF_FFFF),
+                              (tmp.encode() + b"/outside", 0xFFFF_FFFF)]:
+                with self.subTest(path=path):
+                    mem.write(0, path + b"\0")
+                    self.assertEqual(ret, semihost.service(
+                        Call.READ_FILE, [0, 48, 8], mem, clock=0))
+            self.assertEqual(b"in", mem.read(48, 2))
+            # Nor does a file that won't fit where it's asked to go.
+            mem.write(0, b"inside\0")
+            self.assertEqual(0xFFFF_FFFF, semihost.service(
+                Call.READ_FILE, [0, 63, 8], mem, clock=0))
+
+    def test_ecall_without_semihosting(self):
+        body, _ = assemble(RV32I.ECALL.value(), RV32I.RET.value())
+        for backend in self.BACKENDS:
+            with self.subTest(backend=backend):
+                results = run_until_fault(body, backend=backend)
+                self.assertEqual(0x1234CAFE, results[Reg("ra")])
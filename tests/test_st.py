@@ -1,18 +1,19 @@
 import inspect
 import re
+import tempfile
 import unittest
 from contextlib import contextmanager
-from functools import singledispatch
 from pathlib import Path
 from typing import Any, Optional
+from unittest.mock import patch
 
 from amaranth.lib.memory import Memory
 
 from sae import st
 from sae.rtl.hart import FaultCode, Hart
 from sae.rtl.isa_rv32 import RV32I
-
-from .test_utils import run_until_fault
+from sae.sim import run_until_fault
+from sae.st import ST_CACHE, assemble_op, load_st, parse_pairs
 
 Reg = RV32I.Reg
 
@@ -39,38 +40,6 @@ def annotate_exceptions(filename, line):
         raise StError(filename, line.lineno, line.line) from e
 
 
-def parse_pairs(args, *, allow_atoms=False):
-    pairs = {}
-    rest = []
-    for arg in args:
-        if isinstance(arg, str):
-            rest.append(arg)
-        elif isinstance(arg.register, str):
-            pairs[arg.register] = arg.assign
-        else:
-            pairs[Reg(arg.register.register.upper())] = arg.assign
-    if allow_atoms:
-        return pairs, rest
-    assert not rest, "unpaired arguments but allow_atoms=False"
-    return pairs
-
-
-@singledispatch
-def translate_arg(arg, name):
-    if isinstance(arg, st.Register):
-        return Reg(arg.register.upper())
-    elif isinstance(arg, (int, st.Offset)):
-        return arg
-    elif name in ("pred", "succ"):
-        return arg
-    assert False, f"arg weh {name!r} = {arg!r}"
-
-
-@translate_arg.register(list)
-def translate_arg_list(args, names):
-    return {name: translate_arg(arg, name) for arg, name in zip(args, names)}
-
-
 class UnwrittenClass:
     def __repr__(self):
         return "Unwritten"
@@ -89,11 +58,7 @@ class StTestCase(unittest.TestCase):
     def __init_subclass__(cls):
         super().__init_subclass__()
 
-        parser = st.Parser()
-        with open(Path(__file__).parent / cls.filename, "r") as f:
-            parser.feed(f.readlines())
-
-        for name, body in parser.results:
+        for name, body in load_st(Path(__file__).parent / cls.filename):
             assert name.startswith("test_"), f"what do i do with {name!r}?"
             setattr(cls, name, lambda self, body=body: cls.st_runner(self, body))
 
@@ -112,18 +77,8 @@ class StTestCase(unittest.TestCase):
                 match line:
                     case st.Pragma(kind="init", args=args):
                         self.init_st(args)
-                    case st.Op(opcode=opcode, args=args):
-                        opname = opcode.upper().replace(".", "_")
-                        if len(opname) == 1:
-                            opname += "_"
-                        insn = getattr(RV32I, opname)
-                        asm_args = insn.asm_args
-                        assert len(args) == len(asm_args), (
-                            f"args {args!r} don't fit insn args {asm_args!r}")
-                        args = translate_arg(args, asm_args)
-                        ops = insn.value(**args)
-                        if not isinstance(ops, list):
-                            ops = [ops]
+                    case st.Op():
+                        ops = line.words if line.words is not None else assemble_op(line)
                         for op in ops:
                             self._body.append(op & 0xFFFF)
                             self._body.append(op >> 16)
@@ -207,6 +162,34 @@ class StTestCase(unittest.TestCase):
                 expected, actual, f"expected {rn}{expected!r}, actual {rn}{actual!r}")
 
 
+class TestParser(unittest.TestCase):
+    def test_tests(self):
+        parser = st.Parser()
+        parser.feed_file(["test_a:", "    nop", "test_b:", "    .assert"])
+        self.assertEqual(["test_a", "test_b"], [name for name, _ in parser.results])
+        self.assertEqual("nop", parser.results[0][1][0].opcode)
+
+    def test_registers(self):
+        parser = st.Parser()
+        parser.feed_file(["test_a:", "    add x14, x9, x31"])
+        [(_, [op])] = parser.results
+        self.assertEqual([st.Register("x14"), st.Register("x9"), st.Register("x31")], op.args)
+
+
+class TestStCache(unittest.TestCase):
+    def test_load_st(self):
+        path = Path(__file__).parent / "test_other.st"
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.object(ST_CACHE, "_path", Path(tmp)), \
+                patch.dict("os.environ", {"SAE_CACHE": "1"}):
+            parsed = load_st(path)
+            self.assertEqual(1, len(list(Path(tmp).iterdir())))
+            self.assertEqual(parsed, load_st(path))
+        ops = [line for _, body in parsed for line in body if isinstance(line, st.Op)]
+        self.assertTrue(ops)
+        self.assertTrue(all(op.words for op in ops))
+
+
 TEST_REPLACEMENT = re.compile(r"(?:\A|[^a-zA-Z0-9]+)[a-zA-Z0-9]")
 for test_file in Path(__file__).parent.glob("test_*.st"):
     name = TEST_REPLACEMENT.sub(lambda t: t[0][-1].upper(), Path(test_file).name)
@@ -1,6 +1,6 @@
 import unittest
 
-from .test_utils import run_until_fault
+from sae.sim import run_until_fault
 
 
 class TestTop(unittest.TestCase):